@@ -0,0 +1,66 @@
+"""
+Micro-benchmark of the PowerfulNode hot helpers: namespace lookup and JSON extraction.
+
+Compares the per-call cost of the current implementation against the previous one
+(uncompiled re.sub on every access). Run from the repository root:
+
+    python benchmarks/bench_node_helpers.py
+"""
+import json
+import os
+import re
+import sys
+import timeit
+
+# Importing core pulls in litellm; keep it from fetching its cost map over the network
+os.environ.setdefault("LITELLM_LOCAL_MODEL_COST_MAP", "True")
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from core.parsing import extract_json, namespace_for
+
+NUMBER = 200_000
+PAYLOAD = "Here is the answer:\n```json\n" + json.dumps({"symbol": "AAPL", "price": 123.4, "tags": ["a", "b"]}) + "\n```"
+
+
+class ResearchSummaryNode:
+    pass
+
+
+def legacy_namespace(cls):
+    name = cls.__name__
+    if name.endswith("Node"):
+        name = name[:-4]
+    name = re.sub("(.)([A-Z][a-z]+)", r"\1_\2", name)
+    name = re.sub("([a-z0-9])([A-Z])", r"\1_\2", name).lower()
+    return name
+
+
+def legacy_clean_and_parse_json(content):
+    content = re.sub(r"```json\s*", "", content)
+    content = re.sub(r"```", "", content)
+    start = content.find("{")
+    end = content.rfind("}")
+    return json.loads(content[start:end + 1])
+
+
+def bench(label, stmt):
+    seconds = min(timeit.repeat(stmt, number=NUMBER, repeat=3))
+    per_call = seconds / NUMBER * 1e9
+    print(f"{label:<28} {per_call:9.1f} ns/call")
+    return per_call
+
+
+def main():
+    assert legacy_namespace(ResearchSummaryNode) == namespace_for(ResearchSummaryNode)
+    assert legacy_clean_and_parse_json(PAYLOAD) == extract_json(PAYLOAD)
+
+    old = bench("namespace (legacy)", lambda: legacy_namespace(ResearchSummaryNode))
+    new = bench("namespace (cached)", lambda: namespace_for(ResearchSummaryNode))
+    print(f"{'':<28} {old / new:9.1f}x faster\n")
+
+    old = bench("json extraction (legacy)", lambda: legacy_clean_and_parse_json(PAYLOAD))
+    new = bench("json extraction (current)", lambda: extract_json(PAYLOAD))
+    print(f"{'':<28} {old / new:9.1f}x faster")
+
+
+if __name__ == "__main__":
+    main()
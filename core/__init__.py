@@ -2,8 +2,15 @@ from .async_powerful_nodes import (
     AsyncPowerfulBatchNode,
     AsyncPowerfulNode,
     AsyncPowerfulParallelBatchNode,
+    AsyncPowerfulStreamBatchNode,
+)
+from .sync_powerful_nodes import (
+    PowerfulBatchNode,
+    PowerfulNode,
+    PowerfulParallelBatchNode,
+    PowerfulProcessBatchNode,
+    PowerfulStreamBatchNode,
 )
-from .sync_powerful_nodes import PowerfulNode, PowerfulBatchNode
 from .human_node import AskHumanNode
 from .web_node import BaseWebNode, WebEndNode
 
@@ -11,9 +18,13 @@ __all__ = [
     "AsyncPowerfulBatchNode",
     "AsyncPowerfulNode",
     "AsyncPowerfulParallelBatchNode",
+    "AsyncPowerfulStreamBatchNode",
     "AskHumanNode",
     "PowerfulNode",
     "PowerfulBatchNode",
+    "PowerfulParallelBatchNode",
+    "PowerfulProcessBatchNode",
+    "PowerfulStreamBatchNode",
     "BaseWebNode",
     "WebEndNode",
 ]
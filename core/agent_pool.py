@@ -0,0 +1,186 @@
+"""
+Reuse of CodeAgent instances across node executions.
+
+Building a CodeAgent (prompt templates, tool validation, Python executor) costs
+more than many of the tasks it runs, and nodes build one per `exec` (batch nodes
+per item). The pool keeps idle agents keyed by what makes them different - model,
+tool set, system prompt, authorized imports, streaming - and hands them out with
+their memory and executor state reset:
+
+    with pooled_agent(self.model, tools=[PriceFetcherTool(api_base_url=url)]) as agent:
+        status = self.run_and_validate(agent=agent, ...)
+
+Tools are compared by signature, not identity: a tool's `pool_key` attribute if it
+defines one, otherwise its class plus the constructor arguments it stores as public
+attributes (objects such as a browser thread count by identity). A pooled agent keeps the tool instances it was
+built with, so fresh but equivalent tools passed by the caller are not used.
+
+    POCKETFLOW_AGENT_POOL=true      (false: build a new agent every time)
+"""
+import functools
+import inspect
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from .smolagents_factory import get_agent, DEFAULT_AUTHORIZED_IMPORTS
+
+_PRIMITIVES = (str, int, float, bool, type(None))
+
+# smolagents' default tools can't carry a `pool_key` attribute; these are their constructor settings
+_BUILTIN_POOL_KEYS = {
+    "DuckDuckGoSearchTool": lambda tool: (tool.max_results, tool.rate_limit),
+    "GoogleSearchTool": lambda tool: (tool.provider,),
+    "ApiWebSearchTool": lambda tool: (
+        tool.endpoint, tool.api_key_name, tool.rate_limit,
+        tuple(sorted((tool.headers or {}).items())), tuple(sorted((tool.params or {}).items())),
+    ),
+    "WebSearchTool": lambda tool: (tool.max_results, tool.engine),
+    "VisitWebpageTool": lambda tool: (tool.max_output_length,),
+    "WikipediaSearchTool": lambda tool: (tool.user_agent, tool.language, tool.content_type, tool.extract_format),
+    "PythonInterpreterTool": lambda tool: (tuple(sorted(tool.authorized_imports)),),
+}
+
+
+def _config_value(value):
+    if isinstance(value, _PRIMITIVES):
+        return value
+    if isinstance(value, (list, tuple)) and all(isinstance(v, _PRIMITIVES) for v in value):
+        return tuple(value)
+    # Safe: the pooled agent keeps this object alive, so its id can't be reused
+    return ("id", id(value))
+
+
+def _constructor_params(cls) -> tuple:
+    try:
+        parameters = inspect.signature(cls.__init__).parameters.values()
+    except (TypeError, ValueError):
+        return ()
+    return tuple(
+        p.name for p in parameters
+        if p.name != "self" and p.kind not in (p.VAR_POSITIONAL, p.VAR_KEYWORD)
+    )
+
+
+def tool_signature(tool) -> tuple:
+    """
+    What makes two tools interchangeable: class, name and either an explicit
+    `pool_key` or the constructor arguments the tool kept as public attributes.
+    Private and runtime state (clients, timers, caches) is not part of it.
+    """
+    cls = type(tool)
+    base = (cls.__module__, cls.__qualname__, tool.name)
+    pool_key = getattr(tool, "pool_key", None)
+    if pool_key is None and cls.__module__.startswith("smolagents.") and cls.__name__ in _BUILTIN_POOL_KEYS:
+        pool_key = _BUILTIN_POOL_KEYS[cls.__name__](tool)
+    if pool_key is not None:
+        return base + (("pool_key", pool_key),)
+    attrs = vars(tool)
+    config = tuple(
+        (name, _config_value(attrs[name]))
+        for name in _constructor_params(cls)
+        if not name.startswith("_") and name in attrs
+    )
+    return base + (config,)
+
+
+def reset_agent(agent):
+    """Clears what a finished run leaves behind: memory, monitor counters and executor variables."""
+    agent.memory.reset()
+    agent.monitor.reset()
+    agent.state = {}
+    executor = getattr(agent, "python_executor", None)
+    if executor is not None and hasattr(executor, "state"):
+        executor.state = {"__name__": "__main__"}
+        if hasattr(executor, "custom_tools"):
+            executor.custom_tools = {}
+
+
+class AgentPool:
+    """Idle agents per key; the least recently used keys are dropped beyond `max_keys`."""
+
+    def __init__(self, max_idle_per_key: int = 4, max_keys: int = 64):
+        self.max_idle_per_key = max_idle_per_key
+        self.max_keys = max_keys
+        self._idle = OrderedDict()  # key -> [agent, ...]
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(model, tools=None, system_prompt=None, additional_authorized_imports=None, stream_outputs=None) -> tuple:
+        if stream_outputs is None:
+            stream_outputs = os.getenv("LLM_STREAM", "false").lower() in ("true", "1", "t", "yes")
+        imports = additional_authorized_imports or DEFAULT_AUTHORIZED_IMPORTS
+        return (
+            id(model),
+            tuple(sorted(tool_signature(tool) for tool in (tools or []))),
+            system_prompt,
+            tuple(sorted(imports)),
+            stream_outputs,
+        )
+
+    def acquire(self, model, tools=None, system_prompt=None, additional_authorized_imports=None, stream_outputs=None):
+        """Returns (key, agent): an idle agent for this configuration, or a newly built one."""
+        key = self.key(model, tools, system_prompt, additional_authorized_imports, stream_outputs)
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                self._idle.move_to_end(key)
+                return key, idle.pop()
+        agent = get_agent(
+            model,
+            tools=list(tools or []),
+            system_prompt=system_prompt,
+            stream_outputs=key[-1],
+            additional_authorized_imports=additional_authorized_imports,
+        )
+        return key, agent
+
+    def release(self, key, agent):
+        reset_agent(agent)
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            self._idle.move_to_end(key)
+            if len(idle) < self.max_idle_per_key:
+                idle.append(agent)
+            while len(self._idle) > self.max_keys:
+                self._idle.popitem(last=False)
+
+    @contextmanager
+    def lease(self, model, tools=None, system_prompt=None, additional_authorized_imports=None, stream_outputs=None):
+        key, agent = self.acquire(model, tools, system_prompt, additional_authorized_imports, stream_outputs)
+        try:
+            yield agent
+        finally:
+            self.release(key, agent)
+
+    def discard(self, tools):
+        """Drops idle agents built with any of `tools`, e.g. once the browser they drive is closed."""
+        signatures = {tool_signature(tool) for tool in tools}
+        with self._lock:
+            for key in [k for k in self._idle if signatures & set(k[1])]:
+                del self._idle[key]
+
+    def clear(self):
+        with self._lock:
+            self._idle.clear()
+
+
+@functools.lru_cache(maxsize=1)
+def get_agent_pool() -> AgentPool:
+    return AgentPool()
+
+
+@contextmanager
+def pooled_agent(model, tools=None, system_prompt=None, additional_authorized_imports=None, stream_outputs=None):
+    """Leases an agent from the process-wide pool (or builds one when POCKETFLOW_AGENT_POOL=false)."""
+    if os.getenv("POCKETFLOW_AGENT_POOL", "true").lower() not in ("true", "1", "t", "yes"):
+        yield get_agent(
+            model,
+            tools=tools,
+            system_prompt=system_prompt,
+            stream_outputs=stream_outputs,
+            additional_authorized_imports=additional_authorized_imports,
+        )
+        return
+    with get_agent_pool().lease(model, tools, system_prompt, additional_authorized_imports, stream_outputs) as agent:
+        yield agent
@@ -1,13 +1,14 @@
 import asyncio
-import json
 import os
-import re
 
 from pocketflow import AsyncNode
-from .llm import get_model_object, get_instructor_client
+from .llm import get_model_object, get_instructor_client, get_async_instructor_client
 from .smolagents_factory import run_agent_with_context
-from .storage.fs import FileSystemStatePersistence
-from .storage.base import FlowState
+from .checkpoint import mark_dirty, save_checkpoint_async
+from .parsing import extract_json, namespace_for, parse_model
+from .rate_limit import alimited_call, limited_call, usage_tokens
+from .repair import build_repair_messages, repair_model
+from .replay import replay_call, areplay_call
 
 
 class AsyncPowerfulNode(AsyncNode):
@@ -22,13 +23,9 @@ class AsyncPowerfulNode(AsyncNode):
 
     @property
     def namespace(self) -> str:
-        # Defaults to snake_case of class name (e.g. MyNode -> my)
-        name = self.__class__.__name__
-        if name.endswith("Node"):
-            name = name[:-4]
-        name = re.sub("(.)([A-Z][a-z]+)", r"\1_\2", name)
-        name = re.sub("([a-z0-9])([A-Z])", r"\1_\2", name).lower()
-        return name
+        # Defaults to snake_case of class name (e.g. MyNode -> my), computed once per class.
+        # Subclasses may override with a property or a plain class attribute.
+        return namespace_for(type(self))
 
     def _init_namespace(self, shared: dict):
         if self.namespace not in shared:
@@ -37,6 +34,7 @@ class AsyncPowerfulNode(AsyncNode):
     def _write_namespace(self, shared: dict, **updates):
         self._init_namespace(shared)
         shared[self.namespace].update(updates)
+        mark_dirty(shared, self.namespace)
 
     def _read_namespace(self, shared: dict, namespace: str = None) -> dict:
         return shared.get(namespace or self.namespace, {})
@@ -46,63 +44,143 @@ class AsyncPowerfulNode(AsyncNode):
             print(message)
 
     def _clean_and_parse_json(self, content):
-        if isinstance(content, dict):
-            return content
-        if not isinstance(content, str):
-            raise ValueError("Content is not dict or string")
-
-        # Remove markdown
-        content = re.sub(r"```json\s*", "", content)
-        content = re.sub(r"```", "", content)
-
-        # Find JSON object
-        start = content.find("{")
-        end = content.rfind("}")
-        if start != -1 and end != -1:
-            return json.loads(content[start: end + 1])
-        raise ValueError("No JSON found")
+        return extract_json(content)
 
     def _llm_repair(self, content: str, response_model, system_prompt: str):
         self._log(f"[{self.namespace}] Validation failed. Attempting LLM repair...")
-        client = get_instructor_client()
         model_id = self.model.model_id
         if not os.getenv("OPENAI_API_KEY") and not model_id.startswith("huggingface/"):
             model_id = f"huggingface/{model_id}"
+        messages = build_repair_messages(content, response_model, system_prompt)
 
-        return client.chat.completions.create(
-            model=model_id,
-            response_model=response_model,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": str(content)},
-            ],
+        def create():
+            # Same limiter and 429 backoff as the model's own completions
+            validated, _ = limited_call(
+                lambda: get_instructor_client().chat.completions.create_with_completion(
+                    model=model_id,
+                    response_model=response_model,
+                    messages=messages,
+                ),
+                messages,
+                usage=lambda result: usage_tokens(result[1]),
+            )
+            return validated
+
+        return replay_call(
+            "instructor",
+            {
+                "model": model_id,
+                "response_model": f"{response_model.__module__}:{response_model.__qualname__}",
+                "messages": messages,
+            },
+            create,
+            encode=lambda result: result.model_dump(mode="json"),
+            decode=response_model.model_validate,
         )
 
-    def parse_and_validate(self, exec_res, response_model, system_prompt: str, result_key: str, shared: dict):
-        # 1. Fast Path
+    async def _llm_repair_async(self, content: str, response_model, system_prompt: str):
+        """`_llm_repair` on the async instructor client, so repairs don't block the event loop."""
+        self._log(f"[{self.namespace}] Validation failed. Attempting LLM repair...")
+        model_id = self.model.model_id
+        if not os.getenv("OPENAI_API_KEY") and not model_id.startswith("huggingface/"):
+            model_id = f"huggingface/{model_id}"
+        messages = build_repair_messages(content, response_model, system_prompt)
+
+        async def create():
+            # Same limiter and 429 backoff as the model's own completions
+            validated, _ = await alimited_call(
+                lambda: get_async_instructor_client().chat.completions.create_with_completion(
+                    model=model_id,
+                    response_model=response_model,
+                    messages=messages,
+                ),
+                messages,
+                usage=lambda result: usage_tokens(result[1]),
+            )
+            return validated
+
+        return await areplay_call(
+            "instructor",
+            {
+                "model": model_id,
+                "response_model": f"{response_model.__module__}:{response_model.__qualname__}",
+                "messages": messages,
+            },
+            create,
+            encode=lambda result: result.model_dump(mode="json"),
+            decode=response_model.model_validate,
+        )
+
+    async def call_llm(self, messages, **kwargs) -> str:
+        """Plain LLM completion on litellm.acompletion; `messages` in LiteLLM format. Returns the text."""
+        response = await self.model.acall(messages, **kwargs)
+        return response.choices[0].message.content
+
+    def _fast_validate(self, exec_res, response_model, result_key: str, shared: dict) -> bool:
         try:
-            data = self._clean_and_parse_json(exec_res)
-            validated = response_model(**data)
-            self._write_namespace(shared, status="success", **{result_key: validated})
-            shared[self.namespace][result_key] = validated  # Direct access
-            return "success"
+            validated, fixes = parse_model(exec_res, response_model)
         except Exception:
-            pass
+            return False
+        if fixes:
+            self._log(f"[{self.namespace}] Parsed output after local fixes: {', '.join(fixes)}")
+        self._write_namespace(shared, status="success", json_fixes=fixes, **{result_key: validated})
+        shared[self.namespace][result_key] = validated  # Direct access
+        return True
 
-        # 2. Repair Path
+    def _local_repair(self, exec_res, response_model, result_key: str, shared: dict) -> bool:
+        """Schema-aware coercion (see core.repair); spares an LLM call for mechanical mistakes."""
         try:
-            validated = self._llm_repair(exec_res, response_model, system_prompt)
+            validated, fixes = repair_model(exec_res, response_model)
+        except Exception:
+            return False
+        self._log(f"[{self.namespace}] Coerced output locally: {', '.join(fixes)}")
+        self._write_namespace(shared, status="coerced", json_fixes=fixes, **{result_key: validated})
+        shared[self.namespace][result_key] = validated
+        return True
+
+    def _record_repair(self, exec_res, result_key: str, shared: dict, validated=None, error: Exception = None) -> str:
+        if error is None:
             self._write_namespace(shared, status="repaired", **{result_key: validated})
             shared[self.namespace][result_key] = validated
             return "success"
+        error_msg = str(error)
+        self._write_namespace(shared, status="error", error=error_msg)
+        # Global error log
+        if "errors" not in shared:
+            shared["errors"] = {}
+        shared["errors"][self.namespace] = {"message": error_msg, "raw": str(exec_res)[:200]}
+        mark_dirty(shared, "errors")
+        return "error"
+
+    def parse_and_validate(self, exec_res, response_model, system_prompt: str, result_key: str, shared: dict):
+        # 1. Fast Path
+        if self._fast_validate(exec_res, response_model, result_key, shared):
+            return "success"
+
+        # 2. Local schema-aware repair
+        if self._local_repair(exec_res, response_model, result_key, shared):
+            return "success"
+
+        # 3. LLM Repair Path
+        try:
+            validated = self._llm_repair(exec_res, response_model, system_prompt)
+        except Exception as e:
+            return self._record_repair(exec_res, result_key, shared, error=e)
+        return self._record_repair(exec_res, result_key, shared, validated=validated)
+
+    async def parse_and_validate_async(
+        self, exec_res, response_model, system_prompt: str, result_key: str, shared: dict
+    ):
+        """`parse_and_validate` with the repair call awaited on the async instructor client."""
+        if self._fast_validate(exec_res, response_model, result_key, shared):
+            return "success"
+        if self._local_repair(exec_res, response_model, result_key, shared):
+            return "success"
+        try:
+            validated = await self._llm_repair_async(exec_res, response_model, system_prompt)
         except Exception as e:
-            error_msg = str(e)
-            self._write_namespace(shared, status="error", error=error_msg)
-            # Global error log
-            if "errors" not in shared:
-                shared["errors"] = {}
-            shared["errors"][self.namespace] = {"message": error_msg, "raw": str(exec_res)[:200]}
-            return "error"
+            return self._record_repair(exec_res, result_key, shared, error=e)
+        return self._record_repair(exec_res, result_key, shared, validated=validated)
 
     async def run_and_validate(
         self,
@@ -119,9 +197,10 @@ class AsyncPowerfulNode(AsyncNode):
         current_task = task
         for attempt in range(max_retries):
             self._log(f"[{self.namespace}] Attempt {attempt + 1}/{max_retries}")
+            # smolagents agents are synchronous, so the agent loop itself still runs on a worker thread
             res = await asyncio.to_thread(run_agent_with_context, agent, current_task, session_id, user_id)
 
-            if self.parse_and_validate(res, response_model, system_prompt, result_key, shared) == "success":
+            if await self.parse_and_validate_async(res, response_model, system_prompt, result_key, shared) == "success":
                 return "success"
 
             error = shared.get("errors", {}).get(self.namespace, {}).get("message", "Unknown")
@@ -133,13 +212,13 @@ class AsyncPowerfulNode(AsyncNode):
     async def post_async(self, shared, prep_res, exec_res):
         """Checkpointing hook."""
         try:
-            state = FlowState(
-                session_id=shared["input"].get("session_id", "unknown"),
-                user_id=shared["input"].get("user_id"),
-                status="running",
-                data=shared,
+            # Own namespace may also have been written directly (shared[ns][key] = ...)
+            mark_dirty(shared, self.namespace)
+            await save_checkpoint_async(
+                shared,
+                node_id=getattr(self, "checkpoint_id", None) or self.__class__.__name__,
+                action=exec_res if isinstance(exec_res, str) else None,
             )
-            FileSystemStatePersistence().save_state(state)
             self._log(f"[{self.namespace}] Checkpoint saved.")
         except Exception as e:
             self._log(f"[{self.namespace}] Checkpoint failed: {e}")
@@ -152,7 +231,94 @@ class AsyncPowerfulBatchNode(AsyncPowerfulNode):
 
 
 class AsyncPowerfulParallelBatchNode(AsyncPowerfulNode):
+    """
+    Runs items concurrently, at most `max_concurrency` at a time
+    (default: POCKETFLOW_MAX_CONCURRENCY, 16; 0 = unbounded). Provider request and
+    token limits are enforced separately by the process-wide limiter in core.rate_limit.
+    """
+
+    def __init__(self, *args, max_concurrency: int = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if max_concurrency is None:
+            max_concurrency = int(os.getenv("POCKETFLOW_MAX_CONCURRENCY", "16"))
+        self.max_concurrency = max_concurrency
+
     async def _exec(self, items):
-        return await asyncio.gather(
-            *(super(AsyncPowerfulParallelBatchNode, self)._exec(i) for i in (items or []))
-        )
+        if not self.max_concurrency:
+            return await asyncio.gather(
+                *(super(AsyncPowerfulParallelBatchNode, self)._exec(i) for i in (items or []))
+            )
+        # Created per call: a semaphore binds to the running event loop
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def run(item):
+            async with semaphore:
+                return await super(AsyncPowerfulParallelBatchNode, self)._exec(item)
+
+        return await asyncio.gather(*(run(i) for i in (items or [])))
+
+
+class AsyncPowerfulStreamBatchNode(AsyncPowerfulNode):
+    """
+    Async counterpart of PowerfulStreamBatchNode: `prep_async` may return an iterable or
+    an async iterable, at most `max_in_flight` items run concurrently, and each result
+    goes to `post_item_async` as soon as it completes. `post_async` runs once at the end
+    with the number of processed items; the default checkpoints and returns "default".
+    """
+
+    def __init__(self, *args, max_in_flight: int = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if max_in_flight is None:
+            max_in_flight = int(os.getenv("POCKETFLOW_MAX_CONCURRENCY", "16")) or 16
+        self.max_in_flight = max_in_flight
+
+    async def post_item_async(self, shared, item, result):
+        pass
+
+    async def _stream(self, items):
+        """Yields (item, result) pairs in completion order."""
+        if hasattr(items, "__aiter__"):
+            iterator = items.__aiter__()
+
+            async def next_item():
+                return await iterator.__anext__()
+        else:
+            iterator = iter(items or [])
+
+            async def next_item():
+                try:
+                    return next(iterator)
+                except StopIteration:
+                    raise StopAsyncIteration
+
+        pending = {}
+        exhausted = False
+        try:
+            while True:
+                while not exhausted and len(pending) < self.max_in_flight:
+                    try:
+                        item = await next_item()
+                    except StopAsyncIteration:
+                        exhausted = True
+                        break
+                    pending[asyncio.ensure_future(AsyncNode._exec(self, item))] = item
+                if not pending:
+                    return
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    yield pending.pop(task), task.result()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _run_async(self, shared):
+        prep_res = await self.prep_async(shared)
+        count = 0
+        async for item, result in self._stream(prep_res):
+            await self.post_item_async(shared, item, result)
+            count += 1
+        return await self.post_async(shared, prep_res, count)
+
+    async def post_async(self, shared, prep_res, exec_res):
+        await super().post_async(shared, prep_res, None)
+        return None
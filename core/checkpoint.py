@@ -0,0 +1,221 @@
+"""
+Checkpoint helpers shared by the sync and async PowerfulNode families.
+
+Nodes record which top-level keys of `shared` they touched via `mark_dirty`
+(done automatically by `_write_namespace`). `save_checkpoint` then writes either
+a full snapshot or, with POCKETFLOW_CHECKPOINT_MODE=incremental, only the
+touched namespaces. With POCKETFLOW_CHECKPOINT_BACKGROUND=true the write is
+handed to a `CheckpointWriter` thread instead of blocking the node. Async nodes
+use `save_checkpoint_async`, which never blocks the event loop on disk I/O or a
+full writer queue.
+"""
+import asyncio
+import atexit
+import functools
+import os
+import queue
+import threading
+from pydantic import BaseModel
+from pydantic_core import to_jsonable_python
+from .storage.base import FlowState
+from .storage.registry import get_state_persistence
+
+# Key under which the set of touched namespaces lives in `shared` until the next checkpoint.
+DIRTY_KEY = "__checkpoint_dirty__"
+
+
+def checkpoint_mode() -> str:
+    return os.getenv("POCKETFLOW_CHECKPOINT_MODE", "full").lower()
+
+
+def checkpoint_in_background() -> bool:
+    return os.getenv("POCKETFLOW_CHECKPOINT_BACKGROUND", "false").lower() in ("true", "1", "t", "yes")
+
+
+def mark_dirty(shared: dict, *namespaces: str):
+    # setdefault is atomic, so threads of a parallel batch can mark concurrently
+    shared.setdefault(DIRTY_KEY, set()).update(namespaces)
+
+
+def model_path(value: BaseModel) -> str:
+    cls = type(value)
+    return f"{cls.__module__}:{cls.__qualname__}"
+
+
+def build_state(shared: dict, status: str = "running", node_id: str = None, action: str = None) -> FlowState:
+    data = {k: v for k, v in shared.items() if k != DIRTY_KEY}
+    # Remember which values are Pydantic models so resume can rebuild them (see core.resume)
+    models = {}
+    for ns, values in data.items():
+        if isinstance(values, dict):
+            found = {k: model_path(v) for k, v in values.items() if isinstance(v, BaseModel)}
+            if found:
+                models[ns] = found
+    return FlowState(
+        session_id=shared["input"].get("session_id", "unknown"),
+        user_id=shared["input"].get("user_id"),
+        status=status,
+        data=data,
+        last_node=node_id,
+        last_action=action,
+        models=models,
+    )
+
+
+def snapshot_state(shared: dict, node_id: str = None, action: str = None) -> FlowState:
+    """
+    A `build_state` that shares nothing with `shared`: the data is converted to
+    plain JSON values on the caller's thread, so later node writes (nested ones
+    included) can't change what another thread persists for this checkpoint.
+    """
+    state = build_state(shared, node_id=node_id, action=action)
+    return state.model_copy(update={"data": to_jsonable_python(state.data)})
+
+
+class CheckpointWriter:
+    """
+    Persists checkpoints on a dedicated thread so nodes never wait on disk I/O.
+
+    Saves for a session that is already queued are coalesced: only the newest
+    state is written, with the union of the pending deltas' namespaces (or as a
+    full snapshot if any of them was one). The queue is bounded, so a flow that
+    outpaces the disk is slowed down instead of buffering states without limit.
+    """
+
+    def __init__(self, persistence=None, max_pending: int = 64):
+        self.persistence = persistence  # None: whatever the registry resolves at write time
+        self._pending = {}  # session_id -> (state, namespaces or None for a full snapshot)
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._lock = threading.Lock()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="checkpoint-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, state: FlowState, namespaces=None):
+        if self._stage(state, namespaces):
+            self._queue.put(state.session_id)
+
+    async def submit_async(self, state: FlowState, namespaces=None):
+        """`submit` for event-loop callers: waits for room in a full queue on a worker thread."""
+        if not self._stage(state, namespaces):
+            return
+        try:
+            self._queue.put_nowait(state.session_id)
+        except queue.Full:
+            await asyncio.to_thread(self._queue.put, state.session_id)
+
+    def _stage(self, state: FlowState, namespaces) -> bool:
+        """Records `state` as the session's pending save; True if the session still needs queueing."""
+        if self._closed:
+            raise RuntimeError("CheckpointWriter is closed")
+        with self._lock:
+            previous = self._pending.get(state.session_id)
+            if previous is not None:
+                # Every submitted state carries the full data, so the newest one supersedes the rest
+                previous_namespaces = previous[1]
+                if namespaces is None or previous_namespaces is None:
+                    merged = None
+                else:
+                    merged = set(previous_namespaces) | set(namespaces)
+                self._pending[state.session_id] = (state, merged)
+                return False
+            self._pending[state.session_id] = (state, None if namespaces is None else set(namespaces))
+        return True
+
+    def _run(self):
+        while True:
+            session_id = self._queue.get()
+            try:
+                if session_id is None:
+                    return
+                with self._lock:
+                    state, namespaces = self._pending.pop(session_id)
+                persistence = self.persistence or get_state_persistence()
+                if namespaces is None:
+                    persistence.save_state(state)
+                elif not persistence.save_delta(state, namespaces):
+                    # The delta is lost otherwise; fall back to a full snapshot
+                    persistence.save_state(state)
+            except Exception as e:
+                print(f"[Checkpoint Writer] Error saving: {e}")
+            finally:
+                self._queue.task_done()
+
+    def flush(self):
+        """Blocks until every submitted checkpoint has been written."""
+        self._queue.join()
+
+    def close(self):
+        """Flushes pending checkpoints and stops the writer thread."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join()
+
+
+@functools.lru_cache(maxsize=1)
+def get_checkpoint_writer() -> CheckpointWriter:
+    writer = CheckpointWriter()
+    atexit.register(writer.close)
+    return writer
+
+
+def flush_checkpoints():
+    """Waits for background checkpoints to hit disk. Call at flow end before reading states back."""
+    if get_checkpoint_writer.cache_info().currsize:
+        get_checkpoint_writer().flush()
+
+
+def close_checkpoints():
+    if get_checkpoint_writer.cache_info().currsize:
+        get_checkpoint_writer().close()
+        get_checkpoint_writer.cache_clear()
+
+
+def _persist(state: FlowState, dirty: set, incremental: bool, persistence=None) -> bool:
+    persistence = persistence or get_state_persistence()
+    if incremental:
+        return persistence.save_delta(state, dirty)
+    return persistence.save_state(state)
+
+
+def save_checkpoint(shared: dict, persistence=None, node_id: str = None, action: str = None) -> bool:
+    """
+    Persists `shared` and clears its dirty set.
+    In incremental mode only namespaces marked dirty since the last checkpoint are written.
+    `node_id` / `action` record where the flow stands, for `core.resume.resume_flow`.
+    """
+    dirty = shared.pop(DIRTY_KEY, None) or set()
+    incremental = checkpoint_mode() == "incremental"
+
+    if persistence is None and checkpoint_in_background():
+        state = snapshot_state(shared, node_id=node_id, action=action)
+        get_checkpoint_writer().submit(state, dirty if incremental else None)
+        return True
+
+    saved = _persist(build_state(shared, node_id=node_id, action=action), dirty, incremental, persistence)
+    if not saved:
+        # Keep the changes pending so the next checkpoint still carries them
+        mark_dirty(shared, *dirty)
+    return saved
+
+
+async def save_checkpoint_async(shared: dict, persistence=None, node_id: str = None, action: str = None) -> bool:
+    """
+    `save_checkpoint` for async nodes. The state is snapshotted on the event loop,
+    where no other task can change `shared` meanwhile, and written on a worker
+    thread (or handed to the background writer without blocking).
+    """
+    dirty = shared.pop(DIRTY_KEY, None) or set()
+    incremental = checkpoint_mode() == "incremental"
+    state = snapshot_state(shared, node_id=node_id, action=action)
+
+    if persistence is None and checkpoint_in_background():
+        await get_checkpoint_writer().submit_async(state, dirty if incremental else None)
+        return True
+
+    saved = await asyncio.to_thread(_persist, state, dirty, incremental, persistence)
+    if not saved:
+        mark_dirty(shared, *dirty)
+    return saved
@@ -1,10 +1,17 @@
 import os
+import asyncio
 import functools
+import contextvars
+from contextlib import contextmanager
 import instructor
-from litellm import completion
-from smolagents.models import Model, MessageRole
+from litellm import completion, acompletion, ModelResponse
+from litellm.types.utils import ModelResponseStream, Usage
+from smolagents.models import Model, MessageRole, ChatMessageStreamDelta
 from smolagents.agents import ChatMessage
 from smolagents.monitoring import TokenUsage
+from .llm_cache import cache_key, get_llm_cache
+from .replay import replay_call, areplay_call, replay_stream, areplay_stream
+from .rate_limit import alimited_call, limited_call
 
 # Constants
 DEFAULT_PROVIDER = "openai"
@@ -15,6 +22,46 @@ DEFAULT_MODELS = {
     "huggingface": "meta-llama/Meta-Llama-3-8B-Instruct"
 }
 
+# Callbacks receiving each streamed text delta; scoped to the current thread/task via subscribe_stream
+_stream_listeners = contextvars.ContextVar("llm_stream_listeners", default=())
+
+
+@contextmanager
+def subscribe_stream(callback):
+    """Calls `callback(text)` for every delta streamed by `generate_stream` inside this block."""
+    token = _stream_listeners.set(_stream_listeners.get() + (callback,))
+    try:
+        yield
+    finally:
+        _stream_listeners.reset(token)
+
+
+def _aggregate_chunks(chunks) -> dict:
+    """What a cassette keeps of a streamed completion: its text and the final usage."""
+    text, usage = [], None
+    for chunk in chunks:
+        if getattr(chunk, "usage", None):
+            usage = chunk.usage
+        if chunk.choices and chunk.choices[0].delta and chunk.choices[0].delta.content:
+            text.append(chunk.choices[0].delta.content)
+    return {
+        "text": "".join(text),
+        "usage": None if usage is None else {
+            "prompt_tokens": usage.prompt_tokens,
+            "completion_tokens": usage.completion_tokens,
+            "total_tokens": usage.total_tokens,
+        },
+    }
+
+
+def _replayed_chunks(data: dict) -> list:
+    """Stream chunks rebuilt from `_aggregate_chunks` output: the whole text, then the usage."""
+    chunks = [ModelResponseStream(choices=[{"index": 0, "delta": {"role": "assistant", "content": data["text"]}}])]
+    if data.get("usage"):
+        chunks.append(ModelResponseStream(choices=[], usage=Usage(**data["usage"])))
+    return chunks
+
+
 class LiteLLMModel(Model):
     """Singleton wrapper for LiteLLM model configuration."""
     def __init__(self, **kwargs):
@@ -40,7 +87,7 @@ class LiteLLMModel(Model):
         if self.provider == "huggingface": return os.getenv("HF_TOKEN")
         return None
 
-    def generate(self, messages, stop_sequences=None, **kwargs):
+    def _format_messages(self, messages):
         # Convert smolagents messages to LiteLLM format
         formatted_messages = []
         for msg in messages:
@@ -63,16 +110,18 @@ class LiteLLMModel(Model):
                 formatted_role = str(role)
 
             formatted_messages.append({"role": formatted_role, "content": content})
+        return formatted_messages
 
-        response = completion(
-            model=self.model_id,
-            messages=formatted_messages,
-            api_base=self.api_base,
-            api_key=self.api_key,
-            stop=stop_sequences,
-            **kwargs
-        )
+    def generate(self, messages, stop_sequences=None, **kwargs):
+        response = self._completion(self._format_messages(messages), stop_sequences, **kwargs)
+        return self._to_chat_message(response)
+
+    async def agenerate(self, messages, stop_sequences=None, **kwargs):
+        """Async `generate` on litellm.acompletion: no thread is held while waiting on the provider."""
+        response = await self._acompletion(self._format_messages(messages), stop_sequences, **kwargs)
+        return self._to_chat_message(response)
 
+    def _to_chat_message(self, response):
         content = response.choices[0].message.content
         
         # Create TokenUsage
@@ -88,15 +137,141 @@ class LiteLLMModel(Model):
             token_usage=token_usage
         )
 
-    def __call__(self, messages, stop_sequences=None, **kwargs):
-        return completion(
-            model=self.model_id,
-            messages=messages,
-            api_base=self.api_base,
-            api_key=self.api_key,
-            stop=stop_sequences,
+    def generate_stream(self, messages, stop_sequences=None, **kwargs):
+        """
+        Yields ChatMessageStreamDelta as tokens arrive, then one final delta with the token usage.
+        Used by CodeAgent when created with stream_outputs=True; bypasses the response cache.
+        """
+        kwargs.pop("bypass_cache", None)
+        stream = self._completion(
+            self._format_messages(messages),
+            stop_sequences,
+            stream=True,
+            stream_options={"include_usage": True},
             **kwargs
         )
+        listeners = _stream_listeners.get()
+        usage = None
+        for chunk in stream:
+            # Providers differ in which chunk carries usage; the last one seen is the total
+            if getattr(chunk, "usage", None):
+                usage = chunk.usage
+            if not chunk.choices:
+                continue
+            text = chunk.choices[0].delta.content if chunk.choices[0].delta else None
+            if text:
+                for listener in listeners:
+                    listener(text)
+                yield ChatMessageStreamDelta(content=text)
+        if usage is not None:
+            yield ChatMessageStreamDelta(
+                content="",
+                token_usage=TokenUsage(input_tokens=usage.prompt_tokens, output_tokens=usage.completion_tokens),
+            )
+
+    def __call__(self, messages, stop_sequences=None, **kwargs):
+        return self._completion(messages, stop_sequences, **kwargs)
+
+    async def acall(self, messages, stop_sequences=None, **kwargs):
+        """Async `__call__`: takes LiteLLM-format messages and returns the raw ModelResponse."""
+        return await self._acompletion(messages, stop_sequences, **kwargs)
+
+    def _completion(self, messages, stop_sequences=None, bypass_cache=False, **kwargs):
+        """litellm.completion, through the replay cassette (if any) and the response cache."""
+        request = {"model": self.model_id, "messages": messages, "stop": stop_sequences, "kwargs": kwargs}
+        if kwargs.get("stream"):
+            return replay_stream(
+                "llm_stream",
+                request,
+                lambda: self._cached_completion(messages, stop_sequences, bypass_cache, **kwargs),
+                encode=_aggregate_chunks,
+                decode=_replayed_chunks,
+            )
+        return replay_call(
+            "llm",
+            request,
+            lambda: self._cached_completion(messages, stop_sequences, bypass_cache, **kwargs),
+            encode=lambda response: response.model_dump(),
+            decode=lambda data: ModelResponse(**data),
+        )
+
+    def _cached_completion(self, messages, stop_sequences=None, bypass_cache=False, **kwargs):
+        """litellm.completion, served from the response cache when LLM_CACHE is enabled."""
+        cache = None if bypass_cache or kwargs.get("stream") else get_llm_cache()
+        if cache is None:
+            return self._raw_completion(messages, stop_sequences, **kwargs)
+
+        key = cache_key(self.model_id, messages, stop_sequences, api_base=self.api_base, **kwargs)
+        cached = cache.get(key)
+        if cached is not None:
+            return ModelResponse(**cached)
+        response = self._raw_completion(messages, stop_sequences, **kwargs)
+        cache.put(key, response.model_dump())
+        return response
+
+    def _raw_completion(self, messages, stop_sequences=None, **kwargs):
+        """litellm.completion under the process-wide rate limiter, retrying 429s with backoff."""
+        # Streams carry no usage yet; the estimate stands for them
+        return limited_call(
+            lambda: completion(
+                model=self.model_id,
+                messages=messages,
+                api_base=self.api_base,
+                api_key=self.api_key,
+                stop=stop_sequences,
+                **kwargs
+            ),
+            messages,
+            kwargs.get("max_tokens"),
+        )
+
+    async def _raw_acompletion(self, messages, stop_sequences=None, **kwargs):
+        """Async `_raw_completion`: waits for the limiter without blocking the event loop."""
+        return await alimited_call(
+            lambda: acompletion(
+                model=self.model_id,
+                messages=messages,
+                api_base=self.api_base,
+                api_key=self.api_key,
+                stop=stop_sequences,
+                **kwargs
+            ),
+            messages,
+            kwargs.get("max_tokens"),
+        )
+
+    async def _acompletion(self, messages, stop_sequences=None, bypass_cache=False, **kwargs):
+        """Async counterpart of `_completion`."""
+        request = {"model": self.model_id, "messages": messages, "stop": stop_sequences, "kwargs": kwargs}
+        if kwargs.get("stream"):
+            return await areplay_stream(
+                "llm_stream",
+                request,
+                lambda: self._acached_completion(messages, stop_sequences, bypass_cache, **kwargs),
+                encode=_aggregate_chunks,
+                decode=_replayed_chunks,
+            )
+        return await areplay_call(
+            "llm",
+            request,
+            lambda: self._acached_completion(messages, stop_sequences, bypass_cache, **kwargs),
+            encode=lambda response: response.model_dump(),
+            decode=lambda data: ModelResponse(**data),
+        )
+
+    async def _acached_completion(self, messages, stop_sequences=None, bypass_cache=False, **kwargs):
+        cache = None if bypass_cache or kwargs.get("stream") else get_llm_cache()
+        key = None
+        if cache is not None:
+            key = cache_key(self.model_id, messages, stop_sequences, api_base=self.api_base, **kwargs)
+            # The cache does SQLite I/O; keep it off the event loop
+            cached = await asyncio.to_thread(cache.get, key)
+            if cached is not None:
+                return ModelResponse(**cached)
+        response = await self._raw_acompletion(messages, stop_sequences, **kwargs)
+        if cache is not None:
+            await asyncio.to_thread(cache.put, key, response.model_dump())
+        return response
 
 @functools.lru_cache(maxsize=1)
 def get_model_object():
@@ -118,3 +293,20 @@ def get_instructor_client():
             openai.OpenAI(base_url=model.api_base, api_key="placeholder"),
             mode=instructor.Mode.JSON
         )
+
+@functools.lru_cache(maxsize=1)
+def get_async_instructor_client():
+    model = get_model_object()
+    if model.provider == "openai":
+        import openai
+        return instructor.from_openai(openai.AsyncOpenAI(api_key=model.api_key))
+    elif model.provider == "anthropic":
+        import anthropic
+        return instructor.from_anthropic(anthropic.AsyncAnthropic(api_key=model.api_key))
+    else:
+        # Fallback for generic/LiteLLM support
+        import openai
+        return instructor.from_openai(
+            openai.AsyncOpenAI(base_url=model.api_base, api_key="placeholder"),
+            mode=instructor.Mode.JSON
+        )
@@ -0,0 +1,137 @@
+"""
+Content-addressed cache for LiteLLM completions.
+
+Responses are keyed by a SHA-256 of (model_id, messages, stop sequences,
+sampling kwargs) and kept in an in-process LRU in front of a SQLite table, so
+repeated prompts (retries, nightly re-runs, replays) skip the network:
+
+    LLM_CACHE=true                     (default: false)
+    LLM_CACHE_PATH=.cache/llm.db
+    LLM_CACHE_TTL=0                    (seconds, 0 = never expire)
+    LLM_CACHE_MAX_ENTRIES=10000        (oldest-used rows are evicted beyond this)
+
+Pass `bypass_cache=True` to `generate` / `__call__` for calls that must not be
+served from (or stored in) the cache, e.g. deliberately sampled outputs.
+"""
+import functools
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Optional
+from pydantic_core import to_jsonable_python
+from .storage.cache import LRU
+from .storage.sqlite import connect
+
+# Connection details that don't change the answer
+_IGNORED_KWARGS = {"api_key", "bypass_cache"}
+
+
+def cache_key(model_id: str, messages, stop=None, **kwargs) -> str:
+    payload = {
+        "model": model_id,
+        "messages": messages,
+        "stop": stop,
+        "kwargs": {k: v for k, v in kwargs.items() if k not in _IGNORED_KWARGS},
+    }
+    blob = json.dumps(to_jsonable_python(payload, fallback=str), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    """Two-tier (memory LRU + SQLite) store of completion responses as JSON-compatible dicts."""
+
+    def __init__(
+        self,
+        db_path: str = ".cache/llm.db",
+        ttl: float = 0,
+        max_entries: int = 10000,
+        memory_size: int = 256,
+    ):
+        self.db_path = db_path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._memory = LRU(memory_size)
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._conn = connect(db_path)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_accessed ON llm_cache (accessed_at)")
+
+    def _expired(self, created_at: float, now: float) -> bool:
+        return bool(self.ttl) and now - created_at > self.ttl
+
+    def get(self, key: str) -> Optional[dict]:
+        now = time.time()
+        entry = self._memory.get(key, None)
+        if entry is not None:
+            if not self._expired(entry[0], now):
+                return entry[1]
+            self._memory.invalidate(key)
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT value, created_at FROM llm_cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row is None:
+                    return None
+                if self._expired(row[1], now):
+                    with self._conn:
+                        self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                    return None
+                with self._conn:
+                    self._conn.execute("UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (now, key))
+            value = json.loads(row[0])
+            self._memory.put(key, None, (row[1], value))
+            return value
+        except Exception as e:
+            print(f"[LLM Cache] Error reading: {e}")
+            return None
+
+    def put(self, key: str, value: dict):
+        now = time.time()
+        self._memory.put(key, None, (now, value))
+        try:
+            with self._lock, self._conn:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO llm_cache (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                    (key, json.dumps(value), now, now),
+                )
+                self._writes += 1
+                # Counting rows on every write would cost more than the insert itself
+                if self._writes % 100 == 0:
+                    self._evict(now)
+        except Exception as e:
+            print(f"[LLM Cache] Error saving: {e}")
+
+    def _evict(self, now: float):
+        if self.ttl:
+            self._conn.execute("DELETE FROM llm_cache WHERE created_at < ?", (now - self.ttl,))
+        excess = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0] - self.max_entries
+        if excess > 0:
+            self._conn.execute(
+                "DELETE FROM llm_cache WHERE key IN (SELECT key FROM llm_cache ORDER BY accessed_at LIMIT ?)",
+                (excess,),
+            )
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM llm_cache")
+        self._memory = LRU(self._memory.maxsize)
+
+
+@functools.lru_cache(maxsize=1)
+def get_llm_cache() -> Optional[LLMResponseCache]:
+    """The process-wide cache, or None when LLM_CACHE is not enabled."""
+    if os.getenv("LLM_CACHE", "false").lower() not in ("true", "1", "t", "yes"):
+        return None
+    return LLMResponseCache(
+        db_path=os.getenv("LLM_CACHE_PATH", ".cache/llm.db"),
+        ttl=float(os.getenv("LLM_CACHE_TTL", "0")),
+        max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", "10000")),
+    )
@@ -0,0 +1,184 @@
+"""
+Persisted MCP tool definitions, so flows get their MCP tools without waiting for
+a server connection and tool discovery.
+
+    POCKETFLOW_MCP_TOOL_CACHE=true                  (false: discover tools on every connection)
+    POCKETFLOW_MCP_TOOL_CACHE_PATH=.cache/mcp_tools.db
+
+The definitions of each server URL's tools (name, description, inputs, output
+schema) are stored with a version: a hash of those definitions, since MCP servers
+don't report one for their tool list. `cached_mcp_tools(urls)` builds proxy tools
+from the stored definitions right away and refreshes them from the server on a
+background thread, once per URL and process. A proxy only leases the pooled
+connection (`core.smolagents_factory.get_mcp_pool`) when an agent calls it.
+
+When a refresh finds a new version, the stored row and the proxies handed out
+from then on are replaced, and pooled agents built with the old proxies are
+discarded. URLs without stored definitions are discovered synchronously.
+"""
+import functools
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import List, Optional, Tuple
+from smolagents import Tool
+from .smolagents_factory import get_mcp_pool
+from .storage.sqlite import connect
+
+_FIELDS = ("name", "description", "inputs", "output_type", "output_schema")
+
+
+def _plain(value):
+    # MCP schemas may hold jsonref proxies, which json.dumps can't serialize
+    if hasattr(value, "items"):
+        return {str(k): _plain(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_plain(v) for v in value]
+    return value
+
+
+def tool_definition(tool) -> dict:
+    return {field: _plain(getattr(tool, field, None)) for field in _FIELDS}
+
+
+def definitions_version(definitions: List[dict]) -> str:
+    blob = json.dumps(definitions, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()[:16]
+
+
+class MCPProxyTool(Tool):
+    """A tool built from a stored definition that forwards calls to the live MCP tool of the same name."""
+
+    skip_forward_signature_validation = True
+
+    def __init__(self, server_url: str, definition: dict, version: str):
+        self.server_url = server_url
+        self.name = definition["name"]
+        self.description = definition["description"]
+        self.inputs = definition["inputs"]
+        self.output_type = definition["output_type"]
+        self.output_schema = definition.get("output_schema")
+        # Lets core.agent_pool reuse agents across proxies of the same tool version
+        self.pool_key = (server_url, self.name, version)
+        super().__init__()
+
+    def forward(self, *args, **kwargs):
+        with get_mcp_pool().lease([self.server_url]) as tools:
+            for tool in tools:
+                if tool.name == self.name:
+                    return tool.forward(*args, **kwargs)
+        raise ValueError(f"MCP server {self.server_url} no longer provides the tool '{self.name}'")
+
+
+class MCPToolCache:
+    """Stored tool definitions per server URL, plus the proxies built from their current version."""
+
+    def __init__(self, db_path: str = ".cache/mcp_tools.db"):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._proxies = {}  # url -> (version, [MCPProxyTool, ...])
+        self._refreshing = set()
+        self._conn = connect(db_path)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS mcp_tools ("
+                "url TEXT PRIMARY KEY, version TEXT NOT NULL, definitions TEXT NOT NULL, updated_at REAL NOT NULL)"
+            )
+
+    def load(self, url: str) -> Optional[Tuple[str, List[dict]]]:
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT version, definitions FROM mcp_tools WHERE url = ?", (url,)
+                ).fetchone()
+            return (row[0], json.loads(row[1])) if row else None
+        except Exception as e:
+            print(f"[MCP Tool Cache] Error reading: {e}")
+            return None
+
+    def save(self, url: str, version: str, definitions: List[dict]):
+        try:
+            with self._lock, self._conn:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO mcp_tools (url, version, definitions, updated_at) VALUES (?, ?, ?, ?)",
+                    (url, version, json.dumps(definitions, default=str), time.time()),
+                )
+        except Exception as e:
+            print(f"[MCP Tool Cache] Error saving: {e}")
+
+    def _use(self, url: str, version: str, definitions: List[dict]) -> List[MCPProxyTool]:
+        """The proxies for `version` of `url`'s tools, replacing (and un-pooling) those of an older one."""
+        with self._lock:
+            current = self._proxies.get(url)
+            if current and current[0] == version:
+                return current[1]
+            proxies = [MCPProxyTool(url, definition, version) for definition in definitions]
+            self._proxies[url] = (version, proxies)
+        if current:
+            print(f"[MCP Tool Cache] Tools of {url} changed ({current[0]} -> {version}).")
+            from .agent_pool import get_agent_pool
+            get_agent_pool().discard(current[1])
+        return proxies
+
+    def discover(self, url: str) -> List[MCPProxyTool]:
+        """Lists `url`'s tools over the pooled connection, stores them if they changed and returns the proxies."""
+        with get_mcp_pool().lease([url]) as tools:
+            definitions = [tool_definition(tool) for tool in tools]
+        version = definitions_version(definitions)
+        stored = self.load(url)
+        if stored is None or stored[0] != version:
+            self.save(url, version, definitions)
+        return self._use(url, version, definitions)
+
+    def _refresh(self, url: str):
+        try:
+            self.discover(url)
+        except Exception as e:
+            print(f"[MCP Tool Cache] Error refreshing {url}: {e}")
+
+    def refresh_in_background(self, url: str):
+        with self._lock:
+            if url in self._refreshing:
+                return
+            self._refreshing.add(url)
+        threading.Thread(target=self._refresh, args=(url,), name="mcp-tool-refresh", daemon=True).start()
+
+    def tools(self, urls: List[str]) -> List[MCPProxyTool]:
+        """Proxy tools for every reachable URL in `urls`, from stored definitions where available."""
+        result = []
+        for url in urls:
+            stored = self.load(url)
+            if stored is not None:
+                result.extend(self._use(url, *stored))
+                self.refresh_in_background(url)
+                continue
+            try:
+                result.extend(self.discover(url))
+                with self._lock:
+                    # Just discovered: no refresh needed in this process
+                    self._refreshing.add(url)
+            except Exception as e:
+                print(f"[MCP Tool Cache] MCP Connection Error for {url}: {e}")
+        return result
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM mcp_tools")
+            self._proxies.clear()
+            self._refreshing.clear()
+
+
+@functools.lru_cache(maxsize=1)
+def get_mcp_tool_cache() -> Optional[MCPToolCache]:
+    """The process-wide cache, or None when POCKETFLOW_MCP_TOOL_CACHE is disabled."""
+    if os.getenv("POCKETFLOW_MCP_TOOL_CACHE", "true").lower() not in ("true", "1", "t", "yes"):
+        return None
+    return MCPToolCache(db_path=os.getenv("POCKETFLOW_MCP_TOOL_CACHE_PATH", ".cache/mcp_tools.db"))
+
+
+def cached_mcp_tools(urls: List[str]) -> Optional[List[MCPProxyTool]]:
+    """Proxy tools for `urls`, or None when the cache is disabled."""
+    cache = get_mcp_tool_cache()
+    return cache.tools(urls) if cache is not None else None
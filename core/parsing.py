@@ -0,0 +1,175 @@
+"""
+Helpers shared by the sync and async PowerfulNode bases: namespace naming and
+JSON extraction from LLM/agent output. Patterns are compiled once at import.
+"""
+import ast
+import functools
+import json
+import re
+
+_FIRST_CAP_RE = re.compile(r"(.)([A-Z][a-z]+)")
+_ALL_CAP_RE = re.compile(r"([a-z0-9])([A-Z])")
+# "```json" (with trailing whitespace) and bare "```" fences, removed in one pass
+_FENCE_RE = re.compile(r"```(?:json\s*)?")
+
+
+@functools.lru_cache(maxsize=None)
+def namespace_for(cls: type) -> str:
+    """Snake_case of the class name without a trailing "Node" (e.g. MyNode -> my), once per class."""
+    name = cls.__name__
+    if name.endswith("Node"):
+        name = name[:-4]
+    name = _FIRST_CAP_RE.sub(r"\1_\2", name)
+    return _ALL_CAP_RE.sub(r"\1_\2", name).lower()
+
+
+# Strings are matched first so the glitch patterns never fire inside them
+_GLITCH_RE = re.compile(r'"(?:\\.|[^"\\])*"|,(?=\s*[}\]])|\b(?:True|False|None)\b')
+_PYTHON_LITERALS = {"True": "true", "False": "false", "None": "null"}
+_CLOSERS = {"}": "{", "]": "["}
+
+
+def json_spans(text: str, offset: int = 0):
+    """
+    Yields (start, end) of every top-level balanced {...} in `text`, in one pass.
+    Brackets are matched too, and braces inside JSON strings (escapes respected)
+    don't count. Quotes in surrounding prose are ignored. A stray "{" that is never
+    closed is skipped by rescanning from just after it.
+    """
+    while True:
+        unclosed = yield from _scan_spans(text, offset)
+        if unclosed is None:
+            return
+        offset = unclosed + 1
+
+
+def _scan_spans(text: str, offset: int):
+    """Scans from `offset`; returns the start of an object left open at the end, if any."""
+    stack = []
+    start = 0
+    in_string = escaped = False
+    for i in range(offset, len(text)):
+        ch = text[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+        elif ch in "{[":
+            if not stack:
+                if ch == "[":
+                    continue
+                start = i
+            stack.append(ch)
+        elif not stack:
+            continue
+        elif ch == '"':
+            in_string = True
+        elif ch in _CLOSERS:
+            if stack[-1] != _CLOSERS[ch]:
+                stack.clear()  # Mismatched: not JSON, start over
+                continue
+            stack.pop()
+            if not stack:
+                yield start, i + 1
+    return start if stack else None
+
+
+def _fix_glitches(span: str):
+    fixes = []
+
+    def fix(match):
+        token = match.group(0)
+        if token[0] == '"':
+            return token
+        if token == ",":
+            fixes.append("trailing_comma")
+            return ""
+        fixes.append("python_literal")
+        return _PYTHON_LITERALS[token]
+
+    fixed = _GLITCH_RE.sub(fix, span)
+    return fixed, sorted(set(fixes))
+
+
+def _parse_span(span: str):
+    """Returns (dict, fixes) or None. Tries strict JSON, then common LLM glitches, then a Python literal."""
+    try:
+        data = json.loads(span)
+        return (data, []) if isinstance(data, dict) else None
+    except ValueError:
+        pass
+    fixed, fixes = _fix_glitches(span)
+    if fixes:
+        try:
+            data = json.loads(fixed)
+            return (data, fixes) if isinstance(data, dict) else None
+        except ValueError:
+            pass
+    try:
+        # e.g. {'key': 'value'} from models that answer in Python syntax
+        data = ast.literal_eval(span)
+        return (data, ["python_dict"]) if isinstance(data, dict) else None
+    except (ValueError, SyntaxError, MemoryError, RecursionError):
+        return None
+
+
+def iter_json_candidates(content):
+    """
+    Yields (dict, fixes) for each JSON object found in `content`, best guess first:
+    the span from the first "{" to the last "}" (the historic behaviour), then every
+    balanced top-level object, largest first. `fixes` names the repairs applied,
+    e.g. ["trailing_comma"]; it is empty for strict JSON.
+    """
+    if isinstance(content, dict):
+        yield content, []
+        return
+    if not isinstance(content, str):
+        raise ValueError("Content is not dict or string")
+
+    # Fences hold no braces, so they only need stripping when they sit inside an object
+    if "```" in content:
+        content = _FENCE_RE.sub("", content)
+    start = content.find("{")
+    end = content.rfind("}")
+    if start == -1 or end == -1:
+        return
+    parsed = _parse_span(content[start:end + 1])
+    if parsed is not None:
+        yield parsed
+    # Only scan when the common case didn't settle it (callers usually stop at the first candidate)
+    for span_start, span_end in sorted(json_spans(content, start), key=lambda span: span[0] - span[1]):
+        if (span_start, span_end) == (start, end + 1):
+            continue
+        parsed = _parse_span(content[span_start:span_end])
+        if parsed is not None:
+            yield parsed
+
+
+def extract_json_with_fixes(content):
+    """The first candidate of `iter_json_candidates`; raises ValueError if there is none."""
+    for data, fixes in iter_json_candidates(content):
+        return data, fixes
+    raise ValueError("No JSON found")
+
+
+def extract_json(content):
+    """Parses the JSON object in `content` (markdown fences, prose and common glitches tolerated)."""
+    return extract_json_with_fixes(content)[0]
+
+
+def parse_model(content, response_model):
+    """
+    Validates the JSON candidates of `content` against `response_model`, best guess
+    first, and returns (instance, fixes) for the first that fits. Raises the last
+    error when none does, so the caller can fall back to an LLM repair.
+    """
+    error = ValueError("No JSON found")
+    for data, fixes in iter_json_candidates(content):
+        try:
+            return response_model(**data), fixes
+        except Exception as e:
+            error = e
+    raise error
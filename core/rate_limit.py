@@ -0,0 +1,186 @@
+"""
+Process-wide request/token rate limiting for LLM calls.
+
+    LLM_MAX_RPM=0                 (requests per minute, 0 = unlimited)
+    LLM_MAX_TPM=0                 (tokens per minute, 0 = unlimited)
+    LLM_RATE_LIMIT_RETRIES=5      (retries after a 429 before giving up)
+
+Every `LiteLLMModel` completion and instructor repair call (see `limited_call`)
+takes a request and its estimated tokens from shared token buckets, so parallel nodes together stay under the provider limits.
+A 429 that still gets through pauses all callers with exponential backoff
+(honouring Retry-After when the provider sends one), which eases off again as
+calls succeed.
+"""
+import asyncio
+import functools
+import os
+import random
+import threading
+import time
+from typing import Any, Awaitable, Callable, Optional
+
+
+class TokenBucket:
+    """Refills `rate_per_minute` units per minute up to `capacity`; `take` returns how long to wait."""
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity or rate_per_minute
+        self._level = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def take(self, amount: float) -> float:
+        """Reserves `amount` (possibly going into debt) and returns the seconds until it is covered."""
+        with self._lock:
+            now = time.monotonic()
+            self._level = min(self.capacity, self._level + (now - self._updated) * self.rate)
+            self._updated = now
+            # Requests larger than the bucket could never be served otherwise
+            self._level -= min(amount, self.capacity)
+            return 0.0 if self._level >= 0 else -self._level / self.rate
+
+    def give_back(self, amount: float):
+        with self._lock:
+            self._level = min(self.capacity, self._level + amount)
+
+
+class RateLimiter:
+    """Requests-per-minute and tokens-per-minute buckets plus a shared 429 backoff."""
+
+    def __init__(self, rpm: float = 0, tpm: float = 0, max_retries: int = 5, max_backoff: float = 60.0):
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+        self.max_retries = max_retries
+        self.max_backoff = max_backoff
+        self._backoff = 0.0
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _reserve(self, tokens: int) -> float:
+        wait = self._paused_until - time.monotonic()
+        if self.requests:
+            wait = max(wait, self.requests.take(1))
+        if self.tokens and tokens:
+            wait = max(wait, self.tokens.take(tokens))
+        return max(wait, 0.0)
+
+    def acquire(self, tokens: int = 0):
+        wait = self._reserve(tokens)
+        if wait:
+            time.sleep(wait)
+
+    async def acquire_async(self, tokens: int = 0):
+        wait = self._reserve(tokens)
+        if wait:
+            await asyncio.sleep(wait)
+
+    def record_usage(self, estimated: int, actual: int):
+        """Corrects the token bucket once the real usage of a call is known."""
+        if not self.tokens or actual is None:
+            return
+        if actual > estimated:
+            self.tokens.take(actual - estimated)
+        elif actual < estimated:
+            self.tokens.give_back(estimated - actual)
+
+    def on_success(self):
+        with self._lock:
+            self._backoff /= 2
+            if self._backoff < 0.5:
+                self._backoff = 0.0
+
+    def on_rate_limited(self, retry_after: Optional[float] = None) -> float:
+        """Pauses every caller and returns the delay before the failed call may retry."""
+        with self._lock:
+            self._backoff = min(self.max_backoff, max(1.0, self._backoff * 2))
+            delay = retry_after if retry_after else self._backoff * (1 + random.random() * 0.25)
+            self._paused_until = max(self._paused_until, time.monotonic() + delay)
+            return delay
+
+
+def estimate_tokens(messages, max_tokens: Optional[int] = None) -> int:
+    """Rough prompt size (~4 characters per token) plus the completion budget."""
+    chars = 0
+    for message in messages:
+        content = message.get("content") if isinstance(message, dict) else getattr(message, "content", "")
+        chars += len(content) if isinstance(content, str) else len(str(content or ""))
+    return chars // 4 + (max_tokens or 0)
+
+
+def retry_after(error: Exception) -> Optional[float]:
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def rate_limit_error(error: BaseException) -> Optional[BaseException]:
+    """The 429 behind `error` (litellm's or a provider SDK's, possibly wrapped by instructor), if any."""
+    for _ in range(5):
+        if error is None:
+            return None
+        if type(error).__name__ == "RateLimitError" or getattr(error, "status_code", None) == 429:
+            return error
+        error = error.__cause__
+    return None
+
+
+def usage_tokens(response) -> Optional[int]:
+    """Total tokens reported by an OpenAI/LiteLLM- or Anthropic-style response, if any."""
+    usage = getattr(response, "usage", None)
+    total = getattr(usage, "total_tokens", None)
+    if total is None and getattr(usage, "input_tokens", None) is not None:
+        total = usage.input_tokens + (getattr(usage, "output_tokens", None) or 0)
+    return total
+
+
+def limited_call(call: Callable[[], Any], messages, max_tokens: Optional[int] = None, usage=usage_tokens):
+    """Runs `call()` under the process-wide limiter, retrying 429s with backoff; `usage(result)` corrects the estimate."""
+    limiter = get_rate_limiter()
+    estimated = estimate_tokens(messages, max_tokens)
+    for attempt in range(limiter.max_retries + 1):
+        limiter.acquire(estimated)
+        try:
+            result = call()
+        except Exception as e:
+            limited = rate_limit_error(e)
+            if limited is None or attempt == limiter.max_retries:
+                raise
+            delay = limiter.on_rate_limited(retry_after(limited))
+            print(f"[LLM] Rate limited, retrying in {delay:.1f}s ({attempt + 1}/{limiter.max_retries})")
+            continue
+        limiter.on_success()
+        limiter.record_usage(estimated, usage(result))
+        return result
+
+
+async def alimited_call(call: Callable[[], Awaitable], messages, max_tokens: Optional[int] = None, usage=usage_tokens):
+    """Async `limited_call`: waits for the limiter without blocking the event loop."""
+    limiter = get_rate_limiter()
+    estimated = estimate_tokens(messages, max_tokens)
+    for attempt in range(limiter.max_retries + 1):
+        await limiter.acquire_async(estimated)
+        try:
+            result = await call()
+        except Exception as e:
+            limited = rate_limit_error(e)
+            if limited is None or attempt == limiter.max_retries:
+                raise
+            delay = limiter.on_rate_limited(retry_after(limited))
+            print(f"[LLM] Rate limited, retrying in {delay:.1f}s ({attempt + 1}/{limiter.max_retries})")
+            continue
+        limiter.on_success()
+        limiter.record_usage(estimated, usage(result))
+        return result
+
+
+@functools.lru_cache(maxsize=1)
+def get_rate_limiter() -> RateLimiter:
+    return RateLimiter(
+        rpm=float(os.getenv("LLM_MAX_RPM", "0")),
+        tpm=float(os.getenv("LLM_MAX_TPM", "0")),
+        max_retries=int(os.getenv("LLM_RATE_LIMIT_RETRIES", "5")),
+    )
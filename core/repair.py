@@ -0,0 +1,311 @@
+"""
+Local, schema-aware repair of LLM output that parsed as JSON but failed validation,
+and compact prompts for the LLM repair when local repair isn't enough.
+
+Mechanical mistakes (numbers or booleans as strings, "$1,234.50", a single value
+where a list is expected, {"result": {...}} wrappers, "Target Price" instead of
+"target_price", null for a field that has a default) are fixed by walking the
+model's JSON schema, so only genuinely wrong answers need an LLM repair call.
+"""
+import functools
+import json
+import os
+import re
+from typing import Any, Dict, List, Tuple
+from .parsing import iter_json_candidates, json_spans
+
+_NUMBER_JUNK_RE = re.compile(r"[\s,$€£%_]")
+_KEY_JUNK_RE = re.compile(r"[^a-z0-9]")
+_TRUE = {"true", "yes", "y", "1", "on"}
+_FALSE = {"false", "no", "n", "0", "off", "none", "null", ""}
+_MAX_UNWRAP = 3
+
+
+@functools.lru_cache(maxsize=256)
+def _schema(response_model) -> dict:
+    return response_model.model_json_schema()
+
+
+def _normalize_key(key: str) -> str:
+    return _KEY_JUNK_RE.sub("", str(key).lower())
+
+
+class _Coercer:
+    def __init__(self, schema: dict):
+        self.defs = schema.get("$defs", {})
+        self.fixes: List[str] = []
+
+    def resolve(self, schema: dict) -> dict:
+        while "$ref" in schema:
+            schema = self.defs[schema["$ref"].rsplit("/", 1)[-1]]
+        return schema
+
+    def coerce(self, value: Any, schema: dict) -> Any:
+        schema = self.resolve(schema)
+        options = schema.get("anyOf") or schema.get("oneOf")
+        if options:
+            return self.coerce_any(value, options)
+        if "enum" in schema:
+            return self.coerce_enum(value, schema["enum"])
+        kind = schema.get("type")
+        if kind == "object":
+            return self.coerce_object(value, schema)
+        if kind == "array":
+            return self.coerce_array(value, schema)
+        if kind in ("integer", "number"):
+            return self.coerce_number(value, kind)
+        if kind == "boolean":
+            return self.coerce_bool(value)
+        if kind == "string":
+            return self.coerce_string(value)
+        return value
+
+    def allows_null(self, schema: dict) -> bool:
+        schema = self.resolve(schema)
+        if schema.get("type") == "null" or (isinstance(schema.get("type"), list) and "null" in schema["type"]):
+            return True
+        options = schema.get("anyOf") or schema.get("oneOf") or []
+        return any(self.resolve(o).get("type") == "null" for o in options)
+
+    def coerce_any(self, value, options):
+        if value is None and any(self.resolve(o).get("type") == "null" for o in options):
+            return None
+        for option in options:
+            option = self.resolve(option)
+            if option.get("type") == "null":
+                continue
+            before = len(self.fixes)
+            coerced = self.coerce(value, option)
+            if _matches(coerced, option):
+                return coerced
+            del self.fixes[before:]
+        return value
+
+    def coerce_enum(self, value, choices):
+        if value in choices or not isinstance(value, str):
+            return value
+        for choice in choices:
+            if isinstance(choice, str) and choice.lower() == value.strip().lower():
+                self.fixes.append("enum_case")
+                return choice
+        return value
+
+    def coerce_object(self, value, schema):
+        if isinstance(value, str):
+            try:
+                value = json.loads(value)
+                self.fixes.append("json_string")
+            except ValueError:
+                return value
+        if not isinstance(value, dict):
+            return value
+        properties = schema.get("properties", {})
+        if not properties:
+            return value
+        value = self.unwrap(value, properties)
+
+        by_key = {}
+        for name, prop in properties.items():
+            by_key[_normalize_key(name)] = name
+            alias = self.resolve(prop).get("title")
+            if alias:
+                by_key.setdefault(_normalize_key(alias), name)
+
+        result = {}
+        for key, item in value.items():
+            name = key if key in properties else by_key.get(_normalize_key(key))
+            if name is None:
+                result[key] = item
+                continue
+            if name != key:
+                self.fixes.append("key_name")
+            prop = self.resolve(properties[name])
+            if item is None and "default" in prop and prop["default"] is not None and not self.allows_null(prop):
+                # Let the model's default apply instead of an invalid null
+                self.fixes.append("default")
+                continue
+            result[name] = self.coerce(item, properties[name])
+        return result
+
+    def unwrap(self, value: dict, properties: dict) -> dict:
+        """{"result": {...fields...}} -> {...fields...} when the inner dict fits the schema better."""
+        wanted = {_normalize_key(name) for name in properties}
+        for _ in range(_MAX_UNWRAP):
+            if len(value) != 1:
+                break
+            (key, inner), = value.items()
+            if not isinstance(inner, dict) or _normalize_key(key) in wanted:
+                break
+            if not wanted & {_normalize_key(k) for k in inner}:
+                break
+            self.fixes.append("unwrap")
+            value = inner
+        return value
+
+    def coerce_array(self, value, schema):
+        if isinstance(value, str):
+            try:
+                parsed = json.loads(value)
+            except ValueError:
+                parsed = None
+            if isinstance(parsed, list):
+                self.fixes.append("json_string")
+                value = parsed
+        if isinstance(value, (tuple, set)):
+            value = list(value)
+        if not isinstance(value, list):
+            if value is None:
+                return value
+            self.fixes.append("wrap_list")
+            value = [value]
+        items = schema.get("items")
+        return [self.coerce(item, items) for item in value] if items else value
+
+    def coerce_number(self, value, kind):
+        if isinstance(value, bool):
+            return value
+        if isinstance(value, str):
+            text = _NUMBER_JUNK_RE.sub("", value)
+            try:
+                number = float(text)
+            except ValueError:
+                return value
+            self.fixes.append("number_string")
+            value = number
+        if kind == "integer" and isinstance(value, float) and value.is_integer():
+            return int(value)
+        return value
+
+    def coerce_bool(self, value):
+        if isinstance(value, str):
+            text = value.strip().lower()
+            if text in _TRUE or text in _FALSE:
+                self.fixes.append("bool_string")
+                return text in _TRUE
+        if isinstance(value, (int, float)) and not isinstance(value, bool) and value in (0, 1):
+            self.fixes.append("bool_number")
+            return bool(value)
+        return value
+
+    def coerce_string(self, value):
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            self.fixes.append("number_to_string")
+            return str(value)
+        return value
+
+
+def _matches(value, schema: dict) -> bool:
+    kind = schema.get("type")
+    checks = {
+        "object": lambda v: isinstance(v, dict),
+        "array": lambda v: isinstance(v, list),
+        "string": lambda v: isinstance(v, str),
+        "integer": lambda v: isinstance(v, int) and not isinstance(v, bool),
+        "number": lambda v: isinstance(v, (int, float)) and not isinstance(v, bool),
+        "boolean": lambda v: isinstance(v, bool),
+    }
+    return kind not in checks or checks[kind](value)
+
+
+def coerce_to_schema(data: Dict[str, Any], response_model) -> Tuple[Dict[str, Any], List[str]]:
+    """Returns `data` coerced towards `response_model`'s JSON schema and the fixes applied."""
+    coercer = _Coercer(_schema(response_model))
+    coerced = coercer.coerce(data, _schema(response_model))
+    return coerced, sorted(set(coercer.fixes))
+
+
+def repair_model(content, response_model):
+    """
+    Tries every JSON candidate in `content` through `coerce_to_schema` and returns
+    (instance, fixes) for the first that validates. Raises the last error otherwise.
+    """
+    error = ValueError("No JSON found")
+    for data, parse_fixes in iter_json_candidates(content):
+        try:
+            coerced, fixes = coerce_to_schema(data, response_model)
+            return response_model.model_validate(coerced), sorted(set(parse_fixes + fixes))
+        except Exception as e:
+            error = e
+    raise error
+
+
+# Same rough ratio as core.rate_limit.estimate_tokens
+_CHARS_PER_TOKEN = 4
+
+
+# Keywords whose values map names (fields, definitions) to schemas rather than being schemas
+_SCHEMA_MAPS = {"properties", "$defs", "definitions", "patternProperties"}
+# Keywords whose values are instance data, kept verbatim
+_DATA_KEYWORDS = {"default", "enum", "const", "examples"}
+
+
+def _strip_titles(node):
+    """Drops the `title` metadata of every schema node, keeping fields that happen to be named "title"."""
+    if isinstance(node, list):
+        return [_strip_titles(v) for v in node]
+    if not isinstance(node, dict):
+        return node
+    result = {}
+    for key, value in node.items():
+        if key == "title":
+            continue
+        if key in _DATA_KEYWORDS:
+            result[key] = value
+        elif key in _SCHEMA_MAPS and isinstance(value, dict):
+            result[key] = {name: _strip_titles(schema) for name, schema in value.items()}
+        else:
+            result[key] = _strip_titles(value)
+    return result
+
+
+@functools.lru_cache(maxsize=256)
+def compact_schema(response_model) -> str:
+    """The model's JSON schema without titles, in minimal JSON: what the repair model needs to target."""
+    return json.dumps(_strip_titles(_schema(response_model)), separators=(",", ":"))
+
+
+def _truncate(text: str, limit: int, keep: str = "head") -> str:
+    if len(text) <= limit:
+        return text
+    marker = f"...[{len(text) - limit} chars truncated]..."
+    limit = max(limit - len(marker), 0)
+    return text[:limit] + marker if keep == "head" else marker + text[len(text) - limit:]
+
+
+def condense(content: str, max_chars: int) -> str:
+    """
+    Shortens `content` to about `max_chars`, keeping the largest JSON-looking region
+    whole where possible and spending what is left on the text just around it.
+    """
+    if len(content) <= max_chars:
+        return content
+    spans = list(json_spans(content))
+    if spans:
+        start, end = max(spans, key=lambda span: span[1] - span[0])
+    else:
+        start, end = content.find("{"), content.rfind("}") + 1
+        if start == -1 or end <= start:
+            return _truncate(content, max_chars)
+    region = _truncate(content[start:end], max_chars)
+    context = max(max_chars - len(region), 0) // 2
+    before = _truncate(content[:start], context, keep="tail") if context else ""
+    after = _truncate(content[end:], context) if context else ""
+    return before + region + after
+
+
+def repair_token_budget() -> int:
+    return int(os.getenv("LLM_REPAIR_MAX_TOKENS", "2000"))
+
+
+def build_repair_messages(content, response_model, system_prompt: str, max_tokens: int = None) -> List[dict]:
+    """
+    Messages for an LLM repair call: the node's system prompt plus the target schema,
+    and the raw output condensed so the whole request stays within `max_tokens`
+    (default: LLM_REPAIR_MAX_TOKENS).
+    """
+    budget = (max_tokens or repair_token_budget()) * _CHARS_PER_TOKEN
+    system = f"{system_prompt}\n\nReturn only JSON matching this schema:\n{compact_schema(response_model)}"
+    return [
+        {"role": "system", "content": system},
+        {"role": "user", "content": condense(str(content), max(budget - len(system), 200))},
+    ]
@@ -0,0 +1,240 @@
+"""
+Record/replay of LLM, instructor and tool calls, for offline runs and benchmarks.
+
+    POCKETFLOW_REPLAY_MODE=off|record|replay     (default: off)
+    POCKETFLOW_REPLAY_CASSETTE=.cassettes/default.jsonl
+    POCKETFLOW_REPLAY_LATENCY=0                  (seconds per replayed call, or "recorded")
+
+In record mode every `LiteLLMModel` completion (a streamed one as its text and
+usage), every `_llm_repair` instructor call and every agent tool's `forward` is
+executed normally and appended to the cassette. In replay mode the same calls are answered from the cassette instead,
+so a flow runs end-to-end without providers and measures only the orchestration
+layer. Calls are matched by a hash of their request plus how many times that
+request was seen before, so repeated identical calls replay in recorded order.
+"""
+import asyncio
+import functools
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, Callable, Optional
+from pydantic_core import to_jsonable_python
+
+
+class CassetteMissError(LookupError):
+    """Raised in replay mode when a call was not recorded."""
+
+
+def request_hash(kind: str, request: Any) -> str:
+    blob = json.dumps(to_jsonable_python(request, fallback=str), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(f"{kind}:{blob}".encode("utf-8")).hexdigest()
+
+
+class Cassette:
+    """A JSON Lines file of recorded calls: {"kind", "key", "n", "duration", "response"} per line."""
+
+    def __init__(self, path: str, mode: str = "replay", latency: str = "0"):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown replay mode '{mode}'. Available: ['off', 'record', 'replay']")
+        self.path = path
+        self.mode = mode
+        self.latency = latency
+        self._counts = {}
+        self._lock = threading.Lock()
+        self._entries = {}
+        if mode == "replay":
+            self._load()
+        else:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            # A new recording replaces the previous one
+            open(path, "w").close()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            raise FileNotFoundError(f"Cassette not found: {self.path}")
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    self._entries[(entry["key"], entry["n"])] = entry
+
+    def _next_occurrence(self, key: str) -> int:
+        with self._lock:
+            n = self._counts.get(key, 0)
+            self._counts[key] = n + 1
+            return n
+
+    def _delay(self, entry: dict) -> float:
+        if self.latency == "recorded":
+            return entry.get("duration", 0)
+        return float(self.latency)
+
+    def _recorded(self, kind: str, key: str, n: int) -> dict:
+        entry = self._entries.get((key, n))
+        if entry is None:
+            raise CassetteMissError(f"No recorded {kind} call #{n} for request {key[:12]} in {self.path}")
+        return entry
+
+    def _record(self, kind: str, key: str, n: int, duration: float, response: Any):
+        entry = {"kind": kind, "key": key, "n": n, "duration": round(duration, 6), "response": response}
+        line = json.dumps(entry, default=str) + "\n"
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+
+    def call(self, kind: str, request: Any, call: Callable, encode: Callable, decode: Callable):
+        key = request_hash(kind, request)
+        n = self._next_occurrence(key)
+        if self.mode == "replay":
+            entry = self._recorded(kind, key, n)
+            delay = self._delay(entry)
+            if delay > 0:
+                time.sleep(delay)
+            return decode(entry["response"])
+
+        start = time.perf_counter()
+        result = call()
+        self._record(kind, key, n, time.perf_counter() - start, encode(result))
+        return result
+
+    async def acall(self, kind: str, request: Any, call: Callable, encode: Callable, decode: Callable):
+        """Like `call`, for a coroutine function `call`; replay latency doesn't block the event loop."""
+        key = request_hash(kind, request)
+        n = self._next_occurrence(key)
+        if self.mode == "replay":
+            entry = self._recorded(kind, key, n)
+            delay = self._delay(entry)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            return decode(entry["response"])
+
+        start = time.perf_counter()
+        result = await call()
+        self._record(kind, key, n, time.perf_counter() - start, encode(result))
+        return result
+
+    def stream(self, kind: str, request: Any, call: Callable, encode: Callable, decode: Callable):
+        """
+        Like `call`, for a `call` returning an iterable of chunks: they are passed
+        through as they arrive and `encode(chunks)` is recorded once the stream is
+        exhausted; in replay mode the chunks come from `decode(recorded)`.
+        """
+        key = request_hash(kind, request)
+        n = self._next_occurrence(key)
+        if self.mode == "replay":
+            entry = self._recorded(kind, key, n)
+            delay = self._delay(entry)
+            if delay > 0:
+                time.sleep(delay)
+            return iter(decode(entry["response"]))
+        return self._record_stream(kind, key, n, call, encode)
+
+    def _record_stream(self, kind, key, n, call, encode):
+        start = time.perf_counter()
+        chunks = []
+        for chunk in call():
+            chunks.append(chunk)
+            yield chunk
+        self._record(kind, key, n, time.perf_counter() - start, encode(chunks))
+
+    async def astream(self, kind: str, request: Any, call: Callable, encode: Callable, decode: Callable):
+        """Async `stream`: `call` is a coroutine function returning an async iterable."""
+        key = request_hash(kind, request)
+        n = self._next_occurrence(key)
+        if self.mode == "replay":
+            entry = self._recorded(kind, key, n)
+            delay = self._delay(entry)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            return _aiter(decode(entry["response"]))
+        return self._arecord_stream(kind, key, n, call, encode)
+
+    async def _arecord_stream(self, kind, key, n, call, encode):
+        start = time.perf_counter()
+        chunks = []
+        async for chunk in await call():
+            chunks.append(chunk)
+            yield chunk
+        self._record(kind, key, n, time.perf_counter() - start, encode(chunks))
+
+
+async def _aiter(items):
+    for item in items:
+        yield item
+
+
+@functools.lru_cache(maxsize=1)
+def get_cassette() -> Optional[Cassette]:
+    """The process-wide cassette, or None when POCKETFLOW_REPLAY_MODE is off."""
+    mode = os.getenv("POCKETFLOW_REPLAY_MODE", "off").lower()
+    if mode == "off":
+        return None
+    return Cassette(
+        path=os.getenv("POCKETFLOW_REPLAY_CASSETTE", ".cassettes/default.jsonl"),
+        mode=mode,
+        latency=os.getenv("POCKETFLOW_REPLAY_LATENCY", "0").lower(),
+    )
+
+
+def replay_call(kind: str, request: Any, call: Callable, encode: Callable = None, decode: Callable = None):
+    """
+    Runs `call()` directly, records it, or answers it from the cassette, depending
+    on the replay mode. `encode` turns the result into JSON-compatible data and
+    `decode` reverses it (defaults: `to_jsonable_python` and identity).
+    """
+    cassette = get_cassette()
+    if cassette is None:
+        return call()
+    encode = encode or (lambda result: to_jsonable_python(result, fallback=str))
+    decode = decode or (lambda data: data)
+    return cassette.call(kind, request, call, encode, decode)
+
+
+async def areplay_call(kind: str, request: Any, call: Callable, encode: Callable = None, decode: Callable = None):
+    """Async `replay_call`: `call` is a coroutine function."""
+    cassette = get_cassette()
+    if cassette is None:
+        return await call()
+    encode = encode or (lambda result: to_jsonable_python(result, fallback=str))
+    decode = decode or (lambda data: data)
+    return await cassette.acall(kind, request, call, encode, decode)
+
+
+def replay_stream(kind: str, request: Any, call: Callable, encode: Callable, decode: Callable):
+    """
+    `replay_call` for streaming calls: returns `call()` when replay is off, otherwise
+    an iterator of chunks that is recorded as `encode(chunks)` or replayed from
+    `decode(recorded)`.
+    """
+    cassette = get_cassette()
+    if cassette is None:
+        return call()
+    return cassette.stream(kind, request, call, encode, decode)
+
+
+async def areplay_stream(kind: str, request: Any, call: Callable, encode: Callable, decode: Callable):
+    """Async `replay_stream`: `call` is a coroutine function returning an async iterable."""
+    cassette = get_cassette()
+    if cassette is None:
+        return await call()
+    return await cassette.astream(kind, request, call, encode, decode)
+
+
+def record_tool(tool):
+    """Routes `tool.forward` through `replay_call`; a no-op when replay is off."""
+    if get_cassette() is None or getattr(tool, "_replay_wrapped", False):
+        return tool
+    forward = tool.forward
+
+    @functools.wraps(forward)
+    def replayed_forward(*args, **kwargs):
+        request = {"tool": tool.name, "args": args, "kwargs": kwargs}
+        return replay_call("tool", request, lambda: forward(*args, **kwargs))
+
+    tool.forward = replayed_forward
+    tool._replay_wrapped = True
+    return tool
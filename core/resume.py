@@ -0,0 +1,138 @@
+"""
+Resume a flow from its last checkpoint instead of re-running finished nodes.
+
+Every PowerfulNode checkpoint records the node that wrote it (`checkpoint_id`,
+defaulting to the class name) and the action it returned. `resume_flow` loads
+that state, rebuilds `shared` (including Pydantic models), finds the node in the
+graph and continues from its successor for the recorded action.
+
+Call `label_flow_nodes(flow)` on the freshly built flow before both the original
+run and the resumed one, so nodes of the same class get distinct, stable ids.
+"""
+import copy
+import importlib
+from collections import deque
+from typing import Dict, List, Optional
+from pocketflow import AsyncNode, Flow
+from .storage.base import FlowState
+from .storage.registry import get_state_persistence
+
+
+def _walk(flow: Flow):
+    """Yields the nodes reachable from `flow.start_node` in breadth-first order."""
+    seen, pending = set(), deque([flow.start_node] if flow.start_node else [])
+    while pending:
+        node = pending.popleft()
+        if id(node) in seen:
+            continue
+        seen.add(id(node))
+        yield node
+        pending.extend(node.successors.values())
+
+
+def label_flow_nodes(flow: Flow, prefix: str = "") -> Dict[str, List]:
+    """
+    Assigns `checkpoint_id` to every node of `flow` (nested flows included, as
+    "Outer/Inner") and returns id -> path of nodes from the top-level flow down.
+    Ids already set on a node are kept; repeated class names get "#2", "#3"...
+    """
+    labels, counts = {}, {}
+    for node in _walk(flow):
+        node_id = getattr(node, "checkpoint_id", None)
+        if node_id is None:
+            name = node.__class__.__name__
+            counts[name] = counts.get(name, 0) + 1
+            node_id = prefix + (name if counts[name] == 1 else f"{name}#{counts[name]}")
+            node.checkpoint_id = node_id
+        labels[node_id] = [node]
+        if isinstance(node, Flow):
+            for inner_id, path in label_flow_nodes(node, prefix=f"{node_id}/").items():
+                labels[inner_id] = [node] + path
+    return labels
+
+
+def _find_path(flow: Flow, node_id: str) -> Optional[List]:
+    labels = label_flow_nodes(flow)
+    if node_id in labels:
+        return labels[node_id]
+    # Checkpoints written without labelling carry the bare class name
+    matches = [path for path in labels.values() if path[-1].__class__.__name__ == node_id]
+    return matches[0] if len(matches) == 1 else None
+
+
+def _import_model(path: str):
+    module, _, qualname = path.partition(":")
+    obj = importlib.import_module(module)
+    for part in qualname.split("."):
+        obj = getattr(obj, part)
+    return obj
+
+
+def restore_shared(state: FlowState) -> dict:
+    """Rebuilds the `shared` dict from a checkpoint, re-validating recorded Pydantic models."""
+    shared = copy.deepcopy(state.data)
+    for ns, fields in state.models.items():
+        for key, path in fields.items():
+            if key not in shared.get(ns, {}):
+                continue
+            try:
+                shared[ns][key] = _import_model(path).model_validate(shared[ns][key])
+            except Exception as e:
+                print(f"[Resume] Could not restore {ns}.{key} as {path}: {e}")
+    return shared
+
+
+def _continuation(flow: Flow, node, action):
+    """A copy of `flow` starting at the successor of `node` for `action`, or None if the flow ends there."""
+    successor = flow.get_next_node(node, action)
+    if successor is None:
+        return None
+    resumed = copy.copy(flow)
+    resumed.start_node = successor
+    return resumed
+
+
+def _load(flow: Flow, session_id: str, persistence):
+    persistence = persistence or get_state_persistence()
+    state = persistence.load_state(session_id)
+    if state is None:
+        raise ValueError(f"No checkpoint found for session '{session_id}'")
+    shared = restore_shared(state)
+    if state.last_node is None:
+        return shared, None, None
+    path = _find_path(flow, state.last_node)
+    if path is None:
+        raise ValueError(f"Checkpointed node '{state.last_node}' is not part of this flow")
+    # Parent flows of the node, innermost first, each paired with the child node it contains
+    parents = list(zip([flow] + path[:-1], path))[::-1]
+    return shared, parents, state.last_action
+
+
+def resume_flow(flow: Flow, session_id: str, persistence=None) -> dict:
+    """
+    Continues `flow` after the node that wrote the last checkpoint of `session_id`
+    and returns the resulting `shared`. A checkpoint without node information
+    (written before resume support) re-runs the flow from the start.
+    """
+    shared, parents, action = _load(flow, session_id, persistence)
+    if parents is None:
+        flow.run(shared)
+        return shared
+    for parent, node in parents:
+        resumed = _continuation(parent, node, action)
+        if resumed is not None:
+            action = resumed._run(shared)
+    return shared
+
+
+async def resume_flow_async(flow: Flow, session_id: str, persistence=None) -> dict:
+    """Async counterpart of `resume_flow` for AsyncFlow graphs."""
+    shared, parents, action = _load(flow, session_id, persistence)
+    if parents is None:
+        await flow.run_async(shared)
+        return shared
+    for parent, node in parents:
+        resumed = _continuation(parent, node, action)
+        if resumed is not None:
+            action = await resumed._run_async(shared) if isinstance(resumed, AsyncNode) else resumed._run(shared)
+    return shared
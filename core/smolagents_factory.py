@@ -1,7 +1,13 @@
 import os
+import asyncio
+import atexit
 import base64
+import functools
+import threading
+import time
 from smolagents import CodeAgent, MCPClient
-from contextlib import ExitStack
+from contextlib import ExitStack, contextmanager
+from .replay import record_tool
 from opentelemetry.sdk.trace import TracerProvider
 from opentelemetry.sdk.trace.export import SimpleSpanProcessor
 from opentelemetry.sdk.resources import Resource
@@ -40,9 +46,16 @@ def setup_smolagents_instrumentation(session_id: str = None, user_id: str = None
             print(f"--- smolagents: Langfuse not properly configured [Session: {session_id}, User: {user_id}] ---")
 
 
-def get_agent(model_object, tools=None, system_prompt=None):
+DEFAULT_AUTHORIZED_IMPORTS = ["json", "datetime", "math"]
+
+
+def get_agent(model_object, tools=None, system_prompt=None, stream_outputs=None, additional_authorized_imports=None):
     if tools is None:
         tools = []
+    if additional_authorized_imports is None:
+        additional_authorized_imports = DEFAULT_AUTHORIZED_IMPORTS
+    if stream_outputs is None:
+        stream_outputs = os.getenv("LLM_STREAM", "false").lower() in ("true", "1", "t", "yes")
 
     try:
         verbosity_level = int(os.getenv("SMOLAGENTS_LOG_LEVEL", "1"))
@@ -52,20 +65,28 @@ def get_agent(model_object, tools=None, system_prompt=None):
     kwargs = {
         "tools": tools,
         "model": model_object,
-        "additional_authorized_imports": ["json", "datetime", "math"],
-        "verbosity_level": verbosity_level
+        "additional_authorized_imports": list(additional_authorized_imports),
+        "verbosity_level": verbosity_level,
+        "stream_outputs": stream_outputs,
     }
     if system_prompt:
         kwargs["system_prompt"] = system_prompt
 
-    return CodeAgent(**kwargs)
+    agent = CodeAgent(**kwargs)
+    for name, tool in agent.tools.items():
+        if name != "final_answer":
+            record_tool(tool)
+    return agent
+
+
+def _open_mcp_client(server_urls):
+    client = MCPClient([{"url": url} for url in server_urls], structured_output=True)
+    return client, client.get_tools()
 
 
 def get_mcp_tools(server_urls: list[str]):
-    mcp_servers = [{"url": url} for url in server_urls]
     try:
-        client = MCPClient(mcp_servers, structured_output=True)
-        tools = client.get_tools()
+        client, tools = _open_mcp_client(server_urls)
         print(f"[Factory] Connected to MCP servers: {server_urls}. Found {len(tools)} tools.")
         return client, tools
     except Exception as e:
@@ -73,6 +94,223 @@ def get_mcp_tools(server_urls: list[str]):
         return None, []
 
 
+def _disconnect(client):
+    try:
+        client.disconnect()
+    except Exception as e:
+        print(f"[MCP Pool] Error disconnecting: {e}")
+
+
+def _ping(client, timeout: float) -> bool:
+    """True when the client's background loop is alive and every session answers a ping."""
+    # MCPClient doesn't expose its sessions; MCPAdapt keeps them with the loop they run on
+    adapter = getattr(client, "_adapter", None)
+    if adapter is None:
+        return True
+    thread = getattr(adapter, "thread", None)
+    if thread is not None and not thread.is_alive():
+        return False
+    try:
+        for session in getattr(adapter, "sessions", []):
+            asyncio.run_coroutine_threadsafe(session.send_ping(), adapter.loop).result(timeout)
+        return True
+    except Exception:
+        return False
+
+
+class _MCPConnection:
+    def __init__(self, client, tools):
+        self.client = client
+        self.tools = tools
+        self.leases = 0
+        self.last_used = time.monotonic()
+        self.last_checked = self.last_used
+        self.suspect = False
+
+
+class MCPConnectionPool:
+    """
+    One connected MCPClient (and its tool list) per tuple of server URLs, shared by
+    every node that leases it. A connection idle for `health_interval` seconds, or
+    whose last lease raised, is pinged before reuse and reconnected if it doesn't
+    answer; connections unused for `idle_timeout` seconds are closed.
+    """
+
+    def __init__(self, idle_timeout: float = 300, health_interval: float = 30, ping_timeout: float = 5):
+        self.idle_timeout = idle_timeout
+        self.health_interval = health_interval
+        self.ping_timeout = ping_timeout
+        self._connections = {}  # (url, ...) -> _MCPConnection
+        self._key_locks = {}
+        self._lock = threading.Lock()
+        self._reaper = None
+        self._stop = threading.Event()
+
+    def _key_lock(self, key) -> threading.Lock:
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def _healthy(self, conn: _MCPConnection) -> bool:
+        if not conn.suspect and time.monotonic() - conn.last_checked < self.health_interval:
+            return True
+        healthy = _ping(conn.client, self.ping_timeout)
+        conn.last_checked = time.monotonic()
+        conn.suspect = not healthy
+        return healthy
+
+    def acquire(self, server_urls) -> tuple:
+        """Returns (key, tools) for `server_urls`, connecting or reconnecting as needed."""
+        key = tuple(server_urls)
+        self.evict_idle()
+        with self._key_lock(key):
+            conn = self._connections.get(key)
+            if conn is not None and not self._healthy(conn):
+                print(f"[MCP Pool] Connection to {list(key)} is unhealthy, reconnecting.")
+                self._close(key, conn)
+                conn = None
+            if conn is None:
+                client, tools = _open_mcp_client(key)
+                print(f"[MCP Pool] Connected to MCP servers: {list(key)}. Found {len(tools)} tools.")
+                conn = _MCPConnection(client, tools)
+                with self._lock:
+                    self._connections[key] = conn
+                self._start_reaper()
+            with self._lock:
+                conn.leases += 1
+                conn.last_used = time.monotonic()
+            return key, conn.tools
+
+    def release(self, key, failed: bool = False):
+        with self._lock:
+            conn = self._connections.get(key)
+            if conn is None:
+                return
+            conn.leases -= 1
+            conn.last_used = time.monotonic()
+            if failed:
+                # The error may have come from a dropped connection: check before the next lease
+                conn.suspect = True
+
+    @contextmanager
+    def lease(self, server_urls):
+        key, tools = self.acquire(server_urls)
+        failed = False
+        try:
+            yield tools
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            self.release(key, failed)
+
+    def _close(self, key, conn: _MCPConnection):
+        with self._lock:
+            if self._connections.get(key) is conn:
+                del self._connections[key]
+        _disconnect(conn.client)
+        # Agents pooled with these tools would call into the closed session
+        from .agent_pool import get_agent_pool
+        get_agent_pool().discard(conn.tools)
+
+    def evict_idle(self):
+        if not self.idle_timeout:
+            return
+        now = time.monotonic()
+        with self._lock:
+            candidates = [
+                (key, conn) for key, conn in self._connections.items()
+                if conn.leases == 0 and now - conn.last_used > self.idle_timeout
+            ]
+        for key, conn in candidates:
+            # Holding the key lock keeps `acquire` from handing this connection out while it closes
+            with self._key_lock(key):
+                with self._lock:
+                    idle = (
+                        self._connections.get(key) is conn
+                        and conn.leases == 0
+                        and time.monotonic() - conn.last_used > self.idle_timeout
+                    )
+                if not idle:
+                    continue
+                print(f"[MCP Pool] Closing idle connection to {list(key)}.")
+                self._close(key, conn)
+
+    def _start_reaper(self):
+        with self._lock:
+            if not self.idle_timeout or self._reaper is not None:
+                return
+            self._reaper = threading.Thread(target=self._reap, name="mcp-pool-reaper", daemon=True)
+            self._reaper.start()
+
+    def _reap(self):
+        while not self._stop.wait(self.idle_timeout / 2):
+            try:
+                self.evict_idle()
+            except Exception as e:
+                print(f"[MCP Pool] Error evicting idle connections: {e}")
+
+    def close_all(self):
+        self._stop.set()
+        with self._lock:
+            connections = list(self._connections.items())
+        for key, conn in connections:
+            with self._key_lock(key):
+                self._close(key, conn)
+
+
+@functools.lru_cache(maxsize=1)
+def get_mcp_pool() -> MCPConnectionPool:
+    pool = MCPConnectionPool(
+        idle_timeout=float(os.getenv("POCKETFLOW_MCP_IDLE_TIMEOUT", "300")),
+        health_interval=float(os.getenv("POCKETFLOW_MCP_HEALTH_INTERVAL", "30")),
+    )
+    atexit.register(pool.close_all)
+    return pool
+
+
+@contextmanager
+def mcp_tools(server_urls: list[str]):
+    """
+    Borrows the tools of a pooled connection to `server_urls` (an empty list if the
+    servers can't be reached), as proxies built from stored definitions unless
+    POCKETFLOW_MCP_TOOL_CACHE=false (see core.mcp_tool_cache). With
+    POCKETFLOW_MCP_POOL=false each use connects and disconnects, like `get_mcp_tools`.
+    """
+    if not server_urls:
+        yield []
+        return
+    if os.getenv("POCKETFLOW_MCP_POOL", "true").lower() not in ("true", "1", "t", "yes"):
+        client, tools = get_mcp_tools(server_urls)
+        try:
+            yield tools
+        finally:
+            if client:
+                client.disconnect()
+        return
+    # Imported here: core.mcp_tool_cache builds on this module
+    from .mcp_tool_cache import cached_mcp_tools
+    tools = cached_mcp_tools(server_urls)
+    if tools is not None:
+        # Proxies lease the pooled connection themselves when called
+        yield tools
+        return
+    pool = get_mcp_pool()
+    try:
+        key, tools = pool.acquire(server_urls)
+    except Exception as e:
+        print(f"[MCP Pool] MCP Connection Error: {e}")
+        yield []
+        return
+    failed = False
+    try:
+        yield tools
+    except BaseException:
+        failed = True
+        raise
+    finally:
+        pool.release(key, failed)
+
+
 def run_agent_with_context(agent, task: str, session_id: str = None, user_id: str = None):
     with ExitStack() as stack:
         if session_id:
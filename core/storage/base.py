@@ -1,5 +1,5 @@
 from abc import ABC, abstractmethod
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Hashable, Iterable, List, Optional
 from datetime import datetime
 from pydantic import BaseModel, Field
 
@@ -12,6 +12,26 @@ class FlowState(BaseModel):
     status: str
     data: Dict[str, Any]
     updated_at: datetime = Field(default_factory=datetime.now)
+    # Resume bookkeeping: the node that wrote the checkpoint, the action it returned,
+    # and the Pydantic class ("module:QualName") of model values, by namespace and key.
+    last_node: Optional[str] = None
+    last_action: Optional[str] = None
+    models: Dict[str, Dict[str, str]] = Field(default_factory=dict)
+    # Write sequence number assigned by backends that journal deltas; orders snapshots
+    # and journal entries independently of the wall clock.
+    seq: int = 0
+
+    def merge_delta(self, delta: "FlowState"):
+        """Applies a state holding only some namespaces (see save_delta) on top of this one."""
+        for ns in delta.data:
+            self.models.pop(ns, None)
+        self.data.update(delta.data)
+        self.models.update(delta.models)
+        self.status = delta.status
+        self.updated_at = delta.updated_at
+        self.last_node = delta.last_node
+        self.last_action = delta.last_action
+        self.seq = max(self.seq, delta.seq)
 
 class AgentMemoryItem(BaseModel):
     """Represents a single unit of memory/fact."""
@@ -30,12 +50,38 @@ class BaseStatePersistence(ABC):
     @abstractmethod
     def load_state(self, session_id: str) -> Optional[FlowState]: pass
 
+    def cache_stamp(self, session_id: str) -> Optional[Hashable]:
+        """
+        Cheap fingerprint of the stored state (e.g. file mtime/size) used by caches
+        to detect changes made by other processes. None means "unknown".
+        """
+        return None
+
+    def save_delta(self, state: FlowState, namespaces: Iterable[str]) -> bool:
+        """
+        Persists only the given top-level keys of `state.data`.
+        Backends without incremental support fall back to a full snapshot.
+        """
+        return self.save_state(state)
+
 class BaseAgentMemory(ABC):
     @abstractmethod
     def add_memory(self, item: AgentMemoryItem) -> bool: pass
 
+    def cache_stamp(self, user_id: str) -> Optional[Hashable]:
+        """Cheap fingerprint of the user's stored memories; see BaseStatePersistence.cache_stamp."""
+        return None
+
+    def add_memories(self, items: List[AgentMemoryItem]) -> bool:
+        """Adds several memories at once. Backends override this to batch the writes."""
+        return all([self.add_memory(item) for item in items])
+
+    def delete_memory(self, user_id: str, memory_id: str) -> bool:
+        """Removes one memory; returns False if it didn't exist. Every bundled backend overrides this."""
+        raise NotImplementedError(f"{self.__class__.__name__} does not support deleting memories")
+
     @abstractmethod
     def get_memories(self, user_id: str, limit: int = 10) -> List[AgentMemoryItem]: pass
     
     @abstractmethod
-    def search_memories(self, user_id: str, query: str) -> List[AgentMemoryItem]: pass
+    def search_memories(self, user_id: str, query: str, limit: Optional[int] = None) -> List[AgentMemoryItem]: pass
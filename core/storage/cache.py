@@ -0,0 +1,130 @@
+import threading
+from collections import OrderedDict
+from typing import Iterable, Optional
+from .base import BaseStatePersistence, BaseAgentMemory, FlowState, AgentMemoryItem
+
+
+class LRU:
+    """Size-bounded mapping key -> (stamp, value) that drops entries whose stamp changed."""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, stamp):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] != stamp:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key, stamp, value):
+        with self._lock:
+            self._entries[key] = (stamp, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+class CachedStatePersistence(BaseStatePersistence):
+    """
+    Wraps any BaseStatePersistence with an in-process LRU of loaded states.
+    Entries are dropped when the backend's `cache_stamp` changes (another process
+    wrote) or when this process saves through the wrapper.
+    Returned states are shared with the cache: copy `data` before mutating nested values.
+    """
+
+    def __init__(self, inner: BaseStatePersistence, maxsize: int = 128):
+        self.inner = inner
+        self._cache = LRU(maxsize)
+
+    def __getattr__(self, name):
+        return getattr(self.inner, name)
+
+    def cache_stamp(self, session_id: str):
+        return self.inner.cache_stamp(session_id)
+
+    def save_state(self, state: FlowState) -> bool:
+        self._cache.invalidate(state.session_id)
+        return self.inner.save_state(state)
+
+    def save_delta(self, state: FlowState, namespaces: Iterable[str]) -> bool:
+        self._cache.invalidate(state.session_id)
+        return self.inner.save_delta(state, namespaces)
+
+    def load_state(self, session_id: str) -> Optional[FlowState]:
+        stamp = self.inner.cache_stamp(session_id)
+        state = self._cache.get(session_id, stamp)
+        if state is None:
+            state = self.inner.load_state(session_id)
+            if state is None:
+                return None
+            self._cache.put(session_id, stamp, state)
+        return state.model_copy(update={"data": dict(state.data)})
+
+
+class CachedAgentMemory(BaseAgentMemory):
+    """
+    Wraps any BaseAgentMemory with an in-process LRU (one entry per user) of
+    `get_memories`/`search_memories` results. A user's entry is dropped when the
+    backend's `cache_stamp` changes or when this process writes through the wrapper.
+    """
+
+    def __init__(self, inner: BaseAgentMemory, maxsize: int = 256, max_queries_per_user: int = 64):
+        self.inner = inner
+        self.max_queries_per_user = max_queries_per_user
+        self._cache = LRU(maxsize)
+
+    def __getattr__(self, name):
+        return getattr(self.inner, name)
+
+    def cache_stamp(self, user_id: str):
+        return self.inner.cache_stamp(user_id)
+
+    def _cached(self, user_id: str, key: tuple, compute):
+        stamp = self.inner.cache_stamp(user_id)
+        results = self._cache.get(user_id, stamp)
+        if results is None:
+            results = {}
+            self._cache.put(user_id, stamp, results)
+        if key not in results:
+            if len(results) >= self.max_queries_per_user:
+                results.clear()
+            results[key] = compute()
+        return list(results[key])
+
+    def add_memory(self, item: AgentMemoryItem) -> bool:
+        try:
+            return self.inner.add_memory(item)
+        finally:
+            self._cache.invalidate(item.user_id)
+
+    def add_memories(self, items) -> bool:
+        try:
+            return self.inner.add_memories(items)
+        finally:
+            for user_id in {item.user_id for item in items}:
+                self._cache.invalidate(user_id)
+
+    def delete_memory(self, user_id: str, memory_id: str) -> bool:
+        try:
+            return self.inner.delete_memory(user_id, memory_id)
+        finally:
+            self._cache.invalidate(user_id)
+
+    def get_memories(self, user_id: str, limit: int = 10):
+        return self._cached(user_id, ("get", limit), lambda: self.inner.get_memories(user_id, limit))
+
+    def search_memories(self, user_id: str, query: str, limit: Optional[int] = None):
+        return self._cached(
+            user_id, ("search", query, limit), lambda: self.inner.search_memories(user_id, query, limit)
+        )
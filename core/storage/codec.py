@@ -0,0 +1,109 @@
+"""
+Compact encodings for state snapshots.
+
+Binary payloads start with a 7-byte header: b"PFST", a format version, an
+encoding id and a compression id. Anything without the header is read as the
+original (pretty-printed) JSON, so existing checkpoints keep loading.
+"""
+import json
+import os
+import zlib
+from typing import Any, Optional, Union
+from .base import FlowState
+
+try:
+    import msgpack
+
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    MSGPACK_AVAILABLE = False
+
+try:
+    import zstandard
+
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+MAGIC = b"PFST"
+VERSION = 1
+ENCODINGS = {"json": 0, "msgpack": 1}
+COMPRESSIONS = {"none": 0, "zlib": 1, "zstd": 2}
+
+
+class StateCodec:
+    """
+    Encoding ("json" or "msgpack") plus compression ("none", "zlib" or "zstd").
+    Plain "json" without compression writes the legacy pretty-printed format.
+    Decoding reads whatever the header says, independent of this codec's settings.
+    """
+
+    def __init__(self, encoding: str = "json", compression: str = "none", level: Optional[int] = None):
+        if encoding not in ENCODINGS:
+            raise ValueError(f"Unknown encoding '{encoding}'. Available: {sorted(ENCODINGS)}")
+        if compression not in COMPRESSIONS:
+            raise ValueError(f"Unknown compression '{compression}'. Available: {sorted(COMPRESSIONS)}")
+        if encoding == "msgpack" and not MSGPACK_AVAILABLE:
+            raise ImportError("msgpack encoding requires msgpack. Install with: pip install msgpack")
+        if compression == "zstd" and not ZSTD_AVAILABLE:
+            raise ImportError("zstd compression requires zstandard. Install with: pip install zstandard")
+        self.encoding = encoding
+        self.compression = compression
+        self.level = level
+
+    @classmethod
+    def from_spec(cls, spec: Union[str, "StateCodec", None] = None) -> "StateCodec":
+        """Parses "msgpack", "json+zlib", "msgpack+zstd"...; None reads POCKETFLOW_STATE_CODEC."""
+        if isinstance(spec, StateCodec):
+            return spec
+        spec = (spec or os.getenv("POCKETFLOW_STATE_CODEC", "json")).lower()
+        encoding, _, compression = spec.partition("+")
+        return cls(encoding, compression or "none")
+
+    @property
+    def is_binary(self) -> bool:
+        return self.encoding != "json" or self.compression != "none"
+
+    def dumps(self, obj: Any) -> bytes:
+        """Encodes a JSON-compatible object with a header."""
+        if self.encoding == "msgpack":
+            payload = msgpack.packb(obj, use_bin_type=True)
+        else:
+            payload = json.dumps(obj, separators=(",", ":")).encode("utf-8")
+        if self.compression == "zlib":
+            payload = zlib.compress(payload, 6 if self.level is None else self.level)
+        elif self.compression == "zstd":
+            payload = zstandard.ZstdCompressor(level=3 if self.level is None else self.level).compress(payload)
+        header = MAGIC + bytes([VERSION, ENCODINGS[self.encoding], COMPRESSIONS[self.compression]])
+        return header + payload
+
+    @staticmethod
+    def loads(blob: bytes) -> Any:
+        if not blob.startswith(MAGIC):
+            return json.loads(blob)
+        version, encoding, compression = blob[4], blob[5], blob[6]
+        if version != VERSION:
+            raise ValueError(f"Unsupported state format version {version}")
+        payload = blob[7:]
+        if compression == COMPRESSIONS["zlib"]:
+            payload = zlib.decompress(payload)
+        elif compression == COMPRESSIONS["zstd"]:
+            if not ZSTD_AVAILABLE:
+                raise ImportError("Reading this state requires zstandard. Install with: pip install zstandard")
+            payload = zstandard.ZstdDecompressor().decompress(payload)
+        if encoding == ENCODINGS["msgpack"]:
+            if not MSGPACK_AVAILABLE:
+                raise ImportError("Reading this state requires msgpack. Install with: pip install msgpack")
+            return msgpack.unpackb(payload, raw=False)
+        return json.loads(payload)
+
+    def encode_state(self, state: FlowState) -> bytes:
+        if not self.is_binary:
+            return state.model_dump_json(indent=2).encode("utf-8")
+        return self.dumps(state.model_dump(mode="json"))
+
+    @classmethod
+    def decode_state(cls, blob: bytes) -> FlowState:
+        if not blob.startswith(MAGIC):
+            return FlowState.model_validate_json(blob)
+        return FlowState.model_validate(cls.loads(blob))
@@ -1,60 +1,350 @@
 import os
 import json
-from typing import Optional
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterable, Optional
 from .base import BaseStatePersistence, BaseAgentMemory, FlowState, AgentMemoryItem
+from .codec import StateCodec
+from .index import InvertedIndex
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+def stat_stamp(*paths: str) -> tuple:
+    stamp = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+            stamp.append((st.st_ino, st.st_mtime_ns, st.st_size))
+        except FileNotFoundError:
+            stamp.append(None)
+    return tuple(stamp)
 
 class FileSystemStatePersistence(BaseStatePersistence):
-    def __init__(self, base_dir: str = ".states"):
+    """
+    Stores one snapshot per session: `<session>.json` with the default codec, or
+    `<session>.state` with a binary one (see StateCodec, e.g. codec="msgpack+zlib").
+    Incremental checkpoints are appended to a per-session journal
+    (`<session>.journal.jsonl`) holding only the changed namespaces; the journal
+    is compacted into a fresh snapshot once it grows larger than `compact_ratio`
+    times the snapshot. Every write gets the next `seq` of its session, so loading
+    applies exactly the journal entries written after the snapshot.
+    """
+
+    def __init__(self, base_dir: str = ".states", compact_ratio: float = 1.0, codec=None):
         self.base_dir = base_dir
+        self.compact_ratio = compact_ratio
+        self.codec = StateCodec.from_spec(codec)
+        self._seqs = {}  # session_id -> last written seq
+        self._seq_lock = threading.Lock()
         os.makedirs(self.base_dir, exist_ok=True)
 
-    def _get_path(self, session_id: str) -> str:
-        return os.path.join(self.base_dir, f"{session_id}.json")
+    def _get_path(self, session_id: str, binary: Optional[bool] = None) -> str:
+        if binary is None:
+            binary = self.codec.is_binary
+        return os.path.join(self.base_dir, f"{session_id}.state" if binary else f"{session_id}.json")
+
+    def _find_snapshot(self, session_id: str) -> Optional[str]:
+        """The session's snapshot in whichever format it was last written."""
+        paths = [p for p in (self._get_path(session_id, False), self._get_path(session_id, True)) if os.path.exists(p)]
+        if not paths: return None
+        return max(paths, key=os.path.getmtime)
+
+    def _get_journal_path(self, session_id: str) -> str:
+        return os.path.join(self.base_dir, f"{session_id}.journal.jsonl")
+
+    def cache_stamp(self, session_id: str):
+        return stat_stamp(
+            self._get_path(session_id, False), self._get_path(session_id, True), self._get_journal_path(session_id)
+        )
+
+    def _next_seq(self, session_id: str) -> int:
+        with self._seq_lock:
+            if session_id not in self._seqs:
+                stored = self.load_state(session_id)
+                self._seqs[session_id] = stored.seq if stored else 0
+            self._seqs[session_id] += 1
+            return self._seqs[session_id]
 
     def save_state(self, state: FlowState) -> bool:
         try:
-            with open(self._get_path(state.session_id), "w") as f:
-                f.write(state.model_dump_json(indent=2))
+            state = state.model_copy(update={"seq": self._next_seq(state.session_id)})
+            # Write to a temp file and rename so readers never see a half-written snapshot
+            path = self._get_path(state.session_id)
+            fd, tmp_path = tempfile.mkstemp(dir=self.base_dir, prefix=f".{state.session_id}.", suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(self.codec.encode_state(state))
+                os.replace(tmp_path, path)
+            except BaseException:
+                os.remove(tmp_path)
+                raise
+            # Drop a snapshot left in the other format by a previous codec
+            stale = self._get_path(state.session_id, not self.codec.is_binary)
+            if os.path.exists(stale):
+                os.remove(stale)
+            # The snapshot now contains everything the journal described
+            journal = self._get_journal_path(state.session_id)
+            if os.path.exists(journal):
+                os.remove(journal)
             return True
         except Exception as e:
             print(f"[FS Persistence] Error saving: {e}")
             return False
 
+    def save_delta(self, state: FlowState, namespaces: Iterable[str]) -> bool:
+        try:
+            path = self._find_snapshot(state.session_id)
+            journal = self._get_journal_path(state.session_id)
+            if path is None:
+                return self.save_state(state)
+            journal_size = os.path.getsize(journal) if os.path.exists(journal) else 0
+            if journal_size > self.compact_ratio * os.path.getsize(path):
+                return self.save_state(state)
+
+            delta = {ns: state.data[ns] for ns in namespaces if ns in state.data}
+            models = {ns: state.models[ns] for ns in delta if ns in state.models}
+            entry = state.model_copy(update={"data": delta, "models": models, "seq": self._next_seq(state.session_id)})
+            with open(journal, "a") as f:
+                f.write(entry.model_dump_json() + "\n")
+            return True
+        except Exception as e:
+            print(f"[FS Persistence] Error saving delta: {e}")
+            return False
+
+    def _replay_journal(self, state: FlowState) -> FlowState:
+        journal = self._get_journal_path(state.session_id)
+        if not os.path.exists(journal):
+            return state
+        with open(journal, "r") as f:
+            for line in f:
+                try:
+                    raw = json.loads(line)
+                    entry = FlowState(**raw)
+                except Exception:
+                    # A torn final line from a crash mid-append; ignore it
+                    continue
+                # Entries up to the snapshot's seq were already compacted into it; journals
+                # written before sequence numbers only have their timestamps to go by
+                if "seq" in raw:
+                    if entry.seq <= state.seq:
+                        continue
+                elif entry.updated_at <= state.updated_at:
+                    continue
+                state.merge_delta(entry)
+        return state
+
     def load_state(self, session_id: str) -> Optional[FlowState]:
         try:
-            path = self._get_path(session_id)
-            if not os.path.exists(path): return None
-            with open(path, "r") as f:
-                return FlowState(**json.load(f))
+            path = self._find_snapshot(session_id)
+            if path is None: return None
+            with open(path, "rb") as f:
+                state = StateCodec.decode_state(f.read())
+            return self._replay_journal(state)
         except Exception:
             return None
 
 class FileSystemAgentMemory(BaseAgentMemory):
+    """
+    Stores one JSON array of memories per user, one memory per line, so a single
+    memory can be read back from its byte offset. Every write goes through a temp
+    file and rename, and adds keep the offsets of existing memories. A BM25
+    inverted index over the contents is kept in memory, keyed by the user file's
+    `cache_stamp`, and persisted next to it (`user_<id>.index.jsonl`) as one line
+    per indexed batch: adds append a line, and the index is rebuilt whenever its
+    last line no longer matches the user file. Reads never rewrite the user file.
+    """
+
+    _extension = ".json"
+    _index_suffix = ".index.jsonl"
+    _HEAD = b"[\n"
+    _TAIL = b"\n]\n"
+
     def __init__(self, base_dir: str = ".memories"):
         self.base_dir = base_dir
         os.makedirs(self.base_dir, exist_ok=True)
+        self._indexes = {}  # user_id -> (cache_stamp, InvertedIndex)
+        self._index_lock = threading.RLock()
 
     def _get_user_path(self, user_id: str) -> str:
         safe_uid = "".join([c for c in user_id if c.isalnum() or c in "-_"])
-        return os.path.join(self.base_dir, f"user_{safe_uid}.json")
+        return os.path.join(self.base_dir, f"user_{safe_uid}{self._extension}")
 
-    def _read(self, user_id: str):
+    def _get_index_path(self, user_id: str) -> str:
+        return self._get_user_path(user_id)[:-len(self._extension)] + self._index_suffix
+
+    def cache_stamp(self, user_id: str):
+        return stat_stamp(self._get_user_path(user_id))
+
+    def _read_raw(self, user_id: str) -> list:
         path = self._get_user_path(user_id)
         if not os.path.exists(path): return []
         try:
             with open(path, "r") as f:
-                return [AgentMemoryItem(**x) for x in json.load(f)]
+                return json.load(f)
         except: return []
 
+    def _read(self, user_id: str):
+        return [AgentMemoryItem(**x) for x in self._read_raw(user_id)]
+
+    def _replace(self, user_id: str, data: bytes):
+        """Writes the user file through a temp file and rename, so a crash never leaves it half-written."""
+        fd, tmp_path = tempfile.mkstemp(dir=self.base_dir, prefix=".user.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, self._get_user_path(user_id))
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
     def _write(self, user_id: str, items):
-        with open(self._get_user_path(user_id), "w") as f:
-            json.dump([x.model_dump(mode='json') for x in items], f, indent=2)
+        """Rewrites the user file; returns the (offset, length) of every item."""
+        lines = [json.dumps(x.model_dump(mode='json')).encode("utf-8") for x in items]
+        refs, offset = [], len(self._HEAD)
+        for line in lines:
+            refs.append([offset, len(line)])
+            offset += len(line) + 2
+        self._replace(user_id, self._HEAD + b",\n".join(lines) + (self._TAIL if lines else b"]\n"))
+        return refs
+
+    def _append(self, user_id: str, items):
+        """Adds items at the end of the array; returns their (offset, length), or None if the layout isn't ours."""
+        path = self._get_user_path(user_id)
+        if not os.path.exists(path):
+            return self._write(user_id, items)
+        lines = [json.dumps(x.model_dump(mode='json')).encode("utf-8") for x in items]
+        with open(path, "rb") as f:
+            data = f.read()
+        if data == self._HEAD + b"]\n":
+            # Empty array: the items go where "]" is
+            position, prefix = len(self._HEAD), b""
+        elif data.startswith(self._HEAD) and data.endswith(self._TAIL):
+            position, prefix = len(data) - len(self._TAIL), b",\n"
+        else:
+            return None
+        # Existing items keep their offsets in the copy
+        self._replace(user_id, data[:position] + prefix + b",\n".join(lines) + self._TAIL)
+        refs, offset = [], position + len(prefix)
+        for line in lines:
+            refs.append([offset, len(line)])
+            offset += len(line) + 2
+        return refs
+
+    def _scan_refs(self, user_id: str):
+        """(offset, length, record) of every item, or None if the file isn't one memory per line."""
+        path = self._get_user_path(user_id)
+        if not os.path.exists(path): return []
+        entries = []
+        with open(path, "rb") as f:
+            if f.readline() != self._HEAD:
+                return None
+            offset = len(self._HEAD)
+            for line in f:
+                body = line.rstrip(b"\n")
+                if body.endswith(b","):
+                    body = body[:-1]
+                if body in (b"]", b""):
+                    offset += len(line)
+                    continue
+                try:
+                    entries.append((offset, len(body), json.loads(body)))
+                except ValueError:
+                    return None
+                offset += len(line)
+        return entries
+
+    def _append_index_line(self, user_id: str, entries, rebuild: bool = False):
+        """Persists indexed documents as [memory_id, ref, term counts] with the user file's current stamp."""
+        line = json.dumps({"source": self.cache_stamp(user_id), "docs": entries}) + "\n"
+        with open(self._get_index_path(user_id), "w" if rebuild else "a") as f:
+            f.write(line)
+
+    def _read_index_file(self, user_id: str, stamp) -> Optional[InvertedIndex]:
+        try:
+            with open(self._get_index_path(user_id), "r") as f:
+                batches = [json.loads(line) for line in f]
+        except Exception:
+            return None
+        if not batches or batches[-1].get("source") != json.loads(json.dumps(stamp)):
+            return None
+        index = InvertedIndex()
+        for batch in batches:
+            for doc_id, ref, counts in batch["docs"]:
+                index.add_counts(doc_id, counts, ref)
+        return index
+
+    def _rebuild_index(self, user_id: str) -> InvertedIndex:
+        entries = self._scan_refs(user_id)
+        if entries is None:
+            # Written in another layout (e.g. pretty-printed): refer to array positions until the
+            # next add rewrites it one memory per line
+            entries = [(None, position, raw) for position, raw in enumerate(self._read_raw(user_id))]
+        index, docs = InvertedIndex(), []
+        for offset, length, raw in entries:
+            ref = length if offset is None else [offset, length]
+            counts = index.add(raw["memory_id"], raw["content"], ref)
+            docs.append([raw["memory_id"], ref, counts])
+        self._append_index_line(user_id, docs, rebuild=True)
+        return index
+
+    def _load_index(self, user_id: str) -> InvertedIndex:
+        """The user's index: in memory while the user file is unchanged, else from disk or rebuilt."""
+        with self._index_lock:
+            stamp = self.cache_stamp(user_id)
+            cached = self._indexes.get(user_id)
+            if cached and cached[0] == stamp:
+                return cached[1]
+            if stamp == (None,):
+                # No memories yet: nothing to read or persist
+                return InvertedIndex()
+            index = self._read_index_file(user_id, stamp) or self._rebuild_index(user_id)
+            self._indexes[user_id] = (self.cache_stamp(user_id), index)
+            return index
 
     def add_memory(self, item: AgentMemoryItem) -> bool:
+        return self.add_memories([item])
+
+    def add_memories(self, items) -> bool:
+        try:
+            by_user = {}
+            for item in items:
+                by_user.setdefault(item.user_id, []).append(item)
+            with self._index_lock:
+                for user_id, new_items in by_user.items():
+                    index = self._load_index(user_id)
+                    # A first add starts the index file over, whatever an earlier user file left there
+                    new_file = not os.path.exists(self._get_user_path(user_id))
+                    refs = self._append(user_id, new_items)
+                    if refs is None:
+                        # Not one memory per line: rewrite it that way and index the new offsets
+                        self._write(user_id, self._read(user_id) + new_items)
+                        self._indexes[user_id] = (self.cache_stamp(user_id), self._rebuild_index(user_id))
+                        continue
+                    docs = [
+                        [item.memory_id, ref, index.add(item.memory_id, item.content, ref)]
+                        for item, ref in zip(new_items, refs)
+                    ]
+                    self._append_index_line(user_id, docs, rebuild=new_file)
+                    self._indexes[user_id] = (self.cache_stamp(user_id), index)
+            return True
+        except: return False
+
+    def delete_memory(self, user_id: str, memory_id: str) -> bool:
         try:
-            items = self._read(item.user_id)
-            items.append(item)
-            self._write(item.user_id, items)
+            with self._index_lock:
+                items = self._read(user_id)
+                remaining = [x for x in items if x.memory_id != memory_id]
+                if len(remaining) == len(items): return False
+                # Every offset after the deleted item moves, so the index is rebuilt
+                self._write(user_id, remaining)
+                self._indexes.pop(user_id, None)
+                self._load_index(user_id)
             return True
         except: return False
 
@@ -63,6 +353,238 @@ class FileSystemAgentMemory(BaseAgentMemory):
         items.sort(key=lambda x: x.created_at, reverse=True)
         return items[:limit]
 
-    def search_memories(self, user_id: str, query: str):
-        items = self._read(user_id)
-        return [i for i in items if query.lower() in i.content.lower()]
+    def search_memories(self, user_id: str, query: str, limit: Optional[int] = None):
+        """Returns memories sharing a term with `query`, best BM25 match first."""
+        with self._index_lock:
+            hits = self._load_index(user_id).search(query, limit)
+            if not hits: return []
+            if isinstance(hits[0][1], int):
+                # Array positions of a file in another layout
+                raw = self._read_raw(user_id)
+                return [AgentMemoryItem(**raw[position]) for _, position, _ in hits]
+            # Only the hits are read and validated, not the whole file
+            items = []
+            with open(self._get_user_path(user_id), "rb") as f:
+                for _, (offset, length), _ in hits:
+                    f.seek(offset)
+                    items.append(AgentMemoryItem(**json.loads(f.read(length))))
+            return items
+
+
+class JsonlAgentMemory(FileSystemAgentMemory):
+    """
+    Append-only variant of FileSystemAgentMemory: one JSON line per memory in
+    `user_<id>.jsonl`, with deletions recorded as tombstone lines. Writers append
+    under an exclusive lock on `user_<id>.lock`, so several processes can share a
+    directory. Adding never touches the inverted index: it stores byte offsets and
+    indexes whatever was appended since its last offset when it is next used. Once
+    dead lines (tombstones and what they shadow) reach `compact_ratio` of the log,
+    a background thread rewrites it with the live items only.
+
+    fsync: "always" (after every append), "interval" (at most every `fsync_interval`
+    seconds) or "never" (leave it to the OS).
+    """
+
+    _extension = ".jsonl"
+    _index_suffix = ".index.json"
+
+    def __init__(self, base_dir: str = ".memories", fsync: str = "interval", fsync_interval: float = 1.0,
+                 compact_ratio: float = 0.5, compact_min_lines: int = 64):
+        super().__init__(base_dir)
+        if fsync not in ("always", "interval", "never"):
+            raise ValueError(f"Unknown fsync policy: {fsync}")
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self.compact_ratio = compact_ratio
+        self.compact_min_lines = compact_min_lines
+        self._last_fsync = 0.0
+        self._mutex = threading.Lock()
+        self._compacting = set()
+
+    def _get_lock_path(self, user_id: str) -> str:
+        return self._get_user_path(user_id)[:-len(self._extension)] + ".lock"
+
+    @contextmanager
+    def _locked(self, user_id: str, exclusive: bool = True):
+        if fcntl is None:
+            # No advisory locks on this platform; only guard against other threads
+            with self._mutex:
+                yield
+            return
+        with open(self._get_lock_path(user_id), "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _scan(self, user_id: str, start: int = 0):
+        """Returns ([(offset, record)], end offset) for complete lines from `start`."""
+        path = self._get_user_path(user_id)
+        records = []
+        if not os.path.exists(path): return records, 0
+        with open(path, "rb") as f:
+            f.seek(start)
+            offset = start
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # Torn write from a crash; the next append terminates it
+                try:
+                    records.append((offset, json.loads(line)))
+                except ValueError:
+                    pass
+                offset += len(line)
+        return records, offset
+
+    def _read_raw(self, user_id: str) -> list:
+        live = {}
+        for _, record in self._scan(user_id)[0]:
+            if record.get("deleted"):
+                live.pop(record["memory_id"], None)
+            else:
+                live.pop(record["memory_id"], None)
+                live[record["memory_id"]] = record
+        return list(live.values())
+
+    def _rewrite_log(self, user_id: str, items):
+        path = self._get_user_path(user_id)
+        fd, tmp_path = tempfile.mkstemp(dir=self.base_dir, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            for item in items:
+                f.write(item.model_dump_json() + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    def _append_lines(self, user_id: str, records: list) -> list:
+        """Appends records as lines; returns their byte offsets. Caller holds the exclusive lock."""
+        offsets = []
+        with open(self._get_user_path(user_id), "ab+") as f:
+            end = f.seek(0, os.SEEK_END)
+            if end > 0:
+                f.seek(end - 1)
+                if f.read(1) != b"\n":
+                    f.write(b"\n")
+                    end += 1
+            for record in records:
+                offsets.append(end)
+                line = (json.dumps(record) + "\n").encode("utf-8")
+                f.write(line)
+                end += len(line)
+            f.flush()
+            now = time.monotonic()
+            if self.fsync == "always" or (self.fsync == "interval" and now - self._last_fsync >= self.fsync_interval):
+                os.fsync(f.fileno())
+                self._last_fsync = now
+        return offsets
+
+    def _save_index(self, user_id: str, index: InvertedIndex, size: int = 0, lines: int = 0):
+        path = self._get_user_path(user_id)
+        inode = os.stat(path).st_ino if os.path.exists(path) else 0
+        fd, tmp_path = tempfile.mkstemp(dir=self.base_dir, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump({"inode": inode, "size": size, "lines": lines, **index.to_dict()}, f)
+        os.replace(tmp_path, self._get_index_path(user_id))
+
+    def _load_log_index(self, user_id: str):
+        """
+        Returns (index, lines) up to date with the log. The index stays in memory while
+        the log is unchanged; otherwise only the lines not seen yet are indexed, on top
+        of the in-memory or persisted index of the same file.
+        """
+        path = self._get_user_path(user_id)
+        with self._index_lock:
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                return InvertedIndex(), 0
+            stamp = (st.st_ino, st.st_mtime_ns, st.st_size)
+            cached = self._indexes.get(user_id)  # user_id -> (stamp, index, lines, indexed size)
+            if cached and cached[0] == stamp:
+                return cached[1], cached[2]
+            index, start, lines = InvertedIndex(), 0, 0
+            # Same file (not replaced by a compaction) and only appended to since
+            if cached and cached[0][0] == st.st_ino and cached[3] <= st.st_size:
+                index, start, lines = cached[1], cached[3], cached[2]
+            else:
+                try:
+                    with open(self._get_index_path(user_id), "r") as f:
+                        data = json.load(f)
+                    if data["inode"] == st.st_ino and data["size"] <= st.st_size:
+                        index, start, lines = InvertedIndex.from_dict(data), data["size"], data["lines"]
+                except Exception:
+                    pass
+
+            end = start
+            if start < st.st_size:
+                records, end = self._scan(user_id, start)
+                for offset, record in records:
+                    if record.get("deleted"):
+                        index.remove(record["memory_id"])
+                    else:
+                        index.add(record["memory_id"], record["content"], offset)
+                lines += len(records)
+                if records:
+                    self._save_index(user_id, index, end, lines)
+            self._indexes[user_id] = (stamp, index, lines, end)
+            return index, lines
+
+    def add_memories(self, items) -> bool:
+        try:
+            by_user = {}
+            for item in items:
+                by_user.setdefault(item.user_id, []).append(item)
+            for user_id, new_items in by_user.items():
+                # The index picks the new lines up from its last offset on the next search
+                with self._locked(user_id):
+                    self._append_lines(user_id, [x.model_dump(mode='json') for x in new_items])
+            return True
+        except: return False
+
+    def delete_memory(self, user_id: str, memory_id: str) -> bool:
+        try:
+            with self._locked(user_id):
+                index, _ = self._load_log_index(user_id)
+                if memory_id not in index.docs: return False
+                self._append_lines(user_id, [{"memory_id": memory_id, "deleted": True}])
+                index, lines = self._load_log_index(user_id)
+            self._maybe_compact(user_id, index, lines)
+            return True
+        except: return False
+
+    def search_memories(self, user_id: str, query: str, limit: Optional[int] = None):
+        """Returns memories sharing a term with `query`, best BM25 match first."""
+        if not os.path.exists(self._get_user_path(user_id)): return []
+        with self._locked(user_id, exclusive=False), self._index_lock:
+            index, lines = self._load_log_index(user_id)
+            hits = index.search(query, limit)
+            items = []
+            if hits:
+                with open(self._get_user_path(user_id), "rb") as f:
+                    for _, offset, _ in hits:
+                        f.seek(offset)
+                        items.append(AgentMemoryItem(**json.loads(f.readline())))
+        self._maybe_compact(user_id, index, lines)
+        return items
+
+    def _maybe_compact(self, user_id: str, index: InvertedIndex, lines: int):
+        dead = lines - len(index.docs)
+        if lines < self.compact_min_lines or dead < self.compact_ratio * lines:
+            return
+        with self._mutex:
+            if user_id in self._compacting: return
+            self._compacting.add(user_id)
+        threading.Thread(target=self.compact, args=(user_id,), daemon=True).start()
+
+    def compact(self, user_id: str):
+        """Rewrites the user's log with live items only. Readers holding the old file are unaffected."""
+        try:
+            with self._locked(user_id):
+                self._rewrite_log(user_id, self._read(user_id))
+                # The new inode invalidates the old index; rebuild it now rather than on the next read
+                self._load_log_index(user_id)
+        except Exception as e:
+            print(f"[FS Memory] Compaction failed for {user_id}: {e}")
+        finally:
+            with self._mutex:
+                self._compacting.discard(user_id)
@@ -0,0 +1,100 @@
+import math
+import re
+import heapq
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN_RE.findall(text.lower())
+
+
+def term_counts(text: str) -> Dict[str, int]:
+    return dict(Counter(tokenize(text)))
+
+
+def bm25(tf: int, df: int, n_docs: int, length: int, avg_length: float, k1: float = 1.5, b: float = 0.75) -> float:
+    """Score contribution of one query term to one document; shared by every memory backend."""
+    idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+    norm = k1 * (1 - b + b * length / avg_length)
+    return idf * tf * (k1 + 1) / (tf + norm)
+
+
+def rank(scores: Dict[Any, float], limit: Optional[int] = None) -> List[Tuple[Any, float]]:
+    """Best first; ties keep the order in which documents were scored."""
+    if limit is None:
+        return sorted(scores.items(), key=lambda x: x[1], reverse=True)
+    return heapq.nlargest(limit, scores.items(), key=lambda x: x[1])
+
+
+class InvertedIndex:
+    """
+    BM25-ranked inverted index over memory contents.
+
+    `docs` maps memory_id -> [token count, ref], where `ref` is whatever the
+    backend needs to fetch the item again (array position, byte offset...).
+    `postings` maps term -> {memory_id: term frequency}. Removed documents are
+    dropped from `docs` only; their postings are skipped at query time and
+    disappear on the next rebuild.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.docs: Dict[str, list] = {}
+        self.postings: Dict[str, Dict[str, int]] = {}
+        self.total_length = 0
+
+    def add(self, doc_id: str, text: str, ref: Any) -> Dict[str, int]:
+        """Indexes `text` under `doc_id` and returns its term counts."""
+        counts = term_counts(text)
+        self.add_counts(doc_id, counts, ref)
+        return counts
+
+    def add_counts(self, doc_id: str, counts: Dict[str, int], ref: Any):
+        """Indexes a document from its already tokenized term counts."""
+        if doc_id in self.docs:
+            self.remove(doc_id)
+        length = sum(counts.values())
+        self.docs[doc_id] = [length, ref]
+        self.total_length += length
+        for term, tf in counts.items():
+            self.postings.setdefault(term, {})[doc_id] = tf
+
+    def remove(self, doc_id: str):
+        entry = self.docs.pop(doc_id, None)
+        if entry:
+            self.total_length -= entry[0]
+
+    def search(self, query: str, limit: Optional[int] = None) -> List[Tuple[str, Any, float]]:
+        """Returns (memory_id, ref, score) for documents sharing a term with `query`, best first."""
+        if not self.docs:
+            return []
+        n_docs = len(self.docs)
+        avg_length = (self.total_length / n_docs) or 1.0
+        scores: Dict[str, float] = {}
+        for term in set(tokenize(query)):
+            posting = self.postings.get(term)
+            if not posting:
+                continue
+            df = len(posting)
+            for doc_id, tf in posting.items():
+                doc = self.docs.get(doc_id)
+                if doc is None:
+                    continue
+                score = bm25(tf, df, n_docs, doc[0], avg_length, self.k1, self.b)
+                scores[doc_id] = scores.get(doc_id, 0.0) + score
+        return [(doc_id, self.docs[doc_id][1], score) for doc_id, score in rank(scores, limit)]
+
+    def to_dict(self) -> dict:
+        return {"docs": self.docs, "postings": self.postings, "total_length": self.total_length}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "InvertedIndex":
+        index = cls()
+        index.docs = data["docs"]
+        index.postings = data["postings"]
+        index.total_length = data["total_length"]
+        return index
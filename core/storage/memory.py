@@ -0,0 +1,45 @@
+import copy
+from typing import Iterable, Optional
+from .base import BaseStatePersistence, FlowState
+
+
+class InMemoryStatePersistence(BaseStatePersistence):
+    """
+    Keeps states in a process-local dict. States go through the same JSON
+    round trip as on disk, so tests see what a reload would return.
+    """
+
+    def __init__(self):
+        self.states = {}
+
+    def save_state(self, state: FlowState) -> bool:
+        self.states[state.session_id] = state.model_dump(mode="json")
+        return True
+
+    def save_delta(self, state: FlowState, namespaces: Iterable[str]) -> bool:
+        stored = self.states.get(state.session_id)
+        if stored is None:
+            return self.save_state(state)
+        data = {ns: state.data[ns] for ns in namespaces if ns in state.data}
+        models = {ns: state.models[ns] for ns in data if ns in state.models}
+        merged = FlowState(**stored)
+        merged.merge_delta(state.model_copy(update={"data": data, "models": models}))
+        self.states[state.session_id] = merged.model_dump(mode="json")
+        return True
+
+    def load_state(self, session_id: str) -> Optional[FlowState]:
+        stored = self.states.get(session_id)
+        return FlowState(**copy.deepcopy(stored)) if stored is not None else None
+
+
+class NullStatePersistence(BaseStatePersistence):
+    """Discards every checkpoint. For throughput-critical runs that never resume."""
+
+    def save_state(self, state: FlowState) -> bool:
+        return True
+
+    def save_delta(self, state: FlowState, namespaces: Iterable[str]) -> bool:
+        return True
+
+    def load_state(self, session_id: str) -> Optional[FlowState]:
+        return None
@@ -0,0 +1,94 @@
+"""
+Process-wide selection of storage backends.
+
+Checkpointing nodes and examples ask the registry instead of constructing a
+backend themselves, so one long-lived instance is shared per process and the
+backend can be switched without code changes:
+
+    POCKETFLOW_STATE_BACKEND=fs|sqlite|memory|none      (default: fs)
+    POCKETFLOW_MEMORY_BACKEND=fs|jsonl|sqlite|vector    (default: fs)
+    POCKETFLOW_MEMORY_CACHE=true                        (wrap memory in CachedAgentMemory)
+
+`set_state_persistence` / `set_agent_memory` override the environment, e.g. in
+tests or in a flow's main.py; `register_*` adds custom backends by name.
+"""
+import os
+import threading
+from typing import Callable, Optional, Union
+from .base import BaseStatePersistence, BaseAgentMemory
+from .cache import CachedAgentMemory
+from .fs import FileSystemStatePersistence, FileSystemAgentMemory, JsonlAgentMemory
+from .memory import InMemoryStatePersistence, NullStatePersistence
+from .sqlite import SQLiteStatePersistence, SQLiteAgentMemory
+from .vector import VectorAgentMemory
+
+_lock = threading.Lock()
+_state_persistence: Optional[BaseStatePersistence] = None
+_agent_memory: Optional[BaseAgentMemory] = None
+
+
+STATE_BACKENDS = {
+    "fs": FileSystemStatePersistence,
+    "sqlite": SQLiteStatePersistence,
+    "memory": InMemoryStatePersistence,
+    "none": NullStatePersistence,
+}
+MEMORY_BACKENDS = {
+    "fs": FileSystemAgentMemory,
+    "jsonl": JsonlAgentMemory,
+    "sqlite": SQLiteAgentMemory,
+    "vector": VectorAgentMemory,
+}
+
+
+def register_state_persistence(name: str, factory: Callable[[], BaseStatePersistence]):
+    STATE_BACKENDS[name] = factory
+
+
+def register_agent_memory(name: str, factory: Callable[[], BaseAgentMemory]):
+    MEMORY_BACKENDS[name] = factory
+
+
+def _resolve(backends: dict, name: str, kind: str):
+    if name not in backends:
+        raise ValueError(f"Unknown {kind} backend '{name}'. Available: {sorted(backends)}")
+    return backends[name]()
+
+
+def set_state_persistence(persistence: Union[str, BaseStatePersistence, None]):
+    """Sets the process-wide checkpoint backend (instance or registered name). None re-reads the env."""
+    global _state_persistence
+    if isinstance(persistence, str):
+        persistence = _resolve(STATE_BACKENDS, persistence, "state")
+    with _lock:
+        _state_persistence = persistence
+
+
+def get_state_persistence() -> BaseStatePersistence:
+    global _state_persistence
+    with _lock:
+        if _state_persistence is None:
+            name = os.getenv("POCKETFLOW_STATE_BACKEND", "fs").lower()
+            _state_persistence = _resolve(STATE_BACKENDS, name, "state")
+        return _state_persistence
+
+
+def set_agent_memory(memory: Union[str, BaseAgentMemory, None]):
+    """Sets the process-wide agent memory (instance or registered name). None re-reads the env."""
+    global _agent_memory
+    if isinstance(memory, str):
+        memory = _resolve(MEMORY_BACKENDS, memory, "memory")
+    with _lock:
+        _agent_memory = memory
+
+
+def get_agent_memory() -> BaseAgentMemory:
+    global _agent_memory
+    with _lock:
+        if _agent_memory is None:
+            name = os.getenv("POCKETFLOW_MEMORY_BACKEND", "fs").lower()
+            memory = _resolve(MEMORY_BACKENDS, name, "memory")
+            if os.getenv("POCKETFLOW_MEMORY_CACHE", "false").lower() in ("true", "1", "t", "yes"):
+                memory = CachedAgentMemory(memory)
+            _agent_memory = memory
+        return _agent_memory
@@ -0,0 +1,311 @@
+import os
+import json
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Iterable, List, Optional
+from pydantic_core import to_json, to_jsonable_python
+from .base import BaseStatePersistence, BaseAgentMemory, FlowState, AgentMemoryItem
+from .codec import StateCodec
+from .index import bm25, rank, term_counts, tokenize
+
+
+def connect(db_path: str) -> sqlite3.Connection:
+    directory = os.path.dirname(db_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    # Statements are parameterised constants, so sqlite3's statement cache keeps them prepared
+    conn = sqlite3.connect(db_path, check_same_thread=False, cached_statements=128)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA busy_timeout=5000")
+    return conn
+
+
+def _add_missing_columns(conn: sqlite3.Connection, table: str, columns: dict):
+    existing = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+    for name, sql_type in columns.items():
+        if name not in existing:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {sql_type}")
+
+
+def _data_version(conn: sqlite3.Connection, lock: threading.Lock) -> tuple:
+    # data_version moves on commits from other connections, total_changes on our own
+    with lock:
+        return conn.execute("PRAGMA data_version").fetchone()[0], conn.total_changes
+
+
+# Stays under SQLite's bound-variable limit (999 before 3.32)
+_MAX_VARIABLES = 500
+
+
+def _chunks(values: list, size: int = _MAX_VARIABLES):
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
+
+
+def _timestamp(value: datetime) -> str:
+    # Fixed precision so timestamps sort lexicographically in the index
+    return value.isoformat(timespec="microseconds")
+
+
+class SQLiteStatePersistence(BaseStatePersistence):
+    """
+    Stores flow states in a single SQLite database (WAL mode).
+    Each top-level namespace of `state.data` is its own row, so `save_delta`
+    only rewrites the namespaces that changed. With a binary codec (see StateCodec)
+    the values are stored as encoded BLOBs instead of JSON text.
+    """
+
+    def __init__(self, db_path: str = ".states/states.db", codec=None):
+        self.db_path = db_path
+        self.codec = StateCodec.from_spec(codec)
+        self._lock = threading.Lock()
+        self._conn = connect(db_path)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS flow_states ("
+                "session_id TEXT PRIMARY KEY, user_id TEXT, status TEXT NOT NULL, updated_at TEXT NOT NULL, "
+                "last_node TEXT, last_action TEXT)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS flow_state_data ("
+                "session_id TEXT NOT NULL, namespace TEXT NOT NULL, value TEXT NOT NULL, models TEXT, "
+                "PRIMARY KEY (session_id, namespace))"
+            )
+            # Databases created before resume support lack these columns
+            _add_missing_columns(self._conn, "flow_states", {"last_node": "TEXT", "last_action": "TEXT"})
+            _add_missing_columns(self._conn, "flow_state_data", {"models": "TEXT"})
+
+    def cache_stamp(self, session_id: str):
+        return _data_version(self._conn, self._lock)
+
+    def _encode(self, value):
+        if self.codec.is_binary:
+            return self.codec.dumps(to_jsonable_python(value))
+        return to_json(value).decode()
+
+    def _decode(self, value):
+        # Rows written under a previous codec keep loading
+        return StateCodec.loads(value) if isinstance(value, bytes) else json.loads(value)
+
+    def _write(self, state: FlowState, namespaces: Iterable[str], replace: bool):
+        rows = [
+            (state.session_id, ns, self._encode(state.data[ns]), json.dumps(state.models[ns]) if ns in state.models else None)
+            for ns in namespaces if ns in state.data
+        ]
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO flow_states (session_id, user_id, status, updated_at, last_node, last_action) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (state.session_id, state.user_id, state.status, _timestamp(state.updated_at),
+                 state.last_node, state.last_action),
+            )
+            if replace:
+                self._conn.execute("DELETE FROM flow_state_data WHERE session_id = ?", (state.session_id,))
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO flow_state_data (session_id, namespace, value, models) VALUES (?, ?, ?, ?)", rows
+            )
+
+    def save_state(self, state: FlowState) -> bool:
+        try:
+            self._write(state, state.data.keys(), replace=True)
+            return True
+        except Exception as e:
+            print(f"[SQLite Persistence] Error saving: {e}")
+            return False
+
+    def save_delta(self, state: FlowState, namespaces: Iterable[str]) -> bool:
+        try:
+            self._write(state, namespaces, replace=False)
+            return True
+        except Exception as e:
+            print(f"[SQLite Persistence] Error saving delta: {e}")
+            return False
+
+    def load_state(self, session_id: str) -> Optional[FlowState]:
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT user_id, status, updated_at, last_node, last_action FROM flow_states WHERE session_id = ?",
+                    (session_id,),
+                ).fetchone()
+                if row is None:
+                    return None
+                data_rows = self._conn.execute(
+                    "SELECT namespace, value, models FROM flow_state_data WHERE session_id = ?", (session_id,)
+                ).fetchall()
+            return FlowState(
+                session_id=session_id,
+                user_id=row[0],
+                status=row[1],
+                updated_at=row[2],
+                last_node=row[3],
+                last_action=row[4],
+                data={ns: self._decode(value) for ns, value, _ in data_rows},
+                models={ns: json.loads(models) for ns, _, models in data_rows if models},
+            )
+        except Exception:
+            return None
+
+
+class SQLiteAgentMemory(BaseAgentMemory):
+    """
+    Stores agent memories in a single SQLite database (WAL mode) with an index on
+    (user_id, created_at), so `get_memories` is an indexed range scan. Term counts
+    of every memory are kept in `memory_terms`, so `search_memories` ranks with
+    the same tokenizer and BM25 scoring as the file-system backends.
+    """
+
+    _COLUMNS = "memory_id, user_id, content, metadata, created_at"
+    # Memory ids are only unique per user
+    _SCHEMA = (
+        "memory_id TEXT NOT NULL, user_id TEXT NOT NULL, content TEXT NOT NULL, "
+        "metadata TEXT NOT NULL, created_at TEXT NOT NULL, length INTEGER, PRIMARY KEY (user_id, memory_id)"
+    )
+
+    def __init__(self, db_path: str = ".memories/memories.db", k1: float = 1.5, b: float = 0.75):
+        self.db_path = db_path
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+        self._conn = connect(db_path)
+        with self._conn:
+            self._conn.execute(f"CREATE TABLE IF NOT EXISTS memories ({self._SCHEMA})")
+            # Databases created before BM25 search have no term counts yet
+            _add_missing_columns(self._conn, "memories", {"length": "INTEGER"})
+            self._key_by_user()
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_memories_user_created ON memories (user_id, created_at)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS memory_terms ("
+                "user_id TEXT NOT NULL, term TEXT NOT NULL, memory_id TEXT NOT NULL, tf INTEGER NOT NULL, "
+                "PRIMARY KEY (user_id, term, memory_id)) WITHOUT ROWID"
+            )
+            self._conn.execute("DROP INDEX IF EXISTS idx_memory_terms_memory")
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_memory_terms_user_memory ON memory_terms (user_id, memory_id)"
+            )
+            unindexed = self._conn.execute(
+                "SELECT memory_id, user_id, content FROM memories WHERE length IS NULL"
+            ).fetchall()
+            self._index_terms(unindexed)
+
+    def _key_by_user(self):
+        """Rebuilds a table created with memory_id alone as its primary key. Caller commits."""
+        key = {row[1] for row in self._conn.execute("PRAGMA table_info(memories)") if row[5]}
+        if key != {"memory_id"}:
+            return
+        self._conn.execute(f"CREATE TABLE memories_by_user ({self._SCHEMA})")
+        self._conn.execute(
+            f"INSERT INTO memories_by_user ({self._COLUMNS}, length) SELECT {self._COLUMNS}, length FROM memories "
+            "ORDER BY rowid"
+        )
+        self._conn.execute("DROP TABLE memories")
+        self._conn.execute("ALTER TABLE memories_by_user RENAME TO memories")
+
+    def cache_stamp(self, user_id: str):
+        return _data_version(self._conn, self._lock)
+
+    def _to_row(self, item: AgentMemoryItem):
+        return (item.memory_id, item.user_id, item.content, to_json(item.metadata).decode(), _timestamp(item.created_at))
+
+    def _from_row(self, row) -> AgentMemoryItem:
+        return AgentMemoryItem(
+            memory_id=row[0], user_id=row[1], content=row[2], metadata=json.loads(row[3]), created_at=row[4]
+        )
+
+    def _index_terms(self, rows):
+        """Replaces the term counts and length of (memory_id, user_id, content) rows. Caller commits."""
+        if not rows:
+            return
+        self._conn.executemany(
+            "DELETE FROM memory_terms WHERE user_id = ? AND memory_id = ?", [(r[1], r[0]) for r in rows]
+        )
+        terms, lengths = [], []
+        for memory_id, user_id, content in rows:
+            counts = term_counts(content)
+            terms.extend((user_id, term, memory_id, tf) for term, tf in counts.items())
+            lengths.append((sum(counts.values()), user_id, memory_id))
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO memory_terms (user_id, term, memory_id, tf) VALUES (?, ?, ?, ?)", terms
+        )
+        self._conn.executemany("UPDATE memories SET length = ? WHERE user_id = ? AND memory_id = ?", lengths)
+
+    def add_memory(self, item: AgentMemoryItem) -> bool:
+        return self.add_memories([item])
+
+    def add_memories(self, items: List[AgentMemoryItem]) -> bool:
+        try:
+            rows = [self._to_row(item) for item in items]
+            with self._lock, self._conn:
+                self._conn.executemany(
+                    f"INSERT OR REPLACE INTO memories ({self._COLUMNS}) VALUES (?, ?, ?, ?, ?)", rows
+                )
+                self._index_terms([(r[0], r[1], r[2]) for r in rows])
+            return True
+        except Exception:
+            return False
+
+    def delete_memory(self, user_id: str, memory_id: str) -> bool:
+        try:
+            with self._lock, self._conn:
+                cursor = self._conn.execute(
+                    "DELETE FROM memories WHERE user_id = ? AND memory_id = ?", (user_id, memory_id)
+                )
+                if cursor.rowcount > 0:
+                    self._conn.execute(
+                        "DELETE FROM memory_terms WHERE user_id = ? AND memory_id = ?", (user_id, memory_id)
+                    )
+            return cursor.rowcount > 0
+        except Exception:
+            return False
+
+    def get_memories(self, user_id: str, limit: int = 10):
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {self._COLUMNS} FROM memories WHERE user_id = ? ORDER BY created_at DESC LIMIT ?",
+                (user_id, limit),
+            ).fetchall()
+        return [self._from_row(r) for r in rows]
+
+    def search_memories(self, user_id: str, query: str, limit: Optional[int] = None):
+        """Returns memories sharing a term with `query`, best BM25 match first."""
+        terms = sorted(set(tokenize(query)))
+        if not terms:
+            return []
+        with self._lock:
+            n_docs, total_length = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(length), 0) FROM memories WHERE user_id = ?", (user_id,)
+            ).fetchone()
+            postings = []
+            for chunk in _chunks(terms):
+                postings.extend(self._conn.execute(
+                    "SELECT t.term, t.memory_id, t.tf, m.length, m.rowid FROM memory_terms t "
+                    "JOIN memories m ON m.user_id = t.user_id AND m.memory_id = t.memory_id "
+                    f"WHERE t.user_id = ? AND t.term IN ({', '.join('?' * len(chunk))})",
+                    (user_id, *chunk),
+                ))
+            if not postings:
+                return []
+            # Insertion order, so equal scores rank the same as in the file-system backends
+            postings.sort(key=lambda posting: posting[4])
+            df = {}
+            for term, *_ in postings:
+                df[term] = df.get(term, 0) + 1
+            avg_length = (total_length / n_docs) or 1.0
+            scores = {}
+            for term, memory_id, tf, length, _ in postings:
+                score = bm25(tf, df[term], n_docs, length, avg_length, self.k1, self.b)
+                scores[memory_id] = scores.get(memory_id, 0.0) + score
+            ranked = [memory_id for memory_id, _ in rank(scores, limit)]
+            rows = []
+            for chunk in _chunks(ranked):
+                rows.extend(self._conn.execute(
+                    f"SELECT {self._COLUMNS} FROM memories "
+                    f"WHERE user_id = ? AND memory_id IN ({', '.join('?' * len(chunk))})",
+                    (user_id, *chunk),
+                ))
+        by_id = {row[0]: row for row in rows}
+        return [self._from_row(by_id[memory_id]) for memory_id in ranked]
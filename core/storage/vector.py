@@ -0,0 +1,217 @@
+import os
+import json
+import zlib
+import threading
+from typing import List, Optional
+from .base import BaseAgentMemory, AgentMemoryItem
+from .fs import stat_stamp
+from .index import tokenize
+
+try:
+    import numpy as np
+
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+
+class HashingEmbedder:
+    """
+    Offline embedder: word tokens and character n-grams hashed into a fixed number
+    of signed buckets, L2-normalised. Deterministic across processes (crc32, not `hash`).
+    Any object with `dim` and `embed(texts) -> float32 array (len(texts), dim)` can replace it.
+    """
+
+    def __init__(self, dim: int = 512, ngram_range=(3, 4)):
+        self.dim = dim
+        self.ngram_range = ngram_range
+
+    def _features(self, text: str) -> List[str]:
+        words = tokenize(text)
+        features = list(words)
+        for word in words:
+            padded = f" {word} "
+            for n in range(self.ngram_range[0], self.ngram_range[1] + 1):
+                features.extend(padded[i:i + n] for i in range(len(padded) - n + 1))
+        return features
+
+    def embed(self, texts: List[str]) -> "np.ndarray":
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                h = zlib.crc32(feature.encode("utf-8"))
+                matrix[row, h % self.dim] += 1.0 if (h >> 31) & 1 else -1.0
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+
+class VectorAgentMemory(BaseAgentMemory):
+    """
+    Semantic agent memory. Per user it keeps three append-only files:
+    - `user_<id>.jsonl`: the memory items, one per line
+    - `user_<id>.vec`:   a contiguous float32 matrix of normalised embeddings (memory-mapped for queries)
+    - `user_<id>.off`:   int64 byte offsets of each row's item in the JSONL file
+    Deleted rows are marked in `user_<id>.del`, one byte per row (missing bytes are live),
+    and skipped by `get_memories` and `search_memories`.
+    `search_memories` scores every row with a single matmul and picks the top-k with argpartition.
+    """
+
+    def __init__(self, base_dir: str = ".memories/vectors", embedder=None, min_score: float = 0.0):
+        if not NUMPY_AVAILABLE:
+            raise ImportError("VectorAgentMemory requires numpy. Install with: pip install numpy")
+        self.base_dir = base_dir
+        self.embedder = embedder or HashingEmbedder()
+        self.min_score = min_score
+        self._lock = threading.Lock()
+        os.makedirs(self.base_dir, exist_ok=True)
+
+    def _get_user_path(self, user_id: str, ext: str) -> str:
+        safe_uid = "".join([c for c in user_id if c.isalnum() or c in "-_"])
+        return os.path.join(self.base_dir, f"user_{safe_uid}.{ext}")
+
+    def cache_stamp(self, user_id: str):
+        return stat_stamp(
+            self._get_user_path(user_id, "off"), self._get_user_path(user_id, "vec"), self._get_user_path(user_id, "del")
+        )
+
+    def _row_count(self, user_id: str) -> int:
+        """Number of complete rows; a crash mid-append may leave one file a row ahead."""
+        sizes = []
+        for ext, row_bytes in (("vec", 4 * self.embedder.dim), ("off", 8)):
+            path = self._get_user_path(user_id, ext)
+            sizes.append(os.path.getsize(path) // row_bytes if os.path.exists(path) else 0)
+        return min(sizes)
+
+    def _check_dim(self, user_id: str):
+        """Re-embeds the user's memories if they were stored with a different embedding size."""
+        meta_path = self._get_user_path(user_id, "meta.json")
+        if os.path.exists(meta_path):
+            with open(meta_path, "r") as f:
+                if json.load(f).get("dim") == self.embedder.dim:
+                    return
+        items_path = self._get_user_path(user_id, "jsonl")
+        if os.path.exists(items_path):
+            # Offsets stay valid, only vectors need recomputing
+            offsets = self._offsets(user_id)
+            with open(items_path, "rb") as f:
+                contents = []
+                for offset in offsets:
+                    f.seek(int(offset))
+                    contents.append(json.loads(f.readline())["content"])
+            self.embedder.embed(contents).astype(np.float32).tofile(self._get_user_path(user_id, "vec"))
+        with open(meta_path, "w") as f:
+            json.dump({"dim": self.embedder.dim}, f)
+
+    def _offsets(self, user_id: str) -> "np.ndarray":
+        path = self._get_user_path(user_id, "off")
+        if not os.path.exists(path):
+            return np.zeros(0, dtype=np.int64)
+        return np.fromfile(path, dtype=np.int64)
+
+    def _deleted(self, user_id: str, n: int) -> "np.ndarray":
+        """Boolean tombstone mask for the first `n` rows."""
+        mask = np.zeros(n, dtype=bool)
+        path = self._get_user_path(user_id, "del")
+        if os.path.exists(path):
+            marks = np.fromfile(path, dtype=np.uint8)[:n]
+            mask[:len(marks)] = marks.astype(bool)
+        return mask
+
+    def _read_rows(self, user_id: str, rows) -> List[AgentMemoryItem]:
+        n = self._row_count(user_id)
+        offsets = np.memmap(self._get_user_path(user_id, "off"), dtype=np.int64, mode="r", shape=(n,))
+        items = []
+        with open(self._get_user_path(user_id, "jsonl"), "rb") as f:
+            for row in rows:
+                f.seek(int(offsets[row]))
+                items.append(AgentMemoryItem(**json.loads(f.readline())))
+        return items
+
+    def add_memory(self, item: AgentMemoryItem) -> bool:
+        return self.add_memories([item])
+
+    def add_memories(self, items: List[AgentMemoryItem]) -> bool:
+        try:
+            by_user = {}
+            for item in items:
+                by_user.setdefault(item.user_id, []).append(item)
+            with self._lock:
+                for user_id, new_items in by_user.items():
+                    self._check_dim(user_id)
+                    n = self._row_count(user_id)
+                    vec_path = self._get_user_path(user_id, "vec")
+                    off_path = self._get_user_path(user_id, "off")
+                    # Drop any partial row left behind by a crash before appending
+                    for path, row_bytes in ((vec_path, 4 * self.embedder.dim), (off_path, 8)):
+                        if os.path.exists(path) and os.path.getsize(path) != n * row_bytes:
+                            os.truncate(path, n * row_bytes)
+
+                    vectors = self.embedder.embed([item.content for item in new_items]).astype(np.float32)
+                    offsets = []
+                    with open(self._get_user_path(user_id, "jsonl"), "ab") as f:
+                        for item in new_items:
+                            offsets.append(f.tell())
+                            f.write((item.model_dump_json() + "\n").encode("utf-8"))
+                    with open(vec_path, "ab") as f:
+                        vectors.tofile(f)
+                    with open(off_path, "ab") as f:
+                        np.asarray(offsets, dtype=np.int64).tofile(f)
+            return True
+        except Exception as e:
+            print(f"[Vector Memory] Error saving: {e}")
+            return False
+
+    def delete_memory(self, user_id: str, memory_id: str) -> bool:
+        try:
+            with self._lock:
+                n = self._row_count(user_id)
+                if n == 0:
+                    return False
+                live = np.flatnonzero(~self._deleted(user_id, n))
+                rows = [row for row, item in zip(live, self._read_rows(user_id, live)) if item.memory_id == memory_id]
+                if not rows:
+                    return False
+                path = self._get_user_path(user_id, "del")
+                size = os.path.getsize(path) if os.path.exists(path) else 0
+                with open(path, "r+b" if size else "wb") as f:
+                    if size < n:
+                        f.seek(size)
+                        f.write(bytes(n - size))
+                    for row in rows:
+                        f.seek(int(row))
+                        f.write(b"\x01")
+            return True
+        except Exception as e:
+            print(f"[Vector Memory] Error deleting: {e}")
+            return False
+
+    def get_memories(self, user_id: str, limit: int = 10):
+        n = self._row_count(user_id)
+        if n == 0:
+            return []
+        live = np.flatnonzero(~self._deleted(user_id, n))
+        items = self._read_rows(user_id, live[max(0, len(live) - limit):])
+        items.sort(key=lambda x: x.created_at, reverse=True)
+        return items
+
+    def search_memories(self, user_id: str, query: str, limit: Optional[int] = None):
+        """Returns memories whose cosine similarity to `query` exceeds `min_score`, best first."""
+        if not os.path.exists(self._get_user_path(user_id, "jsonl")):
+            return []
+        with self._lock:
+            self._check_dim(user_id)
+        n = self._row_count(user_id)
+        if n == 0:
+            return []
+        matrix = np.memmap(self._get_user_path(user_id, "vec"), dtype=np.float32, mode="r", shape=(n, self.embedder.dim))
+        scores = matrix @ self.embedder.embed([query])[0]
+        scores[self._deleted(user_id, n)] = -np.inf
+
+        k = n if limit is None else min(limit, n)
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k] if k < n else np.arange(n)
+        top = top[np.argsort(-scores[top])]
+        top = top[scores[top] > self.min_score]
+        return self._read_rows(user_id, top)
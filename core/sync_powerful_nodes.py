@@ -1,11 +1,27 @@
-import re
-import json
 import os
+import sys
+import copy
+import atexit
+import functools
+import itertools
+import multiprocessing
+import threading
+import time
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    TimeoutError as FutureTimeoutError,
+    wait,
+)
 from pocketflow import Node
 from .llm import get_model_object, get_instructor_client
 from .smolagents_factory import run_agent_with_context
-from .storage.fs import FileSystemStatePersistence
-from .storage.base import FlowState
+from .checkpoint import mark_dirty, save_checkpoint
+from .parsing import extract_json, namespace_for, parse_model
+from .rate_limit import limited_call, usage_tokens
+from .repair import build_repair_messages, repair_model
+from .replay import replay_call
 
 
 class PowerfulNode(Node):
@@ -20,13 +36,9 @@ class PowerfulNode(Node):
 
     @property
     def namespace(self) -> str:
-        # Defaults to snake_case of class name (e.g. MyNode -> my)
-        name = self.__class__.__name__
-        if name.endswith('Node'):
-            name = name[:-4]
-        name = re.sub('(.)([A-Z][a-z]+)', r'\1_\2', name)
-        name = re.sub('([a-z0-9])([A-Z])', r'\1_\2', name).lower()
-        return name
+        # Defaults to snake_case of class name (e.g. MyNode -> my), computed once per class.
+        # Subclasses may override with a property or a plain class attribute.
+        return namespace_for(type(self))
 
     def _init_namespace(self, shared: dict):
         if self.namespace not in shared:
@@ -35,6 +47,7 @@ class PowerfulNode(Node):
     def _write_namespace(self, shared: dict, **updates):
         self._init_namespace(shared)
         shared[self.namespace].update(updates)
+        mark_dirty(shared, self.namespace)
 
     def _read_namespace(self, shared: dict, namespace: str = None) -> dict:
         return shared.get(namespace or self.namespace, {})
@@ -44,50 +57,65 @@ class PowerfulNode(Node):
             print(message)
 
     def _clean_and_parse_json(self, content):
-        if isinstance(content, dict):
-            return content
-        if not isinstance(content, str):
-            raise ValueError("Content is not dict or string")
-
-        # Remove markdown
-        content = re.sub(r'```json\s*', '', content)
-        content = re.sub(r'```', '', content)
-
-        # Find JSON object
-        start = content.find('{')
-        end = content.rfind('}')
-        if start != -1 and end != -1:
-            return json.loads(content[start:end + 1])
-        raise ValueError("No JSON found")
+        return extract_json(content)
 
     def _llm_repair(self, content: str, response_model, system_prompt: str):
         self._log(f"[{self.namespace}] Validation failed. Attempting LLM repair...")
-        client = get_instructor_client()
         model_id = self.model.model_id
         if not os.getenv("OPENAI_API_KEY") and not model_id.startswith("huggingface/"):
             model_id = f"huggingface/{model_id}"
+        messages = build_repair_messages(content, response_model, system_prompt)
 
-        return client.chat.completions.create(
-            model=model_id,
-            response_model=response_model,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": str(content)}
-            ]
+        def create():
+            # Same limiter and 429 backoff as the model's own completions
+            validated, _ = limited_call(
+                lambda: get_instructor_client().chat.completions.create_with_completion(
+                    model=model_id,
+                    response_model=response_model,
+                    messages=messages
+                ),
+                messages,
+                usage=lambda result: usage_tokens(result[1]),
+            )
+            return validated
+
+        return replay_call(
+            "instructor",
+            {
+                "model": model_id,
+                "response_model": f"{response_model.__module__}:{response_model.__qualname__}",
+                "messages": messages,
+            },
+            create,
+            encode=lambda result: result.model_dump(mode="json"),
+            decode=response_model.model_validate,
         )
 
     def parse_and_validate(self, exec_res, response_model, system_prompt: str, result_key: str, shared: dict):
         # 1. Fast Path
         try:
-            data = self._clean_and_parse_json(exec_res)
-            validated = response_model(**data)
-            self._write_namespace(shared, status="success", **{result_key: validated})
+            validated, fixes = parse_model(exec_res, response_model)
+        except Exception:
+            pass
+        else:
+            if fixes:
+                self._log(f"[{self.namespace}] Parsed output after local fixes: {', '.join(fixes)}")
+            self._write_namespace(shared, status="success", json_fixes=fixes, **{result_key: validated})
             shared[self.namespace][result_key] = validated  # Direct access
             return "success"
+
+        # 2. Local schema-aware repair (no LLM call)
+        try:
+            validated, fixes = repair_model(exec_res, response_model)
         except Exception:
             pass
+        else:
+            self._log(f"[{self.namespace}] Coerced output locally: {', '.join(fixes)}")
+            self._write_namespace(shared, status="coerced", json_fixes=fixes, **{result_key: validated})
+            shared[self.namespace][result_key] = validated
+            return "success"
 
-        # 2. Repair Path
+        # 3. LLM Repair Path
         try:
             validated = self._llm_repair(exec_res, response_model, system_prompt)
             self._write_namespace(shared, status="repaired", **{result_key: validated})
@@ -97,9 +125,9 @@ class PowerfulNode(Node):
             error_msg = str(e)
             self._write_namespace(shared, status="error", error=error_msg)
             # Global error log
-            if "errors" not in shared:
-                shared["errors"] = {}
-            shared["errors"][self.namespace] = {"message": error_msg, "raw": str(exec_res)[:200]}
+            # setdefault: parallel batch items may record errors at the same time
+            shared.setdefault("errors", {})[self.namespace] = {"message": error_msg, "raw": str(exec_res)[:200]}
+            mark_dirty(shared, "errors")
             return "error"
 
     def run_and_validate(self, agent, task, response_model, shared, result_key, system_prompt, session_id=None, user_id=None, max_retries=3):
@@ -114,9 +142,8 @@ class PowerfulNode(Node):
                 error_msg = str(e)
                 self._log(f"[{self.namespace}] Agent attempt failed: {error_msg}")
                 # Store error for the retry prompt
-                if "errors" not in shared:
-                    shared["errors"] = {}
-                shared["errors"][self.namespace] = {"message": error_msg}
+                shared.setdefault("errors", {})[self.namespace] = {"message": error_msg}
+                mark_dirty(shared, "errors")
 
             error = shared.get("errors", {}).get(self.namespace, {}).get("message", "Unknown")
             self._log(f"[{self.namespace}] Total failure on attempt: {error}")
@@ -127,13 +154,13 @@ class PowerfulNode(Node):
     def post(self, shared, prep_res, exec_res):
         """Checkpointing hook."""
         try:
-            state = FlowState(
-                session_id=shared["input"].get("session_id", "unknown"),
-                user_id=shared["input"].get("user_id"),
-                status="running",
-                data=shared
+            # Own namespace may also have been written directly (shared[ns][key] = ...)
+            mark_dirty(shared, self.namespace)
+            save_checkpoint(
+                shared,
+                node_id=getattr(self, "checkpoint_id", None) or self.__class__.__name__,
+                action=exec_res if isinstance(exec_res, str) else None,
             )
-            FileSystemStatePersistence().save_state(state)
             self._log(f"[{self.namespace}] Checkpoint saved.")
         except Exception as e:
             self._log(f"[{self.namespace}] Checkpoint failed: {e}")
@@ -145,6 +172,203 @@ class PowerfulBatchNode(PowerfulNode):
         return [super(PowerfulBatchNode, self)._exec(i) for i in (items or [])]
 
 
+class PowerfulParallelBatchNode(PowerfulNode):
+    """
+    Batch node running items on a thread pool, for I/O-bound work (HTTP tools, sync LLM calls).
+    Results keep the order of the items. An item still running `timeout` seconds after it
+    started is abandoned and handed to `exec_fallback` with a TimeoutError (which re-raises
+    by default). `_write_namespace` is serialised, so items may write to `shared` from exec.
+    """
+
+    def __init__(self, *args, max_workers: int = None, timeout: float = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if max_workers is None:
+            max_workers = int(os.getenv("POCKETFLOW_THREAD_WORKERS", "8"))
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self._namespace_lock = threading.Lock()
+
+    def _write_namespace(self, shared: dict, **updates):
+        with self._namespace_lock:
+            super()._write_namespace(shared, **updates)
+
+    def _exec(self, items):
+        items = list(items or [])
+        if not items:
+            return []
+        started = {}
+
+        def run(index, item):
+            started[index] = time.monotonic()
+            return super(PowerfulParallelBatchNode, self)._exec(item)
+
+        executor = ThreadPoolExecutor(max_workers=min(self.max_workers, len(items)))
+        try:
+            futures = [executor.submit(run, index, item) for index, item in enumerate(items)]
+            return [self._result(future, index, items[index], started) for index, future in enumerate(futures)]
+        finally:
+            # Don't wait for abandoned items; their threads finish in the background
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _result(self, future, index, item, started):
+        if self.timeout is None:
+            return future.result()
+        while True:
+            start = started.get(index)
+            # Items still queued behind busy workers get their full timeout once they start
+            remaining = self.timeout if start is None else start + self.timeout - time.monotonic()
+            try:
+                return future.result(timeout=max(remaining, 0))
+            except FutureTimeoutError:
+                if start is not None:
+                    return self.exec_fallback(item, TimeoutError(f"Item {index} exceeded {self.timeout}s"))
+
+
+class PowerfulStreamBatchNode(PowerfulNode):
+    """
+    Batch node for large or unbounded batches: `prep` may return any iterable (e.g. a
+    generator), items are pulled lazily with at most `max_in_flight` running on threads,
+    and each result goes to `post_item` as soon as it completes, so memory stays
+    proportional to `max_in_flight` rather than to the batch. `post_item` runs on the
+    calling thread and may write to `shared` freely; `_write_namespace` is serialised,
+    so items may also use it from exec.
+
+    `post` runs once at the end with the number of processed items as `exec_res`;
+    the default checkpoints and returns the "default" action.
+    """
+
+    def __init__(self, *args, max_in_flight: int = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if max_in_flight is None:
+            max_in_flight = int(os.getenv("POCKETFLOW_THREAD_WORKERS", "8"))
+        self.max_in_flight = max_in_flight
+        self._namespace_lock = threading.Lock()
+
+    def _write_namespace(self, shared: dict, **updates):
+        with self._namespace_lock:
+            super()._write_namespace(shared, **updates)
+
+    def post_item(self, shared, item, result):
+        pass
+
+    def _stream(self, items):
+        """Yields (item, result) pairs in completion order."""
+        items = iter(items or [])
+        if self.max_in_flight <= 1:
+            for item in items:
+                yield item, PowerfulNode._exec(self, item)
+            return
+
+        with ThreadPoolExecutor(max_workers=self.max_in_flight) as executor:
+            pending = {}
+
+            def refill():
+                for item in itertools.islice(items, self.max_in_flight - len(pending)):
+                    pending[executor.submit(PowerfulNode._exec, self, item)] = item
+
+            refill()
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield pending.pop(future), future.result()
+                refill()
+
+    def _run(self, shared):
+        prep_res = self.prep(shared)
+        count = 0
+        for item, result in self._stream(prep_res):
+            self.post_item(shared, item, result)
+            count += 1
+        return self.post(shared, prep_res, count)
+
+    def post(self, shared, prep_res, exec_res):
+        super().post(shared, prep_res, None)
+        return None
+
+
+_process_pools = {}
+_process_pools_lock = threading.Lock()
+
+
+def _process_context():
+    # Forking once checkpoint-writer, MCP or litellm threads run can copy their held locks into
+    # the children; forkserver (spawn where unavailable) starts workers from a clean process
+    if "forkserver" not in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("spawn")
+    context = multiprocessing.get_context("forkserver")
+    # Workers fork from a server that has already imported core (and litellm) once
+    context.set_forkserver_preload([__name__])
+    _start_forkserver()
+    return context
+
+
+def _start_forkserver():
+    """
+    Starts the fork server with this process's sys.path on PYTHONPATH. The server ignores
+    the sys.path it is handed (before Python 3.13), so the preload would silently miss a
+    `core` that is only importable through an entry added at runtime.
+    """
+    from multiprocessing import forkserver
+    previous = os.environ.get("PYTHONPATH")
+    paths = [os.path.abspath(path) for path in sys.path]
+    os.environ["PYTHONPATH"] = os.pathsep.join(paths + ([previous] if previous else []))
+    try:
+        forkserver.ensure_running()
+    finally:
+        if previous is None:
+            del os.environ["PYTHONPATH"]
+        else:
+            os.environ["PYTHONPATH"] = previous
+
+
+def _get_process_pool(max_workers: int) -> ProcessPoolExecutor:
+    """One pool per worker count, reused across nodes and runs so workers start only once."""
+    with _process_pools_lock:
+        pool = _process_pools.get(max_workers)
+        if pool is None:
+            pool = _process_pools[max_workers] = ProcessPoolExecutor(
+                max_workers=max_workers, mp_context=_process_context()
+            )
+            atexit.register(pool.shutdown, wait=False, cancel_futures=True)
+        return pool
+
+
+def _exec_in_worker(node, item):
+    return PowerfulNode._exec(node, item)
+
+
+class PowerfulProcessBatchNode(PowerfulNode):
+    """
+    Batch node whose items run `exec` in worker processes, for CPU-bound per-item work.
+    Results keep the order of the items. Items and the node itself are pickled, so the
+    node class must be importable (module level) and `exec` must not rely on `shared`;
+    workers are started with forkserver (spawn where unavailable), so scripts creating
+    the flow need an `if __name__ == "__main__":` guard. Batches smaller than
+    `min_batch_size` run in-process, where pickling would cost more than it saves.
+    """
+
+    def __init__(self, *args, max_workers: int = None, chunksize: int = None, min_batch_size: int = 8, **kwargs):
+        super().__init__(*args, **kwargs)
+        if max_workers is None:
+            max_workers = int(os.getenv("POCKETFLOW_PROCESS_WORKERS", "0")) or os.cpu_count() or 1
+        self.max_workers = max_workers
+        self.chunksize = chunksize
+        self.min_batch_size = min_batch_size
+
+    def _exec(self, items):
+        items = list(items or [])
+        if self.max_workers <= 1 or len(items) < self.min_batch_size:
+            return [super(PowerfulProcessBatchNode, self)._exec(i) for i in items]
+
+        # Workers need the node's exec and params, not the graph hanging off its successors
+        worker = copy.copy(self)
+        worker.successors = {}
+        # A few chunks per worker balances uneven items against per-chunk IPC overhead
+        chunksize = self.chunksize or max(1, len(items) // (self.max_workers * 4))
+        pool = _get_process_pool(self.max_workers)
+        return list(pool.map(functools.partial(_exec_in_worker, worker), items, chunksize=chunksize))
+
+
 """
 # This is up to the user to always import it from here, or just add it to the list of nodes in nodes.py
 class EndNode(Node):
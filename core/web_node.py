@@ -1,10 +1,13 @@
 from core import PowerfulNode
-from core.smolagents_factory import get_agent
+from core.checkpoint import mark_dirty
+from core.agent_pool import get_agent_pool, pooled_agent
 from core.web_tools import BrowseToPageTool, FillFormFieldTool, ClickButtonTool, PlaywrightThread, GetPageInfoTool
 from pocketflow import Node
 
 # Internal cache to avoid PocketFlow serialization errors
 _WEB_THREAD_CACHE = {}
+# Tools per (session_id, action screenshot path), built once per browser session
+_WEB_TOOLS_CACHE = {}
 
 class BaseWebNode(PowerfulNode):
     """
@@ -61,28 +64,30 @@ CRITICAL RULES:
             if should_capture:
                 action_path = f"artifacts/screenshots/{session_id}/{self.__class__.__name__}_action.png"
 
-            tools = [
-                BrowseToPageTool(pw_thread), 
-                FillFormFieldTool(pw_thread), 
-                ClickButtonTool(pw_thread, screenshot_path=action_path), 
-                GetPageInfoTool(pw_thread)
-            ]
-            agent = get_agent(self.model, tools=tools)
-            
+            tools = _WEB_TOOLS_CACHE.get((session_id, action_path))
+            if tools is None:
+                tools = _WEB_TOOLS_CACHE[(session_id, action_path)] = [
+                    BrowseToPageTool(pw_thread),
+                    FillFormFieldTool(pw_thread),
+                    ClickButtonTool(pw_thread, screenshot_path=action_path),
+                    GetPageInfoTool(pw_thread)
+                ]
+
             # 4. Generate Task Instruction with Mission Constraints
             task = f"{self.prep_task(inputs)}\n\nMISSION CONSTRAINTS:\n{self.system_prompt}"
 
-            # 5. Run and Validate
-            status = self.run_and_validate(
-                agent=agent,
-                task=task,
-                response_model=self.response_model,
-                shared=shared,
-                result_key=self.result_key,
-                system_prompt=self.system_prompt,
-                session_id=session_id,
-                user_id=inputs.get("user_id")
-            )
+            # 5. Run and Validate (agent reused across web nodes of this browser session)
+            with pooled_agent(self.model, tools=tools) as agent:
+                status = self.run_and_validate(
+                    agent=agent,
+                    task=task,
+                    response_model=self.response_model,
+                    shared=shared,
+                    result_key=self.result_key,
+                    system_prompt=self.system_prompt,
+                    session_id=session_id,
+                    user_id=inputs.get("user_id")
+                )
 
             # 6. Final Screenshot (Result)
             if should_capture:
@@ -95,6 +100,7 @@ CRITICAL RULES:
 
             # 7. Capture Session State
             shared["storage_state"] = pw_thread.get_storage_state()
+            mark_dirty(shared, "storage_state")
             
             return status
         finally:
@@ -118,4 +124,6 @@ class WebEndNode(Node):
             print(f"[WebEndNode] Closing shared browser session: {session_id}")
             pw_thread.stop()
             del _WEB_THREAD_CACHE[session_id]
+        for key in [k for k in _WEB_TOOLS_CACHE if k[0] == session_id]:
+            get_agent_pool().discard(_WEB_TOOLS_CACHE.pop(key))
         return "Flow_ended"
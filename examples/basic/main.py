@@ -9,6 +9,7 @@ current_dir = os.path.dirname(os.path.abspath(__file__))
 root_path = os.path.abspath(os.path.join(current_dir, "..", ".."))
 sys.path.append(root_path)
 from core.smolagents_factory import setup_smolagents_instrumentation
+from core.resume import label_flow_nodes, resume_flow
 from flow import get_flow
 
 
@@ -20,9 +21,10 @@ def main():
     parser.add_argument("--topic", type=str, default="AI Agents", help="Topic to research.")
     parser.add_argument("--user-id", type=str, default="user-default", help="Helpful if tracing is used")
     parser.add_argument("--mcp-urls", nargs="+", help="MCP Server URLs.")
+    parser.add_argument("--resume", metavar="SESSION_ID", help="Continue a session from its last checkpoint.")
     args = parser.parse_args()
 
-    session_id = f"session-{uuid.uuid4()}"
+    session_id = args.resume or f"session-{uuid.uuid4()}"
     user_id = args.user_id
 
     otel_env = os.getenv("ENABLE_OPEN_TELEMETRY", "false").lower()
@@ -48,7 +50,11 @@ def main():
 
     # Run Flow
     flow = get_flow(session_id, user_id, tracing_enabled)
-    flow.run(shared_state)
+    label_flow_nodes(flow)
+    if args.resume:
+        shared_state = resume_flow(flow, session_id)
+    else:
+        flow.run(shared_state)
 
     # Output Results
     res = shared_state.get("research", {}).get("result")
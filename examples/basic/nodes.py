@@ -1,6 +1,7 @@
 from pocketflow import Node
 from core import PowerfulNode
-from core.smolagents_factory import get_agent, get_mcp_tools
+from core.agent_pool import pooled_agent
+from core.smolagents_factory import mcp_tools
 from smolagents import DuckDuckGoSearchTool
 from tools import RandomNumberTool
 from models import ExampleResult
@@ -26,15 +27,9 @@ class ResearchNode(PowerfulNode):
 
         # Tools
         tools = [DuckDuckGoSearchTool(), RandomNumberTool()]
-        mcp_client = None
 
-        if mcp_urls:
-            mcp_client, mcp_tools = get_mcp_tools(mcp_urls)
-            if mcp_tools:
-                tools.extend(mcp_tools)
-
-        try:
-            agent = get_agent(self.model, tools=tools)
+        # MCP connection borrowed from the process-wide pool
+        with mcp_tools(mcp_urls) as server_tools, pooled_agent(self.model, tools=tools + server_tools) as agent:
             task = example_task(topic)
 
             # Execute with Retry & Validation
@@ -49,9 +44,6 @@ class ResearchNode(PowerfulNode):
                 user_id=inputs["user_id"]
             )
             return status
-        finally:
-            if mcp_client:
-                mcp_client.disconnect()
 
 
 # This node is not actually required but helps to end the flow more cleanly
@@ -3,7 +3,8 @@ import uuid
 from pocketflow import Node
 from core import PowerfulNode
 from core.smolagents_factory import get_agent
-from core.storage.fs import FileSystemAgentMemory, AgentMemoryItem
+from core.storage.base import AgentMemoryItem
+from core.storage.registry import get_agent_memory
 from smolagents import Tool
 
 # We'll use a simple tool to generate bash commands
@@ -54,13 +55,13 @@ class PlanNode(PowerfulNode):
         user_input = inputs["user_input"]
         user_id = inputs["user_id"]
         
-        memory = FileSystemAgentMemory()
+        memory = get_agent_memory()
         
         # 1. Search Memory
         # We look for exact matches or high similarity. 
-        # For this simple example, we search for the exact string or contained string.
+        # The memory returns BM25-ranked keyword matches; we then check the best few for a contained string.
         # Ideally, we'd use semantic search.
-        memories = memory.search_memories(user_id, user_input)
+        memories = memory.search_memories(user_id, user_input, limit=5)
         
         # Simple heuristic: if we find a memory where the content (the goal) is very close
         match = None
@@ -81,7 +82,8 @@ class PlanNode(PowerfulNode):
 
         # 2. Generate if not found
         print("\n[Planner] Thinking of a command...")
-        agent = get_agent(self.model)
+        # Stream tokens so the planner shows progress from the first token on
+        agent = get_agent(self.model, stream_outputs=True)
         
         # System info
         import platform
@@ -186,7 +188,7 @@ class SaveMemoryNode(PowerfulNode):
         ans = input("> ").strip().lower()
         
         if ans == 'y':
-            memory = FileSystemAgentMemory()
+            memory = get_agent_memory()
             item = AgentMemoryItem(
                 memory_id=str(uuid.uuid4()),
                 user_id=inputs["user_id"],
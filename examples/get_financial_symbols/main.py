@@ -10,19 +10,23 @@ current_dir = os.path.dirname(os.path.abspath(__file__))
 root_path = os.path.abspath(os.path.join(current_dir, "..", ".."))
 sys.path.append(root_path)
 from core.smolagents_factory import setup_smolagents_instrumentation
+from core.resume import label_flow_nodes, resume_flow
 from flow import get_flow
 
 
 def main():
     parser = argparse.ArgumentParser(description="Symbol Analysis Agent")
-    parser.add_argument("--symbols", nargs="+", required=True, help="List of stock/crypto symbols")
-    parser.add_argument("--api-url", required=True, help="URL of the price API")
-    parser.add_argument("--mcp-url", required=True, help="URL of the MCP server")
+    parser.add_argument("--symbols", nargs="+", help="List of stock/crypto symbols")
+    parser.add_argument("--api-url", help="URL of the price API")
+    parser.add_argument("--mcp-url", help="URL of the MCP server")
     parser.add_argument("--user-id", default="user-default")
+    parser.add_argument("--resume", metavar="SESSION_ID", help="Continue a session from its last checkpoint.")
 
     args = parser.parse_args()
+    if not args.resume and not (args.symbols and args.api_url and args.mcp_url):
+        parser.error("--symbols, --api-url and --mcp-url are required unless --resume is given")
 
-    session_id = f"session-{uuid.uuid4()}"
+    session_id = args.resume or f"session-{uuid.uuid4()}"
     user_id = args.user_id
 
     otel_env = os.getenv("ENABLE_OPEN_TELEMETRY", "false").lower()
@@ -44,7 +48,11 @@ def main():
     }
 
     flow = get_flow(session_id, user_id, tracing_enabled)
-    flow.run(shared_state)
+    label_flow_nodes(flow)
+    if args.resume:
+        shared_state = resume_flow(flow, session_id)
+    else:
+        flow.run(shared_state)
 
     result = shared_state.get("recommendation", {}).get("final_analysis")
     if result:
@@ -1,5 +1,6 @@
 from core import PowerfulNode
-from core.smolagents_factory import get_agent, get_mcp_tools
+from core.agent_pool import pooled_agent
+from core.smolagents_factory import mcp_tools
 from models import PriceDataList, ConvertedPriceDataList, FinalResult, PriceData, ConvertedPriceData, SymbolAnalysis
 from prompts import price_fetch_task, conversion_task, recommendation_task
 from tools import PriceFetcherTool, CurrencyConverterTool
@@ -21,21 +22,21 @@ class PriceNode(PowerfulNode):
         print(f"[PriceNode] Fetching prices for: {symbols}")
 
         price_tool = PriceFetcherTool(api_base_url=api_url)
-        agent = get_agent(self.model, tools=[price_tool])
 
         # Strategy: Construct a task for ALL symbols
         task = f"Fetch prices for the following symbols: {', '.join(symbols)}. Return a JSON object with a list 'items' containing symbol, price, currency, name for each. Always wrap your code in <code> tags."
         
-        status = self.run_and_validate(
-            agent=agent,
-            task=task,
-            response_model=PriceDataList,
-            shared=inputs["shared"],
-            result_key="prices",
-            system_prompt="You are a stock price fetcher. Use the tool to get prices.",
-            session_id=inputs["session_id"],
-            user_id=inputs["user_id"]
-        )
+        with pooled_agent(self.model, tools=[price_tool]) as agent:
+            status = self.run_and_validate(
+                agent=agent,
+                task=task,
+                response_model=PriceDataList,
+                shared=inputs["shared"],
+                result_key="prices",
+                system_prompt="You are a stock price fetcher. Use the tool to get prices.",
+                session_id=inputs["session_id"],
+                user_id=inputs["user_id"]
+            )
         return status
 
 class ConverterNode(PowerfulNode):
@@ -56,22 +57,21 @@ class ConverterNode(PowerfulNode):
             
         print(f"[ConverterNode] Converting prices for {len(prices.items)} items.")
         
-        agent = get_agent(self.model, tools=[CurrencyConverterTool()])
-        
         # Serialize input for the prompt
         data_str = prices.model_dump_json()
         task = f"Convert these prices to CAD using the tool (rate 1.40). Data: {data_str}. Return JSON with list 'items' containing symbol, price_cad, price_usd, name. Always wrap your code in <code> tags."
 
-        status = self.run_and_validate(
-            agent=agent,
-            task=task,
-            response_model=ConvertedPriceDataList,
-            shared=inputs["shared"],
-            result_key="converted_prices",
-            system_prompt="You are a currency converter.",
-            session_id=inputs["session_id"],
-            user_id=inputs["user_id"]
-        )
+        with pooled_agent(self.model, tools=[CurrencyConverterTool()]) as agent:
+            status = self.run_and_validate(
+                agent=agent,
+                task=task,
+                response_model=ConvertedPriceDataList,
+                shared=inputs["shared"],
+                result_key="converted_prices",
+                system_prompt="You are a currency converter.",
+                session_id=inputs["session_id"],
+                user_id=inputs["user_id"]
+            )
         return status
 
 class RecommendationNode(PowerfulNode):
@@ -94,16 +94,8 @@ class RecommendationNode(PowerfulNode):
 
         print(f"[RecommendationNode] Getting recommendations for {len(converted.items)} items.")
         
-        # MCP Connection
-        mcp_client = None
-        tools = []
-        if mcp_url:
-            mcp_client, mcp_tools = get_mcp_tools([mcp_url])
-            if mcp_tools: tools.extend(mcp_tools)
-        
-        try:
-            agent = get_agent(self.model, tools=tools)
-            
+        # MCP connection borrowed from the process-wide pool
+        with mcp_tools([mcp_url] if mcp_url else []) as tools, pooled_agent(self.model, tools=tools) as agent:
             # Construct task
             # We want to merge the converted price data with the new recommendation data
             data_str = converted.model_dump_json()
@@ -132,8 +124,6 @@ class RecommendationNode(PowerfulNode):
                 user_id=inputs["user_id"]
             )
             return status
-        finally:
-            if mcp_client: mcp_client.disconnect()
 
 class EndNode(PowerfulNode):
     def exec(self, inputs):
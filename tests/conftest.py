@@ -0,0 +1,6 @@
+import os
+import sys
+
+# Use litellm's bundled model cost map instead of fetching it on import
+os.environ.setdefault("LITELLM_LOCAL_MODEL_COST_MAP", "True")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
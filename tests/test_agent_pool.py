@@ -0,0 +1,38 @@
+from smolagents import DuckDuckGoSearchTool, Tool
+from core.agent_pool import AgentPool, tool_signature
+from core.llm import LiteLLMModel
+
+
+class GreetTool(Tool):
+    name = "greet"
+    description = "Greets someone."
+    inputs = {"who": {"type": "string", "description": "Who to greet"}}
+    output_type = "string"
+
+    def __init__(self, greeting: str = "Hello"):
+        self.greeting = greeting
+        self._calls = 0
+        super().__init__()
+
+    def forward(self, who: str) -> str:
+        self._calls += 1
+        return f"{self.greeting}, {who}"
+
+
+def test_builtin_tool_constructions_reuse_one_agent():
+    pool = AgentPool()
+    model = LiteLLMModel(model_id="gpt-4o-mini")
+    agents = set()
+    for _ in range(5):
+        with pool.lease(model, tools=[DuckDuckGoSearchTool()]) as agent:
+            agents.add(id(agent))
+    assert len(agents) == 1
+    assert len(pool._idle) == 1
+
+
+def test_signature_ignores_runtime_state_but_not_config():
+    first, second = GreetTool(), GreetTool()
+    second._calls = 3
+    assert tool_signature(first) == tool_signature(second)
+    assert tool_signature(GreetTool("Hi")) != tool_signature(first)
+    assert tool_signature(DuckDuckGoSearchTool(max_results=3)) != tool_signature(DuckDuckGoSearchTool())
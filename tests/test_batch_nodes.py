@@ -0,0 +1,78 @@
+import os
+import time
+from multiprocessing import forkserver
+import core.sync_powerful_nodes as sync_nodes
+from core.sync_powerful_nodes import PowerfulParallelBatchNode, PowerfulProcessBatchNode, PowerfulStreamBatchNode
+
+
+class SquareNode(PowerfulProcessBatchNode):
+    def exec(self, item):
+        return item * item, os.getpid()
+
+
+def test_process_batch_keeps_item_order_across_workers():
+    node = SquareNode(max_workers=2, min_batch_size=4)
+    results = node._exec(range(20))
+    assert [square for square, _ in results] == [i * i for i in range(20)]
+    assert os.getpid() not in {pid for _, pid in results}
+
+
+def test_small_process_batches_run_in_process():
+    results = SquareNode(max_workers=2, min_batch_size=8)._exec([3, 4])
+    assert results == [(9, os.getpid()), (16, os.getpid())]
+
+
+def test_fork_server_starts_with_the_runtime_sys_path(monkeypatch, tmp_path):
+    seen = []
+    monkeypatch.setattr(forkserver, "ensure_running", lambda: seen.append(os.environ["PYTHONPATH"]))
+    monkeypatch.setattr(sync_nodes.sys, "path", [str(tmp_path), *sync_nodes.sys.path])
+    monkeypatch.setenv("PYTHONPATH", "/already/set")
+    sync_nodes._start_forkserver()
+    paths = seen[0].split(os.pathsep)
+    assert paths[0] == str(tmp_path)
+    assert paths[-1] == "/already/set"
+    assert os.environ["PYTHONPATH"] == "/already/set"
+
+
+class CollectNode(PowerfulStreamBatchNode):
+    def prep(self, shared):
+        return (i for i in range(30))
+
+    def exec(self, item):
+        self._write_namespace(self.shared, **{f"item_{item}": item})
+        return item * 2
+
+    def post_item(self, shared, item, result):
+        shared.setdefault("results", {})[item] = result
+
+
+def test_stream_batch_posts_every_item_and_serialises_namespace_writes(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    shared = {}
+    node = CollectNode(max_in_flight=4)
+    node.shared = shared
+    node._run(shared)
+    assert shared["results"] == {i: i * 2 for i in range(30)}
+    assert shared["collect"] == {f"item_{i}": i for i in range(30)}
+
+
+class SleepyNode(PowerfulParallelBatchNode):
+    def exec(self, item):
+        time.sleep(item)
+        return f"done {item}"
+
+    def exec_fallback(self, prep_res, exc):
+        return f"fallback: {type(exc).__name__}"
+
+
+def test_thread_batch_keeps_order_and_falls_back_on_timeout():
+    node = SleepyNode(max_workers=2, timeout=0.3)
+    started = time.monotonic()
+    results = node._exec([0.05, 2, 0.01, 0.02])
+    assert results == ["done 0.05", "fallback: TimeoutError", "done 0.01", "done 0.02"]
+    assert time.monotonic() - started < 1.5
+
+
+def test_thread_batch_queued_items_get_their_full_timeout():
+    # One worker: the second item only starts once the first is done
+    assert SleepyNode(max_workers=1, timeout=0.3)._exec([0.2, 0.2]) == ["done 0.2", "done 0.2"]
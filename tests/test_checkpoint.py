@@ -0,0 +1,124 @@
+import asyncio
+import threading
+import time
+from datetime import datetime, timedelta
+import pytest
+import core.checkpoint as checkpoint
+from core.checkpoint import CheckpointWriter, mark_dirty, save_checkpoint, save_checkpoint_async
+from core.storage.base import FlowState
+from core.storage.fs import FileSystemStatePersistence
+
+
+def _state(**data):
+    return FlowState(session_id="s1", user_id="u1", status="running", data=data)
+
+
+def test_incremental_checkpoints_survive_a_torn_journal_write(monkeypatch, tmp_path):
+    monkeypatch.setenv("POCKETFLOW_CHECKPOINT_MODE", "incremental")
+    store = FileSystemStatePersistence(str(tmp_path))
+    shared = {"input": {"session_id": "s1"}, "plan": {"steps": 1}, "draft": {"text": "a"}}
+    assert save_checkpoint(shared, persistence=store, node_id="Plan")
+
+    shared["draft"]["text"] = "ab"
+    mark_dirty(shared, "draft")
+    assert save_checkpoint(shared, persistence=store, node_id="Draft", action="default")
+    journal = tmp_path / "s1.journal.jsonl"
+    assert journal.exists()
+    # A crash in the middle of the next append
+    with open(journal, "a") as f:
+        f.write('{"session_id": "s1", "data": {"draft": {"te')
+
+    loaded = FileSystemStatePersistence(str(tmp_path)).load_state("s1")
+    assert loaded.data["draft"] == {"text": "ab"}
+    assert loaded.data["plan"] == {"steps": 1}
+    assert (loaded.last_node, loaded.last_action) == ("Draft", "default")
+
+
+def test_journal_is_ordered_by_sequence_not_clock(tmp_path):
+    store = FileSystemStatePersistence(str(tmp_path))
+    now = datetime.now()
+    store.save_state(_state(a=1).model_copy(update={"updated_at": now}))
+    # The wall clock stepped back between the snapshot and the delta
+    store.save_delta(_state(a=2).model_copy(update={"updated_at": now - timedelta(hours=1)}), ["a"])
+    loaded = FileSystemStatePersistence(str(tmp_path)).load_state("s1")
+    assert loaded.data == {"a": 2}
+    assert loaded.seq == 2
+
+
+def test_entries_already_in_the_snapshot_are_not_replayed(tmp_path):
+    store = FileSystemStatePersistence(str(tmp_path))
+    store.save_state(_state(a=1))
+    store.save_delta(_state(a=2), ["a"])
+    stale = (tmp_path / "s1.journal.jsonl").read_text()
+    store.save_state(_state(a=3))
+    # A crash between writing the snapshot and removing the journal leaves it behind
+    (tmp_path / "s1.journal.jsonl").write_text(stale)
+    assert FileSystemStatePersistence(str(tmp_path)).load_state("s1").data == {"a": 3}
+
+
+class SlowPersistence:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.saved = []
+        self.release = threading.Event()
+
+    def save_state(self, state):
+        self.release.wait(5)
+        time.sleep(self.delay)
+        self.saved.append(("state", state.data, None))
+        return True
+
+    def save_delta(self, state, namespaces):
+        self.release.wait(5)
+        self.saved.append(("delta", state.data, set(namespaces)))
+        return True
+
+
+def test_writer_coalesces_queued_saves_and_flushes():
+    persistence = SlowPersistence()
+    writer = CheckpointWriter(persistence)
+    writer.submit(_state(a=0))
+    time.sleep(0.05)  # The first save is now in progress, blocked on `release`
+    writer.submit(_state(a=1), ["a"])
+    writer.submit(_state(a=2, b=1), ["b"])
+    persistence.release.set()
+    writer.flush()
+    assert persistence.saved == [("state", {"a": 0}, None), ("delta", {"a": 2, "b": 1}, {"a", "b"})]
+    writer.close()
+    with pytest.raises(RuntimeError):
+        writer.submit(_state(a=3))
+
+
+def test_background_checkpoint_persists_a_snapshot_of_shared(monkeypatch):
+    monkeypatch.setenv("POCKETFLOW_CHECKPOINT_BACKGROUND", "true")
+    persistence = SlowPersistence()
+    writer = CheckpointWriter(persistence)
+    monkeypatch.setattr(checkpoint, "get_checkpoint_writer", lambda: writer)
+    shared = {"input": {"session_id": "s1"}, "plan": {"steps": [1]}}
+    assert save_checkpoint(shared)
+    shared["plan"]["steps"].append(2)
+    persistence.release.set()
+    writer.close()
+    assert persistence.saved[0][1]["plan"] == {"steps": [1]}
+
+
+def test_async_checkpoint_does_not_block_the_event_loop():
+    persistence = SlowPersistence(delay=0.3)
+    persistence.release.set()
+    shared = {"input": {"session_id": "s1"}, "plan": {"steps": 1}}
+
+    async def run():
+        ticks = 0
+
+        async def tick():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+        ticker = asyncio.create_task(tick())
+        assert await save_checkpoint_async(shared, persistence=persistence)
+        ticker.cancel()
+        return ticks
+
+    assert asyncio.run(run()) >= 10
+    assert persistence.saved[0][1]["plan"] == {"steps": 1}
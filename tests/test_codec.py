@@ -0,0 +1,46 @@
+import pytest
+from core.storage.base import FlowState
+from core.storage.codec import MSGPACK_AVAILABLE, ZSTD_AVAILABLE, StateCodec
+from core.storage.fs import FileSystemStatePersistence
+from core.storage.sqlite import SQLiteStatePersistence
+
+SPECS = ["json", "json+zlib"]
+if MSGPACK_AVAILABLE:
+    SPECS += ["msgpack", "msgpack+zlib"]
+if ZSTD_AVAILABLE:
+    SPECS += ["json+zstd"]
+
+
+def _state():
+    return FlowState(session_id="s1", user_id="u1", status="running", data={"plan": {"steps": ["a", "b"], "n": 2}})
+
+
+@pytest.mark.parametrize("spec", SPECS)
+def test_states_round_trip(spec):
+    codec = StateCodec.from_spec(spec)
+    state = _state()
+    blob = codec.encode_state(state)
+    assert blob.startswith(b"PFST") == codec.is_binary
+    assert StateCodec.decode_state(blob) == state
+
+
+def test_unknown_specs_are_rejected():
+    with pytest.raises(ValueError):
+        StateCodec.from_spec("yaml")
+    with pytest.raises(ValueError):
+        StateCodec.from_spec("json+lzma")
+
+
+def test_snapshots_written_with_another_codec_keep_loading(tmp_path):
+    FileSystemStatePersistence(str(tmp_path)).save_state(_state())
+    store = FileSystemStatePersistence(str(tmp_path), codec="json+zlib")
+    assert store.load_state("s1").data == _state().data
+    store.save_state(_state().model_copy(update={"status": "done"}))
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["s1.state"]
+    assert FileSystemStatePersistence(str(tmp_path)).load_state("s1").status == "done"
+
+
+def test_sqlite_rows_keep_loading_across_codecs(tmp_path):
+    path = str(tmp_path / "states.db")
+    SQLiteStatePersistence(path, codec="json+zlib").save_state(_state())
+    assert SQLiteStatePersistence(path).load_state("s1").data == _state().data
@@ -0,0 +1,63 @@
+import json
+import os
+from core.storage.base import AgentMemoryItem
+from core.storage.fs import FileSystemAgentMemory
+
+
+def _item(user_id, memory_id, content):
+    return AgentMemoryItem(user_id=user_id, memory_id=memory_id, content=content)
+
+
+def test_search_get_delete_round_trip(tmp_path):
+    memory = FileSystemAgentMemory(str(tmp_path))
+    memory.add_memories([_item("u1", "m1", "the cat sat on the mat"), _item("u1", "m2", "dogs chase the cat")])
+    memory.add_memory(_item("u1", "m3", "stock prices fell"))
+    assert [m.memory_id for m in memory.search_memories("u1", "cat mat")] == ["m1", "m2"]
+    assert [m.memory_id for m in memory.get_memories("u1", limit=2)] == ["m3", "m2"]
+    assert memory.delete_memory("u1", "m1")
+    assert not memory.delete_memory("u1", "m1")
+    assert [m.memory_id for m in memory.search_memories("u1", "cat")] == ["m2"]
+    # A fresh instance reads the persisted index
+    assert [m.memory_id for m in FileSystemAgentMemory(str(tmp_path)).search_memories("u1", "prices")] == ["m3"]
+
+
+def test_users_are_isolated(tmp_path):
+    memory = FileSystemAgentMemory(str(tmp_path))
+    memory.add_memory(_item("u1", "m1", "apples"))
+    memory.add_memory(_item("u2", "m1", "bananas"))
+    assert memory.search_memories("u2", "apples") == []
+    assert [m.content for m in memory.search_memories("u1", "apples")] == ["apples"]
+
+
+def test_reading_an_unknown_user_touches_no_files(tmp_path):
+    memory = FileSystemAgentMemory(str(tmp_path))
+    assert memory.search_memories("nobody", "anything") == []
+    assert memory.get_memories("nobody") == []
+    assert os.listdir(tmp_path) == []
+
+
+def test_legacy_layout_is_searched_without_rewriting(tmp_path):
+    path = tmp_path / "user_u1.json"
+    items = [_item("u1", "m1", "old apples").model_dump(mode="json")]
+    path.write_text(json.dumps(items, indent=2))
+    before = path.read_bytes()
+    memory = FileSystemAgentMemory(str(tmp_path))
+    assert [m.memory_id for m in memory.search_memories("u1", "apples")] == ["m1"]
+    assert path.read_bytes() == before
+    # The next add rewrites it one memory per line
+    memory.add_memory(_item("u1", "m2", "new apples"))
+    assert sorted(m.memory_id for m in memory.search_memories("u1", "apples")) == ["m1", "m2"]
+    assert path.read_bytes().startswith(b"[\n{")
+
+
+def test_failed_write_keeps_earlier_memories(tmp_path, monkeypatch):
+    memory = FileSystemAgentMemory(str(tmp_path))
+    memory.add_memory(_item("u1", "m1", "apples"))
+
+    def crash(src, dst):
+        raise OSError("disk full")
+    monkeypatch.setattr(os, "replace", crash)
+    assert not memory.add_memory(_item("u1", "m2", "bananas"))
+    monkeypatch.undo()
+    assert [m.memory_id for m in memory.get_memories("u1")] == ["m1"]
+    assert [name for name in os.listdir(tmp_path) if name.endswith(".tmp")] == []
@@ -0,0 +1,53 @@
+import os
+from core.storage.base import AgentMemoryItem
+from core.storage.fs import JsonlAgentMemory
+
+
+def _item(user_id, memory_id, content):
+    return AgentMemoryItem(user_id=user_id, memory_id=memory_id, content=content)
+
+
+def test_search_get_delete_round_trip(tmp_path):
+    memory = JsonlAgentMemory(str(tmp_path), fsync="never")
+    memory.add_memories([_item("u1", "m1", "the cat sat on the mat"), _item("u1", "m2", "dogs chase the cat")])
+    memory.add_memory(_item("u1", "m3", "stock prices fell"))
+    assert [m.memory_id for m in memory.search_memories("u1", "cat mat")] == ["m1", "m2"]
+    assert [m.memory_id for m in memory.get_memories("u1", limit=2)] == ["m3", "m2"]
+    assert memory.delete_memory("u1", "m1")
+    assert not memory.delete_memory("u1", "m1")
+    assert [m.memory_id for m in memory.search_memories("u1", "cat")] == ["m2"]
+    other = JsonlAgentMemory(str(tmp_path), fsync="never")
+    assert [m.memory_id for m in other.get_memories("u1")] == ["m3", "m2"]
+    assert memory.search_memories("u2", "cat") == []
+
+
+def test_index_is_reused_while_the_log_is_unchanged(tmp_path, monkeypatch):
+    memory = JsonlAgentMemory(str(tmp_path), fsync="never")
+    memory.add_memory(_item("u1", "m1", "apples"))
+    saves = []
+    original = memory._save_index
+    monkeypatch.setattr(memory, "_save_index", lambda *args: saves.append(args) or original(*args))
+    for _ in range(3):
+        assert [m.memory_id for m in memory.search_memories("u1", "apples")] == ["m1"]
+    assert len(saves) == 1
+    memory.add_memory(_item("u1", "m2", "more apples"))
+    assert len(memory.search_memories("u1", "apples")) == 2
+    assert len(saves) == 2
+
+
+def test_compaction_keeps_live_items(tmp_path):
+    memory = JsonlAgentMemory(str(tmp_path), fsync="never", compact_min_lines=1)
+    memory.add_memories([_item("u1", f"m{i}", f"apple {i}") for i in range(4)])
+    for i in range(3):
+        memory.delete_memory("u1", f"m{i}")
+    memory.compact("u1")
+    with open(memory._get_user_path("u1")) as f:
+        assert len(f.readlines()) == 1
+    assert [m.memory_id for m in memory.search_memories("u1", "apple")] == ["m3"]
+
+
+def test_reading_an_unknown_user_touches_no_files(tmp_path):
+    memory = JsonlAgentMemory(str(tmp_path))
+    assert memory.search_memories("nobody", "anything") == []
+    assert memory.get_memories("nobody") == []
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,46 @@
+import asyncio
+import threading
+import core.llm as llm
+from core.llm import LiteLLMModel
+from core.llm_cache import LLMResponseCache
+
+MESSAGES = [{"role": "user", "content": "Say hello"}]
+
+
+class ThreadRecordingCache(LLMResponseCache):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.threads = []
+
+    def get(self, key):
+        self.threads.append(threading.get_ident())
+        return super().get(key)
+
+    def put(self, key, value):
+        self.threads.append(threading.get_ident())
+        return super().put(key, value)
+
+
+def test_acall_serves_repeats_from_the_cache_off_the_event_loop(monkeypatch, tmp_path):
+    cache = ThreadRecordingCache(str(tmp_path / "llm.db"))
+    monkeypatch.setattr(llm, "get_llm_cache", lambda: cache)
+    calls = []
+    real_acompletion = llm.acompletion
+
+    async def acompletion(**kwargs):
+        calls.append(kwargs)
+        return await real_acompletion(**kwargs)
+    monkeypatch.setattr(llm, "acompletion", acompletion)
+    model = LiteLLMModel(model_id="gpt-4o-mini")
+
+    async def run():
+        loop_thread = threading.get_ident()
+        first = await model.acall(MESSAGES, mock_response="hello")
+        second = await model.acall(MESSAGES, mock_response="hello")
+        return loop_thread, first, second
+
+    loop_thread, first, second = asyncio.run(run())
+    assert first.choices[0].message.content == second.choices[0].message.content == "hello"
+    assert len(calls) == 1
+    assert len(cache.threads) == 3
+    assert loop_thread not in cache.threads
@@ -0,0 +1,55 @@
+from types import SimpleNamespace
+import core.llm as llm
+import core.llm_cache as llm_cache
+from core.llm import LiteLLMModel
+from core.llm_cache import LLMResponseCache, cache_key
+
+MESSAGES = [{"role": "user", "content": "Say hello"}]
+
+
+def test_cache_key_ignores_credentials_but_not_sampling():
+    base = cache_key("gpt-4o", MESSAGES, temperature=0)
+    assert cache_key("gpt-4o", MESSAGES, temperature=0, api_key="secret") == base
+    assert cache_key("gpt-4o", MESSAGES, temperature=1) != base
+    assert cache_key("gpt-4o-mini", MESSAGES, temperature=0) != base
+
+
+def test_entries_persist_across_instances_and_expire(tmp_path, monkeypatch):
+    path = str(tmp_path / "llm.db")
+    LLMResponseCache(path).put("k", {"answer": 1})
+    assert LLMResponseCache(path).get("k") == {"answer": 1}
+
+    cache = LLMResponseCache(path, ttl=60)
+    clock = [1_000_000.0]
+    monkeypatch.setattr(llm_cache, "time", SimpleNamespace(time=lambda: clock[0]))
+    cache.put("fresh", {"answer": 2})
+    assert cache.get("fresh") == {"answer": 2}
+    clock[0] += 61
+    assert cache.get("fresh") is None
+
+
+def test_oldest_used_rows_are_evicted(tmp_path):
+    cache = LLMResponseCache(str(tmp_path / "llm.db"), max_entries=10, memory_size=1)
+    for i in range(100):
+        cache.put(f"k{i}", {"i": i})
+    assert cache.get("k0") is None
+    assert cache.get("k99") == {"i": 99}
+
+
+def test_completions_are_served_from_the_cache(tmp_path, monkeypatch):
+    cache = LLMResponseCache(str(tmp_path / "llm.db"))
+    monkeypatch.setattr(llm, "get_llm_cache", lambda: cache)
+    calls = []
+    real_completion = llm.completion
+
+    def completion(**kwargs):
+        calls.append(kwargs)
+        return real_completion(**kwargs)
+    monkeypatch.setattr(llm, "completion", completion)
+    model = LiteLLMModel(model_id="gpt-4o-mini")
+
+    assert model(MESSAGES, mock_response="hi").choices[0].message.content == "hi"
+    assert model(MESSAGES, mock_response="hi").choices[0].message.content == "hi"
+    assert len(calls) == 1
+    model(MESSAGES, mock_response="hi", bypass_cache=True)
+    assert len(calls) == 2
@@ -0,0 +1,80 @@
+from types import SimpleNamespace
+import pytest
+import core.smolagents_factory as factory
+from core.smolagents_factory import MCPConnectionPool
+
+
+class FakeTool:
+    def __init__(self, name):
+        self.name = name
+
+
+class FakeClient:
+    def __init__(self, urls):
+        self.urls = urls
+        self.connected = True
+
+    def disconnect(self):
+        self.connected = False
+
+
+@pytest.fixture
+def servers(monkeypatch):
+    """Fake MCP servers: records every client opened, answers pings unless told otherwise."""
+    state = {"clients": [], "healthy": True}
+
+    def open_client(urls):
+        client = FakeClient(urls)
+        state["clients"].append(client)
+        return client, [FakeTool(f"tool_{len(state['clients'])}")]
+    monkeypatch.setattr(factory, "_open_mcp_client", open_client)
+    monkeypatch.setattr(factory, "_ping", lambda client, timeout: state["healthy"])
+    return state
+
+
+def test_leases_share_one_connection(servers):
+    pool = MCPConnectionPool(idle_timeout=0)
+    with pool.lease(["http://a"]) as first:
+        with pool.lease(["http://a"]) as second:
+            assert first is second
+    with pool.lease(["http://b"]):
+        pass
+    assert [client.urls for client in servers["clients"]] == [("http://a",), ("http://b",)]
+    pool.close_all()
+    assert not any(client.connected for client in servers["clients"])
+
+
+def test_a_failed_lease_is_checked_and_reconnected(servers):
+    pool = MCPConnectionPool(idle_timeout=0, health_interval=3600)
+    with pytest.raises(RuntimeError):
+        with pool.lease(["http://a"]):
+            raise RuntimeError("connection reset")
+    servers["healthy"] = False
+    with pool.lease(["http://a"]) as tools:
+        assert tools[0].name == "tool_2"
+    assert [client.connected for client in servers["clients"]] == [False, True]
+
+
+def test_healthy_connections_are_kept_after_an_error(servers):
+    pool = MCPConnectionPool(idle_timeout=0, health_interval=3600)
+    with pytest.raises(ValueError):
+        with pool.lease(["http://a"]):
+            raise ValueError("bad tool arguments")
+    with pool.lease(["http://a"]):
+        pass
+    assert len(servers["clients"]) == 1
+
+
+def test_only_idle_connections_are_evicted(servers, monkeypatch):
+    pool = MCPConnectionPool(idle_timeout=60)
+    monkeypatch.setattr(pool, "_start_reaper", lambda: None)
+    clock = [1000.0]
+    monkeypatch.setattr(factory, "time", SimpleNamespace(monotonic=lambda: clock[0]))
+    key, _ = pool.acquire(["http://a"])
+    clock[0] += 120
+    pool.evict_idle()
+    assert servers["clients"][0].connected
+    pool.release(key)
+    clock[0] += 120
+    pool.evict_idle()
+    assert not servers["clients"][0].connected
@@ -0,0 +1,82 @@
+import threading
+import pytest
+import core.mcp_tool_cache as tool_cache
+import core.smolagents_factory as factory
+from core.mcp_tool_cache import MCPToolCache
+from core.smolagents_factory import MCPConnectionPool
+
+
+class FakeTool:
+    inputs = {"text": {"type": "string", "description": "Text to echo"}}
+    output_type = "string"
+    output_schema = None
+
+    def __init__(self, name, description="Echoes its input"):
+        self.name = name
+        self.description = description
+
+    def forward(self, text):
+        return f"{self.name}: {text}"
+
+
+class FakeClient:
+    def disconnect(self):
+        pass
+
+
+@pytest.fixture
+def server(monkeypatch):
+    """One fake MCP server whose tool list can change; `gate` holds connections until set."""
+    state = {"tools": [FakeTool("echo")], "connects": 0, "gate": threading.Event()}
+    state["gate"].set()
+
+    def open_client(urls):
+        state["gate"].wait(5)
+        state["connects"] += 1
+        return FakeClient(), list(state["tools"])
+    monkeypatch.setattr(factory, "_open_mcp_client", open_client)
+    monkeypatch.setattr(factory, "_ping", lambda client, timeout: True)
+    state["pool"] = MCPConnectionPool(idle_timeout=0)
+    monkeypatch.setattr(tool_cache, "get_mcp_pool", lambda: state["pool"])
+    yield state
+    state["pool"].close_all()
+
+
+def test_first_use_discovers_and_stores_definitions(server, tmp_path):
+    cache = MCPToolCache(str(tmp_path / "tools.db"))
+    proxies = cache.tools(["http://a"])
+    assert [proxy.name for proxy in proxies] == ["echo"]
+    assert proxies[0](text="hi") == "echo: hi"
+    assert cache.load("http://a")[1][0]["name"] == "echo"
+    assert server["connects"] == 1
+
+
+def test_stored_definitions_are_served_without_waiting_for_the_server(server, tmp_path):
+    path = str(tmp_path / "tools.db")
+    MCPToolCache(path).tools(["http://a"])
+    old_version = MCPToolCache(path).load("http://a")[0]
+
+    # A new process: no pooled connection yet, and the server is slow and has changed its tools
+    server["pool"].close_all()
+    server["gate"].clear()
+    server["tools"] = [FakeTool("echo", "Echoes its input, loudly")]
+    cache = MCPToolCache(path)
+    proxies = cache.tools(["http://a"])
+    assert proxies[0].description == "Echoes its input"
+
+    server["gate"].set()
+    for _ in range(100):
+        stored = cache.load("http://a")
+        if stored[0] != old_version:
+            break
+        threading.Event().wait(0.05)
+    assert stored[1][0]["description"] == "Echoes its input, loudly"
+    assert cache.tools(["http://a"])[0].description == "Echoes its input, loudly"
+
+
+def test_unreachable_servers_are_skipped(monkeypatch, tmp_path):
+    def refuse(urls):
+        raise ConnectionError("refused")
+    monkeypatch.setattr(factory, "_open_mcp_client", refuse)
+    monkeypatch.setattr(tool_cache, "get_mcp_pool", lambda: MCPConnectionPool(idle_timeout=0))
+    assert MCPToolCache(str(tmp_path / "tools.db")).tools(["http://down"]) == []
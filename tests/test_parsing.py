@@ -0,0 +1,52 @@
+import pytest
+from pydantic import BaseModel
+from core.parsing import extract_json, extract_json_with_fixes, json_spans, namespace_for, parse_model
+
+
+class Answer(BaseModel):
+    answer: int
+
+
+def test_namespace_for_is_snake_case_without_node_suffix():
+    class ResearchNode:
+        pass
+
+    class HTTPFetchNode:
+        pass
+
+    class Summarize:
+        pass
+    assert namespace_for(ResearchNode) == "research"
+    assert namespace_for(HTTPFetchNode) == "http_fetch"
+    assert namespace_for(Summarize) == "summarize"
+
+
+def test_extract_json_strips_fences_and_prose():
+    assert extract_json('Here you go:\n```json\n{"answer": 42}\n```\nAnything else?') == {"answer": 42}
+    assert extract_json({"answer": 1}) == {"answer": 1}
+    with pytest.raises(ValueError):
+        extract_json("no json here")
+
+
+def test_json_spans_balance_braces_and_ignore_strings():
+    text = 'Thoughts {"a": "}{", "b": [1, {"c": 2}]} then {oops and {"d": 1}'
+    spans = [text[start:end] for start, end in json_spans(text)]
+    assert spans == ['{"a": "}{", "b": [1, {"c": 2}]}', '{"d": 1}']
+
+
+@pytest.mark.parametrize("content, data, fixes", [
+    ('{"a": 1, "b": [1, 2,],}', {"a": 1, "b": [1, 2]}, ["trailing_comma"]),
+    ('{"ok": True, "missing": None, "text": "True, None"}',
+     {"ok": True, "missing": None, "text": "True, None"}, ["python_literal"]),
+    ("{'a': 'single quotes'}", {"a": "single quotes"}, ["python_dict"]),
+    ('{"a": 1}', {"a": 1}, []),
+])
+def test_common_glitches_are_fixed_and_named(content, data, fixes):
+    assert extract_json_with_fixes(content) == (data, fixes)
+
+
+def test_parse_model_tries_every_balanced_object():
+    content = 'Draft: {"answer": "unsure"} Final: {"answer": 7}'
+    assert parse_model(content, Answer) == (Answer(answer=7), [])
+    with pytest.raises(Exception):
+        parse_model('{"answer": "unsure"}', Answer)
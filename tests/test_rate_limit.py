@@ -0,0 +1,97 @@
+import asyncio
+from types import SimpleNamespace
+from pydantic import BaseModel
+import core.rate_limit as rate_limit
+import core.sync_powerful_nodes as sync_nodes
+from core.rate_limit import RateLimiter, TokenBucket, alimited_call, limited_call
+
+
+class Answer(BaseModel):
+    value: int
+
+
+class RateLimitError(Exception):
+    status_code = 429
+
+    def __init__(self, retry_after="0.01"):
+        super().__init__("Too Many Requests")
+        self.response = SimpleNamespace(headers={"retry-after": retry_after})
+
+
+def _wrapped_429():
+    # instructor re-raises provider errors as the cause of its own exception
+    try:
+        raise RateLimitError()
+    except RateLimitError as e:
+        try:
+            raise RuntimeError("retries exhausted") from e
+        except RuntimeError as wrapped:
+            return wrapped
+
+
+def _use_limiter(monkeypatch, **kwargs):
+    limiter = RateLimiter(**kwargs)
+    monkeypatch.setattr(rate_limit, "get_rate_limiter", lambda: limiter)
+    return limiter
+
+
+def _flaky(result, failures=1):
+    calls = []
+
+    def call():
+        calls.append(1)
+        if len(calls) <= failures:
+            raise _wrapped_429()
+        return result
+    return call, calls
+
+
+def test_token_bucket_reports_the_wait_once_empty():
+    bucket = TokenBucket(rate_per_minute=60)
+    assert bucket.take(60) == 0.0
+    assert 0.9 < bucket.take(1) <= 1.0
+
+
+def test_limited_call_retries_wrapped_rate_limits_and_records_usage(monkeypatch):
+    limiter = _use_limiter(monkeypatch, tpm=600)
+    response = SimpleNamespace(usage=SimpleNamespace(total_tokens=50))
+    call, calls = _flaky(response)
+    assert limited_call(call, [{"role": "user", "content": "x" * 400}]) is response
+    assert len(calls) == 2
+    # 100 estimated tokens per attempt, then 50 of the last estimate given back
+    assert 445 < limiter.tokens._level < 480
+
+
+def test_limited_call_gives_up_after_max_retries(monkeypatch):
+    _use_limiter(monkeypatch, max_retries=1)
+    call, calls = _flaky("never", failures=5)
+    try:
+        limited_call(call, [])
+    except RuntimeError:
+        pass
+    else:
+        raise AssertionError("expected the rate limit error")
+    assert len(calls) == 2
+
+
+def test_alimited_call_retries(monkeypatch):
+    _use_limiter(monkeypatch)
+    call, calls = _flaky("done")
+
+    async def acall():
+        return call()
+    assert asyncio.run(alimited_call(acall, [])) == "done"
+    assert len(calls) == 2
+
+
+def test_instructor_repair_goes_through_the_limiter(monkeypatch):
+    limiter = _use_limiter(monkeypatch, rpm=1_000)
+    completion = SimpleNamespace(usage=SimpleNamespace(input_tokens=10, output_tokens=5))
+    create, calls = _flaky((Answer(value=1), completion))
+    client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(
+        create_with_completion=lambda **kwargs: create()
+    )))
+    monkeypatch.setattr(sync_nodes, "get_instructor_client", lambda: client)
+    assert sync_nodes.PowerfulNode()._llm_repair('{"value": "one"}', Answer, "Return the answer.") == Answer(value=1)
+    assert len(calls) == 2
+    assert limiter.requests._level < 999
@@ -0,0 +1,44 @@
+import pytest
+from core.storage import registry
+from core.storage.cache import CachedAgentMemory
+from core.storage.memory import InMemoryStatePersistence
+from core.storage.sqlite import SQLiteAgentMemory
+
+
+@pytest.fixture(autouse=True)
+def fresh_registry(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    registry.set_state_persistence(None)
+    registry.set_agent_memory(None)
+    yield
+    registry.set_state_persistence(None)
+    registry.set_agent_memory(None)
+
+
+def test_backends_come_from_the_environment_once(monkeypatch):
+    monkeypatch.setenv("POCKETFLOW_STATE_BACKEND", "memory")
+    monkeypatch.setenv("POCKETFLOW_MEMORY_BACKEND", "sqlite")
+    monkeypatch.setenv("POCKETFLOW_MEMORY_CACHE", "true")
+    state = registry.get_state_persistence()
+    memory = registry.get_agent_memory()
+    assert isinstance(state, InMemoryStatePersistence)
+    assert isinstance(memory, CachedAgentMemory) and isinstance(memory.inner, SQLiteAgentMemory)
+    assert registry.get_state_persistence() is state
+    assert registry.get_agent_memory() is memory
+
+
+def test_set_and_register_override_the_environment(monkeypatch):
+    monkeypatch.setenv("POCKETFLOW_STATE_BACKEND", "fs")
+    custom = InMemoryStatePersistence()
+    registry.register_state_persistence("custom", lambda: custom)
+    try:
+        registry.set_state_persistence("custom")
+        assert registry.get_state_persistence() is custom
+    finally:
+        registry.STATE_BACKENDS.pop("custom")
+
+
+def test_unknown_backend_names_are_rejected(monkeypatch):
+    monkeypatch.setenv("POCKETFLOW_MEMORY_BACKEND", "redis")
+    with pytest.raises(ValueError, match="Unknown memory backend 'redis'"):
+        registry.get_agent_memory()
@@ -0,0 +1,68 @@
+import json
+from typing import List, Literal, Optional
+from pydantic import BaseModel, Field
+from core.repair import coerce_to_schema, compact_schema, repair_model
+
+
+class Page(BaseModel):
+    title: str
+    url: str
+
+
+class Site(BaseModel):
+    title: str = Field(default="Home", title="Site Title")
+    pages: List[Page] = Field(default_factory=list)
+    meta: dict = Field(default={"title": "kept"})
+
+
+def test_compact_schema_keeps_fields_named_title():
+    schema = json.loads(compact_schema(Page))
+    assert "title" not in schema
+    assert set(schema["properties"]) == {"title", "url"}
+    assert schema["required"] == ["title", "url"]
+    assert "title" not in schema["properties"]["title"]
+
+
+def test_compact_schema_keeps_nested_title_fields_and_data():
+    schema = json.loads(compact_schema(Site))
+    assert set(schema["properties"]) == {"title", "pages", "meta"}
+    assert schema["properties"]["title"] == {"default": "Home", "type": "string"}
+    assert set(schema["$defs"]["Page"]["properties"]) == {"title", "url"}
+    assert "title" not in schema["$defs"]["Page"]
+    assert schema["properties"]["meta"]["default"] == {"title": "kept"}
+
+
+class Quote(BaseModel):
+    ticker: str
+    target_price: float
+    shares: int = 0
+    buy: bool = False
+    side: Literal["long", "short"] = "long"
+    tags: List[str] = Field(default_factory=list)
+    count: int = 3
+    note: Optional[str] = "n"
+
+
+def test_repair_model_fixes_mechanical_glitches():
+    content = (
+        'Sure: {"result": {"Ticker": "ACME", "Target Price": "$1,234.50", "shares": "12", '
+        '"buy": "yes", "side": "SHORT", "tags": "tech", "count": null,}}'
+    )
+    quote, fixes = repair_model(content, Quote)
+    assert quote == Quote(ticker="ACME", target_price=1234.5, shares=12, buy=True, side="short", tags=["tech"])
+    assert fixes == [
+        "bool_string", "default", "enum_case", "key_name", "number_string",
+        "trailing_comma", "unwrap", "wrap_list",
+    ]
+
+
+def test_coerce_to_schema_keeps_nulls_the_schema_allows():
+    data, fixes = coerce_to_schema({"ticker": "A", "target_price": 1, "note": None}, Quote)
+    assert data["note"] is None
+    assert fixes == []
+
+
+def test_coerce_to_schema_parses_json_strings():
+    data, fixes = coerce_to_schema({"name": "home", "pages": '[{"title": "a", "url": "/"}]'}, Site)
+    assert data["pages"] == [{"title": "a", "url": "/"}]
+    assert fixes == ["json_string"]
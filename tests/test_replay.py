@@ -0,0 +1,65 @@
+import asyncio
+import core.llm as llm
+import core.replay as replay
+from core.llm import LiteLLMModel
+from core.replay import Cassette
+from smolagents.models import ChatMessage, MessageRole
+
+MESSAGES = [ChatMessage(role=MessageRole.USER, content="Say hello")]
+
+
+def _use_cassette(monkeypatch, path, mode):
+    cassette = Cassette(str(path), mode=mode)
+    monkeypatch.setattr(replay, "get_cassette", lambda: cassette)
+    return cassette
+
+
+def _offline(monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError("replay mode called the provider")
+    monkeypatch.setattr(llm, "completion", fail)
+    monkeypatch.setattr(llm, "acompletion", fail)
+
+
+def _collect(deltas):
+    deltas = list(deltas)
+    text = "".join(d.content or "" for d in deltas)
+    usage = [d.token_usage for d in deltas if d.token_usage]
+    return text, (usage[-1].input_tokens, usage[-1].output_tokens)
+
+
+def test_generate_stream_records_and_replays(monkeypatch, tmp_path):
+    model = LiteLLMModel(model_id="gpt-4o-mini")
+    path = tmp_path / "stream.jsonl"
+
+    _use_cassette(monkeypatch, path, "record")
+    recorded = _collect(model.generate_stream(MESSAGES, mock_response="hello there"))
+    assert recorded[0] == "hello there"
+    assert '"llm_stream"' in path.read_text()
+
+    _use_cassette(monkeypatch, path, "replay")
+    _offline(monkeypatch)
+    streamed = []
+    with llm.subscribe_stream(streamed.append):
+        assert _collect(model.generate_stream(MESSAGES, mock_response="hello there")) == recorded
+    assert "".join(streamed) == "hello there"
+
+
+def test_async_stream_records_and_replays(monkeypatch, tmp_path):
+    model = LiteLLMModel(model_id="gpt-4o-mini")
+    path = tmp_path / "astream.jsonl"
+    messages = [{"role": "user", "content": "Say hello"}]
+
+    async def text():
+        stream = await model.acall(messages, stream=True, mock_response="hi async")
+        parts = []
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                parts.append(chunk.choices[0].delta.content)
+        return "".join(parts)
+
+    _use_cassette(monkeypatch, path, "record")
+    assert asyncio.run(text()) == "hi async"
+    _use_cassette(monkeypatch, path, "replay")
+    _offline(monkeypatch)
+    assert asyncio.run(text()) == "hi async"
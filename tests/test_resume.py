@@ -0,0 +1,89 @@
+import asyncio
+import pytest
+from pocketflow import AsyncFlow, Flow
+from pydantic import BaseModel
+from core.async_powerful_nodes import AsyncPowerfulNode
+from core.resume import label_flow_nodes, resume_flow, resume_flow_async
+from core.storage import registry
+from core.storage.memory import InMemoryStatePersistence
+from core.sync_powerful_nodes import PowerfulNode
+
+
+class Plan(BaseModel):
+    steps: list
+
+
+class Step(PowerfulNode):
+    def __init__(self, runs, fail=False):
+        super().__init__()
+        self.runs = runs
+        self.fail = fail
+
+    def exec(self, prep_res):
+        if self.fail:
+            raise RuntimeError("crash")
+        return "default"
+
+    def post(self, shared, prep_res, exec_res):
+        self.runs.append(self.checkpoint_id)
+        self._write_namespace(shared, plan=Plan(steps=self.runs[:]))
+        return super().post(shared, prep_res, exec_res)
+
+
+class AsyncStep(AsyncPowerfulNode):
+    def __init__(self, runs, fail=False):
+        super().__init__()
+        self.runs = runs
+        self.fail = fail
+
+    async def exec_async(self, prep_res):
+        if self.fail:
+            raise RuntimeError("crash")
+        return "default"
+
+    async def post_async(self, shared, prep_res, exec_res):
+        self.runs.append(self.checkpoint_id)
+        self._write_namespace(shared, plan=Plan(steps=self.runs[:]))
+        return await super().post_async(shared, prep_res, exec_res)
+
+
+@pytest.fixture
+def store():
+    store = InMemoryStatePersistence()
+    registry.set_state_persistence(store)
+    yield store
+    registry.set_state_persistence(None)
+
+
+def _build(cls, runs, fail_second, flow_cls):
+    first, second, third = cls(runs), cls(runs, fail=fail_second), cls(runs)
+    first >> second >> third
+    flow = flow_cls(start=first)
+    label_flow_nodes(flow)
+    return flow
+
+
+def test_resume_continues_after_the_last_checkpointed_node(store):
+    runs = []
+    with pytest.raises(RuntimeError):
+        _build(Step, runs, True, Flow).run({"input": {"session_id": "s1"}})
+    assert runs == ["Step"]
+
+    shared = resume_flow(_build(Step, runs, False, Flow), "s1")
+    assert runs == ["Step", "Step#2", "Step#3"]
+    assert shared["step"]["plan"] == Plan(steps=runs)
+
+
+def test_resume_flow_async(store):
+    runs = []
+    with pytest.raises(RuntimeError):
+        asyncio.run(_build(AsyncStep, runs, True, AsyncFlow).run_async({"input": {"session_id": "s1"}}))
+
+    shared = asyncio.run(resume_flow_async(_build(AsyncStep, runs, False, AsyncFlow), "s1"))
+    assert runs == ["AsyncStep", "AsyncStep#2", "AsyncStep#3"]
+    assert isinstance(shared["async_step"]["plan"], Plan)
+
+
+def test_resume_without_a_checkpoint_fails(store):
+    with pytest.raises(ValueError, match="No checkpoint"):
+        resume_flow(_build(Step, [], False, Flow), "missing")
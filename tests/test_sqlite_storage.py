@@ -0,0 +1,67 @@
+import sqlite3
+from core.storage.base import AgentMemoryItem, FlowState
+from core.storage.sqlite import SQLiteAgentMemory, SQLiteStatePersistence
+
+
+def _item(user_id, memory_id, content):
+    return AgentMemoryItem(user_id=user_id, memory_id=memory_id, content=content)
+
+
+def test_state_delta_only_rewrites_given_namespaces(tmp_path):
+    store = SQLiteStatePersistence(str(tmp_path / "states.db"))
+    state = FlowState(session_id="s1", user_id="u1", status="running", data={"a": {"x": 1}, "b": [1, 2]})
+    assert store.save_state(state)
+    state.data["a"] = {"x": 2}
+    state.data["b"] = ["not saved"]
+    assert store.save_delta(state, ["a"])
+    loaded = store.load_state("s1")
+    assert loaded.data == {"a": {"x": 2}, "b": [1, 2]}
+    assert store.load_state("missing") is None
+
+
+def test_memory_search_get_delete_round_trip(tmp_path):
+    memory = SQLiteAgentMemory(str(tmp_path / "memories.db"))
+    assert memory.add_memories([
+        _item("u1", "m1", "the cat sat on the mat"),
+        _item("u1", "m2", "dogs chase the cat"),
+        _item("u1", "m3", "stock prices fell"),
+    ])
+    assert [m.memory_id for m in memory.search_memories("u1", "cat mat")] == ["m1", "m2"]
+    assert [m.memory_id for m in memory.get_memories("u1", limit=2)] == ["m3", "m2"]
+    assert memory.delete_memory("u1", "m1")
+    assert not memory.delete_memory("u1", "m1")
+    assert [m.memory_id for m in memory.search_memories("u1", "cat")] == ["m2"]
+
+
+def test_memory_ids_are_scoped_per_user(tmp_path):
+    memory = SQLiteAgentMemory(str(tmp_path / "memories.db"))
+    memory.add_memory(_item("u1", "m1", "apples"))
+    memory.add_memory(_item("u2", "m1", "bananas"))
+    assert [m.content for m in memory.get_memories("u1")] == ["apples"]
+    assert [m.content for m in memory.search_memories("u2", "bananas")] == ["bananas"]
+    assert memory.search_memories("u2", "apples") == []
+    assert memory.delete_memory("u2", "m1")
+    assert [m.content for m in memory.search_memories("u1", "apples")] == ["apples"]
+
+
+def test_memory_migrates_tables_keyed_by_memory_id(tmp_path):
+    path = str(tmp_path / "memories.db")
+    with sqlite3.connect(path) as conn:
+        conn.execute(
+            "CREATE TABLE memories (memory_id TEXT PRIMARY KEY, user_id TEXT NOT NULL, content TEXT NOT NULL, "
+            "metadata TEXT NOT NULL, created_at TEXT NOT NULL)"
+        )
+        conn.execute("INSERT INTO memories VALUES ('m1', 'u1', 'old apples', '{}', '2024-01-01T00:00:00.000000')")
+    memory = SQLiteAgentMemory(path)
+    memory.add_memory(_item("u2", "m1", "new apples"))
+    assert [m.content for m in memory.search_memories("u1", "apples")] == ["old apples"]
+    assert [m.content for m in memory.search_memories("u2", "apples")] == ["new apples"]
+
+
+def test_unbounded_search_over_many_memories(tmp_path):
+    memory = SQLiteAgentMemory(str(tmp_path / "memories.db"))
+    memory.add_memories([_item("u1", f"m{i}", f"note {i} about apples") for i in range(1200)])
+    query = "apples " + " ".join(f"word{i}" for i in range(1200))
+    results = memory.search_memories("u1", query)
+    assert len(results) == 1200
+    assert results[0].memory_id == "m0"
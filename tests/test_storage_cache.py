@@ -0,0 +1,61 @@
+from core.storage.base import AgentMemoryItem, FlowState
+from core.storage.cache import LRU, CachedAgentMemory, CachedStatePersistence
+from core.storage.fs import FileSystemAgentMemory, FileSystemStatePersistence
+
+
+class CountingState(FileSystemStatePersistence):
+    loads = 0
+
+    def load_state(self, session_id):
+        self.loads += 1
+        return super().load_state(session_id)
+
+
+class CountingMemory(FileSystemAgentMemory):
+    searches = 0
+
+    def search_memories(self, user_id, query, limit=None):
+        self.searches += 1
+        return super().search_memories(user_id, query, limit)
+
+
+def _state(**data):
+    return FlowState(session_id="s1", user_id="u1", status="running", data=data)
+
+
+def test_lru_evicts_least_recently_used_and_stale_entries():
+    lru = LRU(2)
+    lru.put("a", 1, "A")
+    lru.put("b", 1, "B")
+    assert lru.get("a", 1) == "A"
+    lru.put("c", 1, "C")
+    assert lru.get("b", 1) is None
+    assert lru.get("a", 2) is None
+    assert lru.get("a", 1) is None
+    assert lru.get("c", 1) == "C"
+
+
+def test_cached_state_follows_writes_from_other_instances(tmp_path):
+    inner = CountingState(str(tmp_path))
+    cached = CachedStatePersistence(inner)
+    cached.save_state(_state(a=1))
+    inner.loads = 0  # Saving looks up the last sequence number
+    assert cached.load_state("s1").data == {"a": 1}
+    assert cached.load_state("s1").data == {"a": 1}
+    assert inner.loads == 1
+    # Another process (here: another instance) writes the same session
+    FileSystemStatePersistence(str(tmp_path)).save_delta(_state(a=2), ["a"])
+    assert cached.load_state("s1").data == {"a": 2}
+    assert inner.loads == 2
+
+
+def test_cached_memory_invalidates_on_writes(tmp_path):
+    inner = CountingMemory(str(tmp_path))
+    cached = CachedAgentMemory(inner)
+    cached.add_memory(AgentMemoryItem(user_id="u1", memory_id="m1", content="apples"))
+    assert [m.memory_id for m in cached.search_memories("u1", "apples")] == ["m1"]
+    assert [m.memory_id for m in cached.search_memories("u1", "apples")] == ["m1"]
+    assert inner.searches == 1
+    cached.add_memory(AgentMemoryItem(user_id="u1", memory_id="m2", content="more apples"))
+    assert len(cached.search_memories("u1", "apples")) == 2
+    assert inner.searches == 2
@@ -0,0 +1,63 @@
+from datetime import datetime, timedelta
+import pytest
+from core.storage.base import AgentMemoryItem, BaseAgentMemory
+from core.storage.vector import HashingEmbedder, VectorAgentMemory
+
+NOW = datetime(2024, 1, 1)
+
+
+def _item(user_id, memory_id, content, minutes=0):
+    return AgentMemoryItem(
+        user_id=user_id, memory_id=memory_id, content=content, created_at=NOW + timedelta(minutes=minutes)
+    )
+
+
+def _add_notes(memory):
+    memory.add_memories([
+        _item("u1", "m1", "quarterly revenue grew strongly", 0),
+        _item("u1", "m2", "the cat chased a mouse", 1),
+        _item("u1", "m3", "revenue forecast for next quarter", 2),
+    ])
+
+
+def test_search_ranks_by_similarity_and_get_returns_newest_first(tmp_path):
+    memory = VectorAgentMemory(str(tmp_path))
+    _add_notes(memory)
+    results = memory.search_memories("u1", "quarterly revenue", limit=2)
+    assert {m.memory_id for m in results} == {"m1", "m3"}
+    assert [m.memory_id for m in memory.get_memories("u1", limit=2)] == ["m3", "m2"]
+    assert memory.search_memories("u2", "revenue") == []
+
+
+def test_changing_the_embedding_size_re_embeds(tmp_path):
+    _add_notes(VectorAgentMemory(str(tmp_path), embedder=HashingEmbedder(dim=64)))
+    memory = VectorAgentMemory(str(tmp_path), embedder=HashingEmbedder(dim=128))
+    assert memory.search_memories("u1", "cat mouse", limit=1)[0].memory_id == "m2"
+
+
+def test_deleted_memories_are_skipped(tmp_path):
+    memory = VectorAgentMemory(str(tmp_path))
+    _add_notes(memory)
+    assert memory.delete_memory("u1", "m3")
+    assert not memory.delete_memory("u1", "m3")
+    assert not memory.delete_memory("u2", "m1")
+    assert [m.memory_id for m in memory.search_memories("u1", "revenue forecast")] == ["m1"]
+    assert [m.memory_id for m in memory.get_memories("u1")] == ["m2", "m1"]
+    # Rows added after a delete are live
+    memory.add_memory(_item("u1", "m4", "revenue doubled", 3))
+    assert [m.memory_id for m in memory.get_memories("u1", limit=1)] == ["m4"]
+
+
+def test_backends_without_delete_still_instantiate():
+    class ListMemory(BaseAgentMemory):
+        def add_memory(self, item):
+            return True
+
+        def get_memories(self, user_id, limit=10):
+            return []
+
+        def search_memories(self, user_id, query, limit=None):
+            return []
+
+    with pytest.raises(NotImplementedError):
+        ListMemory().delete_memory("u1", "m1")